@@ -1,6 +1,7 @@
 ﻿from __future__ import annotations
 
 import os
+import socket
 from typing import List, Optional
 
 
@@ -56,11 +57,28 @@ def _parse_admin_ids(raw: str) -> List[int]:
 # ENV (Railway Variables)
 # =========================
 TELEGRAM_BOT_TOKEN: str = _get_env("TELEGRAM_BOT_TOKEN", "")
+# Bot API alternativo (servidor próprio ou o falso do soak). Vazio = api.telegram.org
+TELEGRAM_API_BASE_URL: str = _get_env("TELEGRAM_API_BASE_URL", "")
 
 ROULETTE_WS_URL: str = _get_env("ROULETTE_WS_URL", "wss://dga.pragmaticplaylive.net/ws")
+# Conexões redundantes na mesma mesa (ganha quem entregar o giro primeiro):
+#   ROULETTE_WS_URLS="wss://a/ws,wss://b/ws"  -> 1 conexão por URL
+#   WS_CONNECTIONS=2                          -> N conexões (reusa as URLs em rodízio)
+ROULETTE_WS_URLS: List[str] = [
+    u.strip() for u in _get_env("ROULETTE_WS_URLS", "").split(",") if u.strip()
+] or [ROULETTE_WS_URL]
+WS_CONNECTIONS: int = max(len(ROULETTE_WS_URLS), min(4, _get_int("WS_CONNECTIONS", 1)))
 CASINO_ID: str = _get_env("CASINO_ID", "ppcdk00000005349")
 CURRENCY: str = _get_env("CURRENCY", "BRL")
 TABLE_KEY: int = _get_int("TABLE_KEY", 204)
+# Várias mesas: TABLE_KEYS="204,205,206" (vazio = só TABLE_KEY)
+TABLE_KEYS: List[int] = _parse_admin_ids(_get_env("TABLE_KEYS", "")) or [TABLE_KEY]
+
+# Modo supervisor: SHARD_WORKERS=N processos dividem as mesas (0 = tudo num processo só)
+# O processo principal vira só o gateway do Telegram.
+SHARD_WORKERS: int = max(0, _get_int("SHARD_WORKERS", 0))
+SHARD_HEARTBEAT_SECONDS: float = max(0.5, _get_float("SHARD_HEARTBEAT_SECONDS", 5.0))
+SHARD_RESTART_DELAY: float = max(0.0, _get_float("SHARD_RESTART_DELAY", 2.0))
 
 # Admin
 _ADMIN_RAW = _get_env("ADMIN_CHAT_ID", "")
@@ -73,8 +91,129 @@ WINDOW_MAX: int = 200        # pode subir se quiser, mas 200 já é seguro
 DEFAULT_WINDOW_SIZE: int = _get_int("DEFAULT_WINDOW_SIZE", 40)
 DEFAULT_WINDOW_SIZE = max(WINDOW_MIN, min(WINDOW_MAX, DEFAULT_WINDOW_SIZE))
 
-# Anti-spam de edição (mensagem fixa)
+# Vizinhos no cilindro ("número ± k") mostrados no relatório
+SECTOR_NEIGHBORS: int = _get_int("SECTOR_NEIGHBORS", 2)
+SECTOR_NEIGHBORS = max(1, min(18, SECTOR_NEIGHBORS))
+
+# Alertas (regras configuradas via /alerta)
+ALERT_COOLDOWN_SECONDS: float = _get_float("ALERT_COOLDOWN_SECONDS", 300.0)
+ALERT_RULES_MAX: int = _get_int("ALERT_RULES_MAX", 50)
+
+# Layout do relatório:
+#   single = tudo numa mensagem fixa
+#   multi  = uma mensagem fixa por grupo de blocos (só edita o que mudou)
+REPORT_LAYOUT: str = _get_env("REPORT_LAYOUT", "single").lower()
+if REPORT_LAYOUT not in ("single", "multi"):
+    REPORT_LAYOUT = "single"
+
+# Anti-spam de edição (mensagem fixa) — vale POR CHAT
+# É o intervalo INICIAL: depois ele se adapta (429 => mais devagar, sucesso => volta pro piso)
 MIN_SECONDS_BETWEEN_EDITS: float = _get_float("MIN_SECONDS_BETWEEN_EDITS", 1.2)
+EDIT_INTERVAL_FLOOR: float = _get_float("EDIT_INTERVAL_FLOOR", 1.0)
+EDIT_INTERVAL_MAX: float = _get_float("EDIT_INTERVAL_MAX", 30.0)
+EDIT_BACKOFF_FACTOR: float = _get_float("EDIT_BACKOFF_FACTOR", 2.0)
+EDIT_PROBE_FACTOR: float = _get_float("EDIT_PROBE_FACTOR", 0.9)
+
+# Fila de saída: requests HTTP simultâneos no Bot API
+OUTBOX_CONCURRENCY: int = max(1, _get_int("OUTBOX_CONCURRENCY", 8))
+
+# Modo de receber updates (escolhido no boot):
+#   polling = getUpdates (padrão)
+#   webhook = servidor HTTP local recebe os POSTs do Telegram (menos latência)
+BOT_MODE: str = _get_env("BOT_MODE", "polling").lower()
+if BOT_MODE not in ("polling", "webhook"):
+    BOT_MODE = "polling"
+
+# Event loop: auto = uvloop se estiver instalado; asyncio = sempre o da stdlib
+EVENT_LOOP: str = _get_env("EVENT_LOOP", "auto").lower()
+if EVENT_LOOP not in ("auto", "uvloop", "asyncio"):
+    EVENT_LOOP = "auto"
+
+WEBHOOK_LISTEN: str = _get_env("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT: int = _get_int("WEBHOOK_PORT", _get_int("PORT", 8080))  # Railway injeta PORT
+WEBHOOK_PATH: str = _get_env("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET: str = _get_env("WEBHOOK_SECRET", "")
+# URL pública (https://...). Vazio = não registra no Telegram (teste local com curl)
+WEBHOOK_URL: str = _get_env("WEBHOOK_URL", "")
+
+# Transporte HTTP do Bot API (pools separados: envio x polling)
+TG_SEND_POOL_SIZE: int = max(1, _get_int("TG_SEND_POOL_SIZE", 16))
+TG_SEND_READ_TIMEOUT: float = _get_float("TG_SEND_READ_TIMEOUT", 10.0)
+TG_SEND_WRITE_TIMEOUT: float = _get_float("TG_SEND_WRITE_TIMEOUT", 10.0)
+TG_SEND_CONNECT_TIMEOUT: float = _get_float("TG_SEND_CONNECT_TIMEOUT", 5.0)
+TG_SEND_POOL_TIMEOUT: float = _get_float("TG_SEND_POOL_TIMEOUT", 3.0)
+TG_KEEPALIVE_EXPIRY: float = _get_float("TG_KEEPALIVE_EXPIRY", 30.0)
+
+TG_POLL_POOL_SIZE: int = max(1, _get_int("TG_POLL_POOL_SIZE", 2))
+TG_POLL_TIMEOUT: int = max(0, _get_int("TG_POLL_TIMEOUT", 10))           # long-poll (s)
+TG_POLL_READ_TIMEOUT: float = _get_float("TG_POLL_READ_TIMEOUT", 5.0)    # folga além do long-poll
+
+# quantos updates (comandos) o PTB processa em paralelo
+TG_CONCURRENT_UPDATES: int = max(1, _get_int("TG_CONCURRENT_UPDATES", 8))
+
+# Broadcast (mesmo relatório em vários chats/canais)
+# BROADCAST_CHAT_IDS="-100123,-100456" já entram como assinantes no boot
+BROADCAST_CHAT_IDS: List[int] = _parse_admin_ids(_get_env("BROADCAST_CHAT_IDS", ""))
+# limite global do Telegram é ~30 msg/s: rate + burst fica abaixo disso
+# em qualquer janela de 1s (vale pra TUDO que sai: relatório, alertas, respostas)
+BROADCAST_GLOBAL_RATE: float = _get_float("BROADCAST_GLOBAL_RATE", 25.0)
+BROADCAST_BURST: float = _get_float("BROADCAST_BURST", 5.0)
+
+# Várias réplicas: só o líder (lease) fala com o Telegram; os outros ficam quentes
+#   LEADER_BACKEND="sqlite:///data/leader.db" ou "file:///data/leader.json" (vazio = sem eleição)
+LEADER_BACKEND: str = _get_env("LEADER_BACKEND", "")
+LEADER_TTL: float = max(3.0, _get_float("LEADER_TTL", 10.0))   # failover em ~TTL segundos
+LEADER_ID: str = (
+    _get_env("LEADER_ID", "")
+    or _get_env("RAILWAY_REPLICA_ID", "")
+    or f"{socket.gethostname()}-{os.getpid()}"
+)
+
+# Watchdog do feed: conexão que responde ping mas parou de mandar last20Results
+# intervalo entre giros é aprendido; esse é só o chute inicial (s)
+FEED_SPIN_INTERVAL: float = max(5.0, _get_float("FEED_SPIN_INTERVAL", 45.0))
+# reconecta depois de FACTOR x intervalo sem last20Results (limitado a [MIN, MAX] s)
+FEED_STALE_FACTOR: float = _get_float("FEED_STALE_FACTOR", 3.0)
+FEED_STALE_MIN_SECONDS: float = _get_float("FEED_STALE_MIN_SECONDS", 60.0)
+FEED_STALE_MAX_SECONDS: float = _get_float("FEED_STALE_MAX_SECONDS", 600.0)
+
+# API HTTP local (só leitura, JSON por mesa) pros dashboards. API_PORT=0 = desligada
+API_LISTEN: str = _get_env("API_LISTEN", "127.0.0.1")
+API_PORT: int = max(0, _get_int("API_PORT", 0))
+API_LONGPOLL_MAX: float = max(1.0, _get_float("API_LONGPOLL_MAX", 60.0))
+
+# Stream dos giros (NDJSON) pra outros serviços: "unix:/tmp/roleta.sock" ou "tcp:127.0.0.1:9100" (vazio = desligado)
+STREAM_LISTEN: str = _get_env("STREAM_LISTEN", "")
+STREAM_REPLAY: int = max(100, _get_int("STREAM_REPLAY", 10_000))        # giros guardados pra retomada
+STREAM_SUB_BUFFER: int = max(10, _get_int("STREAM_SUB_BUFFER", 1_000))  # fila por assinante antes de derrubar
+
+# Memória: amostra o RSS a cada MEM_SAMPLE_SECONDS; alerta os admins a cada
+# MEM_ALERT_GROWTH_MB de crescimento desde o boot (0 = sem alerta)
+MEM_SAMPLE_SECONDS: float = max(10.0, _get_float("MEM_SAMPLE_SECONDS", 300.0))
+MEM_ALERT_GROWTH_MB: float = max(0.0, _get_float("MEM_ALERT_GROWTH_MB", 0.0))
+MEM_TRACE_TOP: int = max(1, _get_int("MEM_TRACE_TOP", 10))
+
+# /profile N: amostra a pilha do loop a cada PROFILE_INTERVAL_MS por até PROFILE_MAX_SECONDS
+PROFILE_MAX_SECONDS: int = max(1, _get_int("PROFILE_MAX_SECONDS", 120))
+PROFILE_INTERVAL_MS: float = max(1.0, _get_float("PROFILE_INTERVAL_MS", 5.0))
+# Travada do event loop: callback que segura o loop mais que LOOP_LAG_THRESHOLD_MS tem a pilha guardada
+LOOP_LAG_PROBE_MS: float = max(10.0, _get_float("LOOP_LAG_PROBE_MS", 100.0))
+LOOP_LAG_THRESHOLD_MS: float = max(20.0, _get_float("LOOP_LAG_THRESHOLD_MS", 100.0))
+
+# Arquivos do bot (rollups etc.). No Railway aponte pra um volume.
+DATA_DIR: str = _get_env("DATA_DIR", "data")
+
+# Agregados por hora/dia (por mesa) pro /resumo; dia = dia de SP
+ROLLUP_HOURS_KEEP: int = max(24, _get_int("ROLLUP_HOURS_KEEP", 24 * 14))
+ROLLUP_DAYS_KEEP: int = max(7, _get_int("ROLLUP_DAYS_KEEP", 400))
+ROLLUP_FLUSH_SECONDS: float = max(5.0, _get_float("ROLLUP_FLUSH_SECONDS", 60.0))
+
+# Giros brutos por dia (DATA_DIR/spins) pro /export e `python -m bot.export`; 0 = não grava
+ARCHIVE_SPINS: int = _get_int("ARCHIVE_SPINS", 1)
+ARCHIVE_FLUSH_SECONDS: float = max(1.0, _get_float("ARCHIVE_FLUSH_SECONDS", 10.0))
+# export: linhas por pedaço gravado (memória fixa) e limite do sendDocument do Bot API
+EXPORT_CHUNK_ROWS: int = max(1_000, _get_int("EXPORT_CHUNK_ROWS", 50_000))
+EXPORT_MAX_DOCUMENT_MB: float = max(1.0, _get_float("EXPORT_MAX_DOCUMENT_MB", 50.0))
 
 
 # =========================
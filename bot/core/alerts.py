@@ -0,0 +1,319 @@
+﻿# Alertas configuráveis (regras simples, avaliadas a cada giro novo)
+from __future__ import annotations
+
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from bot.core.analytics import (
+    JEU_ZERO,
+    ORPHELINS,
+    RED_NUMBERS,
+    VOISINS_EXCLUSIVE,
+)
+
+
+# =========================
+# CATEGORIAS
+# - Cada número "acerta" um conjunto fixo de categorias.
+# - Zero NÃO entra em par/ímpar, baixo/alto, dúzia, coluna (igual ao relatório).
+# =========================
+CATEGORY_LABELS: Dict[str, str] = {
+    "vermelho": "Vermelho 🔴",
+    "preto": "Preto ⚫",
+    "par": "Par",
+    "impar": "Ímpar",
+    "baixo": "Baixo (1–18)",
+    "alto": "Alto (19–36)",
+    "duzia1": "1ª Dúzia (1–12)",
+    "duzia2": "2ª Dúzia (13–24)",
+    "duzia3": "3ª Dúzia (25–36)",
+    "coluna1": "1ª Coluna",
+    "coluna2": "2ª Coluna",
+    "coluna3": "3ª Coluna",
+    "voisins": "Voisins du Zéro",
+    "tiers": "Tiers",
+    "orphelins": "Orphelins",
+    "jeuzero": "Jeu Zéro",
+}
+for _n in range(37):
+    CATEGORY_LABELS[f"n{_n}"] = "Zero 🟢" if _n == 0 else f"Número {_n}"
+
+_ALIASES: Dict[str, str] = {
+    "zero": "n0",
+    "verde": "n0",
+    "red": "vermelho",
+    "black": "preto",
+    "d1": "duzia1",
+    "d2": "duzia2",
+    "d3": "duzia3",
+    "c1": "coluna1",
+    "c2": "coluna2",
+    "c3": "coluna3",
+    "voisinsduzero": "voisins",
+    "jeu": "jeuzero",
+}
+
+KIND_ABSENT = "ausente"
+KIND_STREAK = "seguidas"
+_KIND_ALIASES = {
+    "ausente": KIND_ABSENT,
+    "ausencia": KIND_ABSENT,
+    "sem": KIND_ABSENT,
+    "seguidas": KIND_STREAK,
+    "seguidos": KIND_STREAK,
+    "sequencia": KIND_STREAK,
+}
+
+
+def categories_of(numero: int) -> Tuple[str, ...]:
+    """Categorias que o número acerta (tamanho fixo, ~8 no máximo)."""
+    out: List[str] = [f"n{numero}"]
+
+    if numero in JEU_ZERO:
+        out.append("jeuzero")
+    elif numero in VOISINS_EXCLUSIVE:
+        out.append("voisins")
+    elif numero in ORPHELINS:
+        out.append("orphelins")
+    else:
+        out.append("tiers")
+
+    if numero == 0:
+        return tuple(out)
+
+    out.append("vermelho" if numero in RED_NUMBERS else "preto")
+    out.append("par" if numero % 2 == 0 else "impar")
+    out.append("baixo" if numero <= 18 else "alto")
+    out.append(f"duzia{(numero - 1) // 12 + 1}")
+    out.append(f"coluna{(numero - 1) % 3 + 1}")
+    return tuple(out)
+
+
+# =========================
+# DSL
+#   <categoria> ausente [>=] <N> [cd <segundos>]
+#   <categoria> seguidas [>=] <N> [cd <segundos>]
+# Exemplos:
+#   duzia2 ausente >= 10
+#   zero ausente 80
+#   vermelho seguidas >= 6 cd 600
+# =========================
+class RuleError(ValueError):
+    pass
+
+
+def _plain(s: str) -> str:
+    # minúsculo e sem acento ("Dúzia" -> "duzia", "ímpar" -> "impar")
+    s = unicodedata.normalize("NFKD", s.lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def _parse_category(tokens: List[str]) -> Tuple[str, List[str]]:
+    if not tokens:
+        raise RuleError("faltou a categoria")
+
+    head = tokens[0]
+    rest = tokens[1:]
+
+    # "duzia 2", "coluna 3", "numero 17" -> junta com o número
+    if head in ("duzia", "coluna", "numero", "n") and rest and rest[0].isdigit():
+        head = ("n" if head in ("numero", "n") else head) + rest[0]
+        rest = rest[1:]
+    elif head.isdigit():
+        head = f"n{head}"
+
+    key = _ALIASES.get(head, head)
+    if key not in CATEGORY_LABELS:
+        raise RuleError(f"categoria desconhecida: {tokens[0]}")
+    return key, rest
+
+
+@dataclass
+class AlertRule:
+    rule_id: int
+    text: str
+    category: str
+    kind: str
+    threshold: int
+    cooldown_s: float
+    last_fired_ts: float = 0.0
+
+    def describe(self) -> str:
+        label = CATEGORY_LABELS.get(self.category, self.category)
+        if self.kind == KIND_ABSENT:
+            return f"{label} ausente há {self.threshold} giros"
+        return f"{label} {self.threshold} vezes seguidas"
+
+
+def compile_rule(rule_id: int, text: str, default_cooldown_s: float) -> AlertRule:
+    tokens = _plain(text).replace(">=", " ").replace("≥", " ").split()
+    category, rest = _parse_category(tokens)
+
+    if not rest or rest[0] not in _KIND_ALIASES:
+        raise RuleError("use 'ausente' ou 'seguidas' depois da categoria")
+    kind = _KIND_ALIASES[rest[0]]
+    rest = rest[1:]
+
+    if not rest or not rest[0].isdigit():
+        raise RuleError("faltou o número de giros")
+    threshold = int(rest[0])
+    if threshold < 1:
+        raise RuleError("o número de giros precisa ser >= 1")
+    rest = rest[1:]
+
+    cooldown_s = float(default_cooldown_s)
+    if rest:
+        if rest[0] not in ("cd", "cooldown") or len(rest) != 2 or not rest[1].isdigit():
+            raise RuleError("final inválido (use: cd <segundos>)")
+        cooldown_s = float(rest[1])
+
+    return AlertRule(
+        rule_id=rule_id,
+        text=" ".join(text.split()),
+        category=category,
+        kind=kind,
+        threshold=threshold,
+        cooldown_s=cooldown_s,
+    )
+
+
+# =========================
+# MOTOR
+# - Índice categoria -> regras: a cada giro só olha as regras das
+#   categorias que o número acertou (sequências e re-agendamento de ausência).
+# - Ausência: quando a categoria acerta no giro s, a regra de limiar T fica
+#   "agendada" pro giro s+T. Se a categoria acertar antes, o agendamento velho
+#   é descartado na hora de conferir (invalidação preguiçosa).
+# - Sequência: o contador só vale se o acerto anterior foi no giro anterior.
+# Custo por giro: O(regras tocadas), não O(regras).
+# =========================
+@dataclass(frozen=True)
+class FiredAlert:
+    rule: AlertRule
+    value: int
+    numero: int
+    table_key: Optional[int] = None    # modo supervisor: mesa onde disparou
+
+
+@dataclass
+class AlertEngine:
+    rules: Dict[int, AlertRule] = field(default_factory=dict)
+    next_id: int = 1
+
+    seq: int = 0
+    last_numero: Optional[int] = None
+    last_seen: Dict[str, int] = field(default_factory=dict)
+    streak: Dict[str, int] = field(default_factory=dict)
+
+    by_category: Dict[str, List[int]] = field(default_factory=dict)
+    due: Dict[int, List[int]] = field(default_factory=dict)
+
+    pending: List[FiredAlert] = field(default_factory=list)
+
+    def add_rule(self, text: str, default_cooldown_s: float) -> AlertRule:
+        rule = compile_rule(self.next_id, text, default_cooldown_s)
+        self.next_id += 1
+        self.rules[rule.rule_id] = rule
+        self.by_category.setdefault(rule.category, []).append(rule.rule_id)
+        if rule.kind == KIND_ABSENT:
+            self._schedule(rule)
+        self._check_now(rule)
+        return rule
+
+    def specs(self) -> List[Tuple[int, str, float]]:
+        """Regras como (id, texto, cooldown): o que vai pros workers no modo supervisor."""
+        return [(r.rule_id, r.text, r.cooldown_s) for r in self.rules.values()]
+
+    def set_rules(self, specs: List[Tuple[int, str, float]]) -> None:
+        """
+        Worker: espelha as regras do gateway (mesmos ids, pra o disparo voltar pelo id).
+        Regra que já existia continua com o agendamento e o cooldown correntes.
+        """
+        old = self.rules
+        self.rules = {}
+        self.by_category = {}
+        for rule_id, text, cooldown_s in specs:
+            rule = old.get(rule_id)
+            fresh = rule is None or rule.text != text
+            if fresh:
+                rule = compile_rule(rule_id, text, cooldown_s)
+            rule.cooldown_s = cooldown_s
+            self.rules[rule_id] = rule
+            self.by_category.setdefault(rule.category, []).append(rule_id)
+            self.next_id = max(self.next_id, rule_id + 1)
+            if fresh:
+                if rule.kind == KIND_ABSENT:
+                    self._schedule(rule)
+                self._check_now(rule)
+
+    def remove_rule(self, rule_id: int) -> bool:
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        ids = self.by_category.get(rule.category, [])
+        if rule_id in ids:
+            ids.remove(rule_id)
+        if not ids:
+            self.by_category.pop(rule.category, None)
+        # agendamentos pendentes dessa regra são ignorados na conferência
+        return True
+
+    def absence(self, category: str) -> int:
+        return self.seq - self.last_seen.get(category, 0)
+
+    def _schedule(self, rule: AlertRule) -> None:
+        at = self.last_seen.get(rule.category, 0) + rule.threshold
+        if at > self.seq:
+            self.due.setdefault(at, []).append(rule.rule_id)
+
+    def _check_now(self, rule: AlertRule) -> None:
+        """Regra nova com a condição já valendo (ausente/seguidas >= limiar): dispara já, não no próximo acerto."""
+        if self.last_numero is None:
+            return
+        if rule.kind == KIND_ABSENT:
+            value = self.absence(rule.category)
+        else:
+            value = self.streak.get(rule.category, 0) if self.last_seen.get(rule.category) == self.seq else 0
+        if value >= rule.threshold:
+            self._fire(rule, value, self.last_numero, time.time())
+
+    def _fire(self, rule: AlertRule, value: int, numero: int, now: float) -> None:
+        if rule.last_fired_ts and (now - rule.last_fired_ts) < rule.cooldown_s:
+            return
+        rule.last_fired_ts = now
+        self.pending.append(FiredAlert(rule=rule, value=value, numero=numero))
+
+    def on_spin(self, numero: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.seq += 1
+        seq = self.seq
+        self.last_numero = numero
+
+        for cat in categories_of(numero):
+            prev = self.last_seen.get(cat)
+            run = self.streak.get(cat, 0) + 1 if prev == seq - 1 else 1
+            self.streak[cat] = run
+            self.last_seen[cat] = seq
+
+            for rid in self.by_category.get(cat, ()):
+                rule = self.rules[rid]
+                if rule.kind == KIND_STREAK:
+                    if run == rule.threshold:
+                        self._fire(rule, run, numero, now)
+                else:
+                    self._schedule(rule)
+
+        for rid in self.due.pop(seq, ()):
+            rule = self.rules.get(rid)
+            if rule is None or rule.kind != KIND_ABSENT:
+                continue
+            gap = self.absence(rule.category)
+            if gap == rule.threshold:
+                self._fire(rule, gap, numero, now)
+
+    def drain(self) -> List[FiredAlert]:
+        out = self.pending
+        self.pending = []
+        return out
@@ -1,7 +1,8 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 
 # =========================
@@ -87,6 +88,61 @@ def get_region_bucket(numero: int) -> str:
     return "Tiers"
 
 
+# =========================
+# CILINDRO (ordem física da roda europeia)
+# - Os call bets acima são conjuntos fixos; aqui a gente tem a ORDEM
+#   real dos números na roda, pra análise "número ± k vizinhos".
+# =========================
+WHEEL_ORDER: Tuple[int, ...] = (
+    0, 32, 15, 19, 4, 21, 2, 25, 17, 34, 6, 27, 13, 36, 11, 30, 8, 23, 10,
+    5, 24, 16, 33, 1, 20, 14, 31, 9, 22, 18, 29, 7, 28, 12, 35, 3, 26,
+)
+WHEEL_SIZE = len(WHEEL_ORDER)  # 37
+WHEEL_POS: Dict[int, int] = {n: i for i, n in enumerate(WHEEL_ORDER)}
+
+# k=18 já cobre a roda inteira (18 + 1 + 18 = 37)
+SECTOR_K_MAX = WHEEL_SIZE // 2
+
+
+def wheel_neighbors(numero: int, k: int) -> List[int]:
+    """Números do setor "numero ± k", na ordem da roda (esquerda -> direita)."""
+    k = max(0, min(SECTOR_K_MAX, int(k)))
+    pos = WHEEL_POS[numero]
+    return [WHEEL_ORDER[(pos + d) % WHEEL_SIZE] for d in range(-k, k + 1)]
+
+
+def pocket_counts(nums: Iterable[int]) -> List[int]:
+    """Contagem por casa (índice = número 0..36)."""
+    counts = [0] * WHEEL_SIZE
+    for n in nums:
+        if 0 <= n <= 36:
+            counts[n] += 1
+    return counts
+
+
+def sector_totals(counts: Sequence[int], k: int) -> List[int]:
+    """
+    Total de cada setor "número ± k vizinhos" pros 37 centros de uma vez.
+
+    - counts: contagem por número (índice = número)
+    - retorno: indexado pela POSIÇÃO no cilindro (WHEEL_ORDER[i] é o centro)
+
+    Soma de prefixo sobre a roda "duplicada" => O(37) pra qualquer k.
+    """
+    k = max(0, min(SECTOR_K_MAX, int(k)))
+    span = 2 * k + 1
+
+    prefix = [0] * (2 * WHEEL_SIZE + 1)
+    for i in range(2 * WHEEL_SIZE):
+        prefix[i + 1] = prefix[i] + counts[WHEEL_ORDER[i % WHEEL_SIZE]]
+
+    out: List[int] = []
+    for pos in range(WHEEL_SIZE):
+        start = (pos - k) % WHEEL_SIZE
+        out.append(prefix[start + span] - prefix[start])
+    return out
+
+
 # =========================
 # HELPERS
 # =========================
@@ -105,12 +161,130 @@ def _pct(part: int, denom: int) -> int:
     return int(round((part / denom) * 100))
 
 
+def result_number(result: Dict[str, Any]) -> Optional[int]:
+    """Número (0..36) de um resultado normalizado, ou None se não der pra usar."""
+    n = _to_int(result.get("result", result.get("number")))
+    if n is None or not (0 <= n <= 36):
+        return None
+    return n
+
+
+# =========================
+# TRANSIÇÕES (Markov) entre giros consecutivos
+# - Matrizes pequenas de tamanho fixo, atualizadas no append (+1)
+#   e na saída da janela (-1). Nada de reescanear state.results.
+# - Índices:
+#   cor:     0=Vermelho 1=Preto 2=Verde
+#   dúzia:   0=zero 1..3
+#   coluna:  0=zero 1..3
+#   casa:    número (0..36), matriz 37x37 achatada
+# =========================
+COLOR_KEYS: Tuple[str, ...] = ("Vermelho", "Preto", "Verde")
+GROUP_KEYS: Tuple[str, ...] = ("0", "1ª", "2ª", "3ª")
+
+
+def color_index(numero: int) -> int:
+    if numero == 0:
+        return 2
+    return 0 if numero in RED_NUMBERS else 1
+
+
+def dozen_index(numero: int) -> int:
+    if numero == 0:
+        return 0
+    return (numero - 1) // 12 + 1
+
+
+def column_index(numero: int) -> int:
+    if numero == 0:
+        return 0
+    return (numero - 1) % 3 + 1
+
+
+def _matrix(size: int) -> List[List[int]]:
+    return [[0] * size for _ in range(size)]
+
+
+@dataclass
+class TransitionCounts:
+    cores: List[List[int]] = field(default_factory=lambda: _matrix(3))
+    duzias: List[List[int]] = field(default_factory=lambda: _matrix(4))
+    colunas: List[List[int]] = field(default_factory=lambda: _matrix(4))
+    casas: List[int] = field(default_factory=lambda: [0] * (WHEEL_SIZE * WHEEL_SIZE))
+    pairs: int = 0
+
+    def _apply(self, prev: int, cur: int, delta: int) -> None:
+        self.cores[color_index(prev)][color_index(cur)] += delta
+        self.duzias[dozen_index(prev)][dozen_index(cur)] += delta
+        self.colunas[column_index(prev)][column_index(cur)] += delta
+        self.casas[prev * WHEEL_SIZE + cur] += delta
+        self.pairs += delta
+
+    def push(self, prev: int, cur: int) -> None:
+        """Entrou o par (prev -> cur) na janela."""
+        self._apply(prev, cur, 1)
+
+    def pop(self, prev: int, cur: int) -> None:
+        """Saiu o par (prev -> cur) da janela."""
+        self._apply(prev, cur, -1)
+
+    def pocket(self, prev: int, cur: int) -> int:
+        return self.casas[prev * WHEEL_SIZE + cur]
+
+    def reset(self) -> None:
+        self.cores = _matrix(3)
+        self.duzias = _matrix(4)
+        self.colunas = _matrix(4)
+        self.casas = [0] * (WHEEL_SIZE * WHEEL_SIZE)
+        self.pairs = 0
+
+    def rebuild(self, nums: Sequence[Optional[int]]) -> None:
+        """Recalcula do zero (só em troca de janela). Par = dois vizinhos válidos."""
+        self.reset()
+        for prev, cur in zip(nums, nums[1:]):
+            if prev is not None and cur is not None:
+                self.push(prev, cur)
+
+
 @dataclass(frozen=True)
 class RankItem:
     key: str
     pct: int
 
 
+@dataclass(frozen=True)
+class SectorItem:
+    center: int
+    k: int
+    hits: int
+    pct: int
+    expected_pct: int  # (2k+1)/37 — referência pra não ler ruído como tendência
+
+    @property
+    def numbers(self) -> List[int]:
+        return wheel_neighbors(self.center, self.k)
+
+
+def rank_sectors(counts: Sequence[int], k: int, total_spins: int) -> List[SectorItem]:
+    """Todos os 37 setores ordenados do mais quente pro mais frio (desempate pela ordem da roda)."""
+    k = max(0, min(SECTOR_K_MAX, int(k)))
+    totals = sector_totals(counts, k)
+    expected_pct = _pct(2 * k + 1, WHEEL_SIZE)
+
+    items = [
+        SectorItem(center=WHEEL_ORDER[pos], k=k, hits=hits, pct=_pct(hits, total_spins), expected_pct=expected_pct)
+        for pos, hits in enumerate(totals)
+    ]
+    items.sort(key=lambda x: (-x.hits, WHEEL_POS[x.center]))
+    return items
+
+
+def hottest_sector(counts: Sequence[int], k: int, total_spins: int) -> Optional[SectorItem]:
+    if total_spins <= 0:
+        return None
+    return rank_sectors(counts, k, total_spins)[0]
+
+
 @dataclass(frozen=True)
 class AnalyticsResult:
     window: int
@@ -138,31 +312,49 @@ class AnalyticsResult:
     colunas_rank: List[RankItem]
     regioes_rank: List[RankItem]  # agora vem 4 itens: Voisins, Tiers, Orphelins, Jeu Zéro (ordenados)
 
+    # vizinhos no cilindro ("número ± k"), 37 setores do mais quente pro mais frio
+    sector_k: int = 0
+    setores_rank: List[SectorItem] = field(default_factory=list)
+
 
-def compute_analytics(results: Iterable[Dict[str, Any]], window_label: int) -> AnalyticsResult:
+def compute_analytics(
+    results: Iterable[Dict[str, Any]],
+    window_label: int,
+    sector_k: int = 2,
+) -> AnalyticsResult:
     nums: List[int] = []
     for r in results:
-        n = _to_int(r.get("result", r.get("number")))
-        if n is None:
-            continue
-        if 0 <= n <= 36:
+        n = result_number(r)
+        if n is not None:
             nums.append(n)
 
-    total_spins = len(nums)
-    zeros = sum(1 for n in nums if n == 0)
+    return compute_analytics_from_counts(pocket_counts(nums), window_label, sector_k=sector_k)
+
+
+def compute_analytics_from_counts(
+    counts: Sequence[int],
+    window_label: int,
+    sector_k: int = 2,
+) -> AnalyticsResult:
+    """
+    Mesmo resultado do compute_analytics, mas em cima da contagem por casa
+    (WindowStats.pockets). Custo O(37), independe do tamanho da janela.
+    """
+    total_spins = sum(counts)
+    zeros = counts[0]
     nonzero = total_spins - zeros
 
     # pares/ímpares: zero NÃO entra
-    pares = sum(1 for n in nums if n != 0 and n % 2 == 0)
-    impares = sum(1 for n in nums if n != 0 and n % 2 == 1)
+    pares = sum(counts[n] for n in range(2, 37, 2))
+    impares = sum(counts[n] for n in range(1, 37, 2))
 
     # cores: zero NÃO entra
-    vermelhos = sum(1 for n in nums if n != 0 and get_cor(n) == "Vermelho")
-    pretos = sum(1 for n in nums if n != 0 and get_cor(n) == "Preto")
+    vermelhos = sum(counts[n] for n in RED_NUMBERS)
+    pretos = nonzero - vermelhos
 
     # baixos/altos: zero NÃO entra
-    baixos = sum(1 for n in nums if 1 <= n <= 18)
-    altos = sum(1 for n in nums if 19 <= n <= 36)
+    baixos = sum(counts[1:19])
+    altos = sum(counts[19:37])
 
     # %: zeros em cima do total, resto em cima do nonzero
     pct_zeros = _pct(zeros, total_spins)
@@ -177,15 +369,13 @@ def compute_analytics(results: Iterable[Dict[str, Any]], window_label: int) -> A
     duzia_counts = {"1ª": 0, "2ª": 0, "3ª": 0}
     coluna_counts = {"1ª": 0, "2ª": 0, "3ª": 0}
 
-    for n in nums:
-        if n == 0:
-            continue
+    for n in range(1, 37):
         d = get_duzia_key(n)
         c = get_coluna_key(n)
         if d:
-            duzia_counts[d] += 1
+            duzia_counts[d] += counts[n]
         if c:
-            coluna_counts[c] += 1
+            coluna_counts[c] += counts[n]
 
     duzias_rank = [RankItem(k, _pct(v, nonzero)) for k, v in duzia_counts.items()]
     colunas_rank = [RankItem(k, _pct(v, nonzero)) for k, v in coluna_counts.items()]
@@ -202,9 +392,9 @@ def compute_analytics(results: Iterable[Dict[str, Any]], window_label: int) -> A
         "Jeu Zéro": 0,
     }
 
-    for n in nums:
+    for n in range(WHEEL_SIZE):
         bucket = get_region_bucket(n)
-        region_counts[bucket] += 1
+        region_counts[bucket] += counts[n]
 
     regioes_rank = [RankItem(k, _pct(v, total_spins)) for k, v in region_counts.items()]
 
@@ -212,6 +402,9 @@ def compute_analytics(results: Iterable[Dict[str, Any]], window_label: int) -> A
     region_order = {"Voisins du Zéro": 1, "Tiers": 2, "Orphelins": 3, "Jeu Zéro": 4}
     regioes_rank.sort(key=lambda x: (-x.pct, region_order.get(x.key, 99)))
 
+    # setores do cilindro (O(37) em cima da contagem por casa)
+    setores_rank = rank_sectors(counts, sector_k, total_spins)
+
     return AnalyticsResult(
         window=window_label,
         total_spins=total_spins,
@@ -232,4 +425,174 @@ def compute_analytics(results: Iterable[Dict[str, Any]], window_label: int) -> A
         duzias_rank=duzias_rank,
         colunas_rank=colunas_rank,
         regioes_rank=regioes_rank,
+        sector_k=max(0, min(SECTOR_K_MAX, int(sector_k))),
+        setores_rank=setores_rank,
     )
+
+
+# =========================
+# ESTATÍSTICA (desvio vs. probabilidade teórica)
+# - O % arredondado não diz se o desvio é ruído ou não (janela 5 => 1 giro = 20%).
+# - Aqui a gente guarda as somas corridas pra qui-quadrado e z-score:
+#     χ² = Σ (O_i - N·p_i)² / (N·p_i) = (Σ O_i²/p_i) / N - N
+#   então basta manter S = Σ O_i²/p_i, que muda em O(1) a cada giro:
+#     O_i -> O_i + 1  =>  S += (2·O_i + 1) / p_i
+#     O_i -> O_i - 1  =>  S -= (2·O_i - 1) / p_i
+# - Só aponta desvio quando a aproximação normal vale (N·p >= 5) e passa
+#   do limiar de 1% (pros 37 números individuais, 0,1% por serem muitos testes).
+# - A casa do zero (p = 1/37) só chega a N·p >= 5 com 185 giros: em janela menor,
+#   cor/dúzia/coluna são testadas sem ela, condicionadas a "não deu zero"
+#   (N' = N - O_0, q_i = p_i / (1 - p_0)). A soma sai da mesma S:
+#     Σ O_i²/q_i = (1 - p_0) · (S - O_0²/p_0)
+# =========================
+REGION_KEYS: Tuple[str, ...] = ("Voisins du Zéro", "Tiers", "Orphelins", "Jeu Zéro")
+_REGION_INDEX = {k: i for i, k in enumerate(REGION_KEYS)}
+
+
+def region_index(numero: int) -> int:
+    return _REGION_INDEX[get_region_bucket(numero)]
+
+
+def _region_probs() -> Tuple[float, ...]:
+    sizes = [0] * len(REGION_KEYS)
+    for n in range(WHEEL_SIZE):
+        sizes[region_index(n)] += 1
+    return tuple(x / WHEEL_SIZE for x in sizes)
+
+
+@dataclass(frozen=True)
+class StatFamily:
+    name: str
+    labels: Tuple[str, ...]
+    probs: Tuple[float, ...]
+    index: Any  # Callable[[int], int]
+    chi2_crit: float  # valor crítico de χ² a 1% pros graus de liberdade da família
+    z_crit: float
+    zero_cell: int = -1  # célula que só tem o 0 (-1 = nenhuma): sai do teste em janela curta
+
+
+STAT_FAMILIES: Tuple[StatFamily, ...] = (
+    StatFamily("Cores", COLOR_KEYS, (18 / 37, 18 / 37, 1 / 37), color_index, 9.210, 2.576, zero_cell=2),
+    StatFamily("Dúzias", ("Zero", "1ª Dúzia", "2ª Dúzia", "3ª Dúzia"), (1 / 37, 12 / 37, 12 / 37, 12 / 37), dozen_index, 11.345, 2.576, zero_cell=0),
+    StatFamily("Colunas", ("Zero", "1ª Coluna", "2ª Coluna", "3ª Coluna"), (1 / 37, 12 / 37, 12 / 37, 12 / 37), column_index, 11.345, 2.576, zero_cell=0),
+    StatFamily("Regiões", REGION_KEYS, _region_probs(), region_index, 11.345, 2.576),
+    StatFamily("Números", tuple(str(n) for n in range(WHEEL_SIZE)), tuple([1 / 37] * WHEEL_SIZE), lambda n: n, 58.619, 3.291),
+)
+
+# mínimo de esperados por célula pra aproximação normal/χ² fazer sentido
+MIN_EXPECTED = 5.0
+# χ² crítico a 1% por graus de liberdade (teste sem a casa do zero)
+CHI2_CRIT_1PCT: Dict[int, float] = {1: 6.635, 2: 9.210, 3: 11.345}
+
+
+@dataclass(frozen=True)
+class Deviation:
+    family: str
+    key: str
+    observed: int
+    expected: float
+    z: float
+
+
+@dataclass(frozen=True)
+class FamilyTest:
+    family: str
+    chi2: float
+    df: int
+    significant: bool
+
+
+@dataclass
+class WindowStats:
+    """
+    Contadores da janela atualizados no append/saída (O(1) por giro por família).
+    pockets[n] é a base de tudo (compute_analytics_from_counts, setores...).
+    """
+    total: int = 0
+    pockets: List[int] = field(default_factory=lambda: [0] * WHEEL_SIZE)
+    counts: List[List[int]] = field(default_factory=lambda: [[0] * len(f.probs) for f in STAT_FAMILIES])
+    sums: List[float] = field(default_factory=lambda: [0.0] * len(STAT_FAMILIES))
+
+    def push(self, n: int) -> None:
+        self.total += 1
+        self.pockets[n] += 1
+        for fi, fam in enumerate(STAT_FAMILIES):
+            i = fam.index(n)
+            o = self.counts[fi][i]
+            self.sums[fi] += (2 * o + 1) / fam.probs[i]
+            self.counts[fi][i] = o + 1
+
+    def pop(self, n: int) -> None:
+        self.total -= 1
+        self.pockets[n] -= 1
+        for fi, fam in enumerate(STAT_FAMILIES):
+            i = fam.index(n)
+            o = self.counts[fi][i]
+            self.sums[fi] -= (2 * o - 1) / fam.probs[i]
+            self.counts[fi][i] = o - 1
+
+    def reset(self) -> None:
+        self.total = 0
+        self.pockets = [0] * WHEEL_SIZE
+        self.counts = [[0] * len(f.probs) for f in STAT_FAMILIES]
+        self.sums = [0.0] * len(STAT_FAMILIES)
+
+    def rebuild(self, nums: Iterable[Optional[int]]) -> None:
+        self.reset()
+        for n in nums:
+            if n is not None:
+                self.push(n)
+
+    def chi2(self, fi: int) -> float:
+        if self.total <= 0:
+            return 0.0
+        # max(0, ...) só pra não mostrar -0.000001 por erro de float
+        return max(0.0, self.sums[fi] / self.total - self.total)
+
+    def chi2_without_zero(self, fi: int) -> Tuple[float, int]:
+        """(χ², giros sem zero) das outras casas da família, condicionado a não ter dado zero."""
+        fam = STAT_FAMILIES[fi]
+        p0 = fam.probs[fam.zero_cell]
+        o0 = self.counts[fi][fam.zero_cell]
+        n = self.total - o0
+        if n <= 0:
+            return 0.0, 0
+        s = (1 - p0) * (self.sums[fi] - o0 * o0 / p0)
+        return max(0.0, s / n - n), n
+
+    def family_tests(self) -> List[FamilyTest]:
+        out: List[FamilyTest] = []
+        for fi, fam in enumerate(STAT_FAMILIES):
+            if self.total * min(fam.probs) >= MIN_EXPECTED:
+                chi2 = self.chi2(fi)
+                out.append(FamilyTest(fam.name, chi2, len(fam.probs) - 1, chi2 >= fam.chi2_crit))
+                continue
+            if fam.zero_cell < 0:
+                continue
+            p0 = fam.probs[fam.zero_cell]
+            q_min = min(p for i, p in enumerate(fam.probs) if i != fam.zero_cell) / (1 - p0)
+            chi2, n = self.chi2_without_zero(fi)
+            if n * q_min < MIN_EXPECTED:
+                continue
+            df = len(fam.probs) - 2
+            out.append(FamilyTest(f"{fam.name} (sem zero)", chi2, df, chi2 >= CHI2_CRIT_1PCT[df]))
+        return out
+
+    def deviations(self) -> List[Deviation]:
+        """Só os desvios estatisticamente notáveis, do maior |z| pro menor."""
+        out: List[Deviation] = []
+        n_total = self.total
+        for fi, fam in enumerate(STAT_FAMILIES):
+            for i, p in enumerate(fam.probs):
+                if i == fam.zero_cell:
+                    # o zero é a mesma casa em Cores/Dúzias/Colunas: aparece só 1x, em Números
+                    continue
+                expected = n_total * p
+                if expected < MIN_EXPECTED or (n_total - expected) < MIN_EXPECTED:
+                    continue
+                o = self.counts[fi][i]
+                z = (o - expected) / math.sqrt(expected * (1 - p))
+                if abs(z) >= fam.z_crit:
+                    out.append(Deviation(fam.name, fam.labels[i], o, expected, z))
+        out.sort(key=lambda d: -abs(d.z))
+        return out
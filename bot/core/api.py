@@ -0,0 +1,181 @@
+﻿# API HTTP local (só leitura) pros dashboards, em vez de raspar a mensagem do Telegram
+# - JSON por mesa: analytics da janela, giros da janela e status da conexão
+# - o JSON é montado 1x quando entra giro novo (ou a conexão muda) e fica em cache
+#   como bytes prontos: 100 clientes fazendo polling = 100 writes do mesmo buffer
+# - ETag + If-None-Match (304 sem corpo) e long-poll: ?wait=30 segura a resposta
+#   até o próximo giro (ou o tempo acabar -> 304)
+#
+#   GET /v1/tables            índice (mesas + etag de cada uma)
+#   GET /v1/tables/<mesa>     snapshot da mesa
+#   GET /healthz
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional
+
+from bot.core.analytics import compute_analytics_from_counts, result_number
+from bot.core.buffer import last_n_results
+from bot.core.http import HttpError, HttpRequest, HttpResponse, start_http_server
+
+
+def table_payload(state: Any, table_key: int, sector_k: int = 2) -> Dict[str, Any]:
+    """Tudo que o dashboard precisa de uma mesa (O(janela), roda 1x por giro)."""
+    window = state.window_size if len(state.results) >= state.window_size else len(state.results)
+    analytics = compute_analytics_from_counts(state.window_stats.pockets, window_label=window, sector_k=sector_k)
+    return {
+        "table_key": table_key,
+        "generated_at": time.time(),
+        "running": state.running,
+        "total_games": state.total_games,
+        "last_number": state.last_number,
+        "window_size": state.window_size,
+        "analytics": asdict(analytics),
+        "spins": [
+            {"gameId": r.get("gameId"), "number": result_number(r), "time": r.get("time")}
+            for r in last_n_results(state)
+        ],
+        "connection": {
+            "connected": state.ws_connected,
+            "error": state.ws_last_error,
+            "feeds": {
+                name: {
+                    "connected": feed.connected(),
+                    "last_frame_ts": feed.last_frame_ts,
+                    "last_results_ts": feed.last_results_ts,
+                    "last_spin_ts": feed.last_spin_ts,
+                    "reconnects": feed.reconnects,
+                    "stale_reconnects": feed.stale_reconnects,
+                }
+                for name, feed in state.feeds.items()
+            },
+            "missing_spins": state.gaps.missing_total,
+            "gaps": state.gaps.gaps_total,
+        },
+    }
+
+
+def encode_payload(state: Any, table_key: int, sector_k: int = 2) -> bytes:
+    return json.dumps(table_payload(state, table_key, sector_k), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass
+class _Entry:
+    body: bytes = b""
+    etag: str = ""
+    version: int = 0
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+@dataclass
+class ApiStats:
+    requests: int = 0
+    not_modified: int = 0
+    long_polls: int = 0
+
+
+class SnapshotCache:
+    """Bytes prontos por mesa + um evento por versão (acorda quem está no long-poll)."""
+
+    def __init__(self) -> None:
+        # etag muda a cada boot: cliente com etag de antes do restart não leva 304 falso
+        self.boot = f"{int(time.time()):x}{os.getpid():x}"
+        self.entries: Dict[int, _Entry] = {}
+        self.index = _Entry()
+
+    def publish(self, table_key: int, body: bytes) -> None:
+        e = self.entries.get(table_key)
+        if e is None:
+            e = self.entries[table_key] = _Entry()
+        e.version += 1
+        e.body = body
+        e.etag = f'"{self.boot}-{table_key}-{e.version}"'
+        self._bump(e)
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        data = {"tables": {str(k): {"etag": e.etag, "version": e.version} for k, e in sorted(self.entries.items())}}
+        self.index.body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.index.version += 1
+        self.index.etag = f'"{self.boot}-index-{self.index.version}"'
+        self._bump(self.index)
+
+    @staticmethod
+    def _bump(e: _Entry) -> None:
+        # troca o evento: quem já acordou não fica preso no set() antigo
+        old, e.changed = e.changed, asyncio.Event()
+        old.set()
+
+    def get(self, table_key: int) -> Optional[_Entry]:
+        return self.entries.get(table_key)
+
+
+class ApiHandler:
+    def __init__(self, cache: SnapshotCache, max_wait: float = 60.0) -> None:
+        self.cache = cache
+        self.max_wait = max_wait
+        self.stats = ApiStats()
+        self.waiting = 0
+
+    async def __call__(self, req: HttpRequest) -> HttpResponse:
+        if req.method != "GET":
+            raise HttpError(405)
+        self.stats.requests += 1
+
+        if req.path == "/healthz":
+            return HttpResponse(200, b"ok", "text/plain")
+        if req.path in ("/v1/tables", "/v1/tables/"):
+            return await self._serve(req, self.cache.index)
+        if req.path.startswith("/v1/tables/"):
+            try:
+                key = int(req.path[len("/v1/tables/"):].strip("/"))
+            except ValueError:
+                raise HttpError(404)
+            entry = self.cache.get(key)
+            if entry is None:
+                raise HttpError(404)
+            return await self._serve(req, entry)
+        raise HttpError(404)
+
+    async def _serve(self, req: HttpRequest, entry: _Entry) -> HttpResponse:
+        inm = req.headers.get("if-none-match", "")
+        try:
+            wait = min(self.max_wait, max(0.0, float(req.query.get("wait", "0") or 0)))
+        except ValueError:
+            raise HttpError(400, "bad wait")
+
+        if inm == entry.etag and wait > 0:
+            # long-poll: espera a próxima versão (o corpo já vem pronto de quem publicou)
+            self.stats.long_polls += 1
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(entry.changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.waiting -= 1
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if inm == entry.etag:
+            self.stats.not_modified += 1
+            return HttpResponse(304, b"", headers=headers)
+        return HttpResponse(200, entry.body, headers=headers)
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{s.requests} req | {s.not_modified} x 304 | {s.long_polls} long-poll(s), "
+            f"{self.waiting} esperando agora | {len(self.cache.entries)} mesa(s)"
+        )
+
+
+async def start_api(host: str, port: int, cache: SnapshotCache) -> tuple:
+    """Sobe o servidor. Retorna (server, handler, porta real)."""
+    from bot.config import API_LONGPOLL_MAX
+
+    handler = ApiHandler(cache, max_wait=API_LONGPOLL_MAX)
+    server, real_port = await start_http_server(host, port, handler)
+    return server, handler, real_port
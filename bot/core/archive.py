@@ -0,0 +1,320 @@
+﻿# Arquivo bruto dos giros (pra /export e python -m bot.export)
+# - 1 linha CSV por giro (gameId,número,horário SP) em DATA_DIR/spins/<mesa>/<AAAA-MM-DD>.csv
+#   (dia de SP, mesmo dos rollups; só append)
+# - no loop o giro só entra numa lista (O(1)); a gravação é em lote, numa thread
+# - export lê dia a dia, linha a linha, e escreve em pedaços de EXPORT_CHUNK_ROWS:
+#   memória fixa, não importa se são mil ou dezenas de milhões de linhas
+# - CSV sai em gzip; parquet (colunar, zstd) só com pyarrow instalado
+# - várias réplicas (DATA_DIR compartilhado): só o líder grava; o seguidor guarda só a
+#   cauda recente e, ao assumir, descarta o que o líder antigo já tinha gravado
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bot.core.analytics import result_number
+from bot.core.rollups import DAY_FMT, bucket_keys, now_sp
+
+
+EXPORT_COLUMNS = ("table", "game_id", "number", "time")
+EXPORT_FORMATS = ("csv", "parquet")
+# giros acumulados sem conseguir gravar (disco cheio): acima disso descarta os mais antigos
+PENDING_MAX = 100_000
+# seguidor: cobre o que o líder antigo pode não ter gravado (TTL do lease + 1 rodada de flush)
+FOLLOWER_PENDING_MAX = 2_000
+
+
+class ExportError(Exception):
+    pass
+
+
+def archive_dir(data_dir: str, table_key: int) -> str:
+    return os.path.join(data_dir, "spins", str(table_key))
+
+
+def _tail_ids(path: str, nbytes: int = 64 * 1024) -> Set[str]:
+    """gameIds das últimas linhas do arquivo (o WS reenvia o histórico a cada conexão)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            start = max(0, f.tell() - nbytes)
+            f.seek(start)
+            lines = f.read().decode("utf-8", "replace").splitlines()
+    except OSError:
+        return set()
+    # começou no meio do arquivo: a 1ª linha vem cortada
+    return {line.split(",", 1)[0] for line in lines[1 if start else 0 :] if line}
+
+
+@dataclass
+class SpinArchive:
+    table_key: int
+    data_dir: str
+    pending: List[Tuple[str, str]] = field(default_factory=list)    # (dia, linha)
+    written: int = 0
+    # gameIds já gravados antes do boot: o 1º frame do WS traz o histórico de novo
+    boot_ids: Set[str] = field(default_factory=set)
+    active: bool = True                      # False = réplica seguidora (não grava)
+
+    def load_boot_ids(self) -> None:
+        days = archive_days(self.data_dir, self.table_key)
+        if days:
+            self.boot_ids = _tail_ids(os.path.join(archive_dir(self.data_dir, self.table_key), f"{days[-1]}.csv"))
+
+    def on_spin(self, r: Dict[str, object]) -> None:
+        """Sink do add_results: giro novo (já deduplicado) -> fila de gravação."""
+        gid = str(r.get("gameId", "") or "")
+        if gid in self.boot_ids:
+            return
+        n = result_number(r)
+        time_sp = r.get("time") or ""
+        day = bucket_keys(str(time_sp) if time_sp else None)[1]
+        self.pending.append((day, f"{gid},{'' if n is None else n},{time_sp}\n"))
+        cap = PENDING_MAX if self.active else FOLLOWER_PENDING_MAX
+        if len(self.pending) > cap:
+            del self.pending[: len(self.pending) - cap]
+
+    def set_active(self, active: bool) -> None:
+        """Líder grava; seguidor só enfileira a cauda. Ao assumir: tira o que já está no arquivo."""
+        if active and not self.active:
+            self.load_boot_ids()
+            # fila em ordem de chegada: do último que já está no arquivo pra trás, tudo já foi gravado
+            gids = [line.split(",", 1)[0] for _, line in self.pending]
+            last = max((i for i, gid in enumerate(gids) if gid in self.boot_ids), default=-1)
+            self.pending = [p for p, gid in zip(self.pending[last + 1 :], gids[last + 1 :]) if gid not in self.boot_ids]
+        self.active = active
+
+
+def _append_lines(data_dir: str, table_key: int, batch: List[Tuple[str, str]]) -> None:
+    """Thread: 1 open/append por dia tocado no lote."""
+    by_day: Dict[str, List[str]] = {}
+    for day, line in batch:
+        by_day.setdefault(day, []).append(line)
+    base = archive_dir(data_dir, table_key)
+    os.makedirs(base, exist_ok=True)
+    for day, lines in by_day.items():
+        with open(os.path.join(base, f"{day}.csv"), "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+
+async def flush_archives(items: Iterable[SpinArchive]) -> None:
+    """Troca a fila no loop (o sink continua enchendo a nova), grava em thread."""
+    for a in items:
+        if not a.pending or not a.active:
+            continue
+        batch, a.pending = a.pending, []
+        try:
+            await asyncio.to_thread(_append_lines, a.data_dir, a.table_key, batch)
+        except OSError:
+            # disco cheio/sem permissão: volta pra fila e tenta na próxima rodada
+            a.pending[:0] = batch
+            continue
+        a.written += len(batch)
+
+
+async def archive_loop(get_items: Callable[[], Iterable[SpinArchive]], every: float) -> None:
+    try:
+        while True:
+            await asyncio.sleep(every)
+            await flush_archives(list(get_items()))
+    finally:
+        # cancelado no shutdown: grava o que ficou na fila
+        await flush_archives(list(get_items()))
+
+
+def new_archive(table_key: int) -> Optional[SpinArchive]:
+    """None com ARCHIVE_SPINS=0."""
+    from bot.config import ARCHIVE_SPINS, DATA_DIR
+
+    if not ARCHIVE_SPINS:
+        return None
+    a = SpinArchive(table_key=table_key, data_dir=DATA_DIR)
+    a.load_boot_ids()
+    return a
+
+
+# =========================
+# Leitura / export
+# =========================
+def archive_tables(data_dir: str) -> List[int]:
+    try:
+        names = os.listdir(os.path.join(data_dir, "spins"))
+    except OSError:
+        return []
+    return sorted(int(n) for n in names if n.isdigit())
+
+
+def archive_days(data_dir: str, table_key: int) -> List[str]:
+    try:
+        names = os.listdir(archive_dir(data_dir, table_key))
+    except OSError:
+        return []
+    # nome = AAAA-MM-DD.csv: ordem alfabética = ordem de data
+    return sorted(n[:-4] for n in names if n.endswith(".csv") and len(n) == 14)
+
+
+def day_range(periodo: str, now: Optional[datetime] = None) -> Tuple[str, str, str]:
+    """
+    periodo: hoje | ontem | Nd (ex: 7d) | AAAA-MM-DD | AAAA-MM-DD:AAAA-MM-DD | tudo
+    -> (primeiro dia, último dia, rótulo pro nome do arquivo). ValueError se não reconhecer.
+    """
+    now = now or now_sp()
+    p = (periodo or "hoje").strip().lower()
+    if p == "tudo":
+        return "0000-00-00", "9999-99-99", "tudo"
+    if p == "hoje":
+        d = now.strftime(DAY_FMT)
+        return d, d, d
+    if p == "ontem":
+        d = (now - timedelta(days=1)).strftime(DAY_FMT)
+        return d, d, d
+    if p.endswith("d") and p[:-1].isdigit():
+        n = max(1, int(p[:-1]))
+        first = (now - timedelta(days=n - 1)).strftime(DAY_FMT)
+        return first, now.strftime(DAY_FMT), f"{first}_{now.strftime(DAY_FMT)}"
+    first, _, last = p.partition(":")
+    first = datetime.strptime(first, DAY_FMT).strftime(DAY_FMT)
+    last = datetime.strptime(last, DAY_FMT).strftime(DAY_FMT) if last else first
+    if last < first:
+        first, last = last, first
+    return first, last, first if first == last else f"{first}_{last}"
+
+
+def iter_spins(data_dir: str, table_key: int, first_day: str, last_day: str) -> Iterator[Tuple[str, Optional[int], str]]:
+    """(gameId, número, horário) do período, em ordem de dia; lê linha a linha."""
+    base = archive_dir(data_dir, table_key)
+    for day in archive_days(data_dir, table_key):
+        if not first_day <= day <= last_day:
+            continue
+        try:
+            f = open(os.path.join(base, f"{day}.csv"), "r", encoding="utf-8")
+        except OSError:
+            continue
+        with f:
+            for line in f:
+                parts = line.rstrip("\n").split(",", 2)
+                if len(parts) != 3 or not parts[0] or "," in parts[2]:
+                    # linha cortada (processo morto no meio do append) grudada na seguinte
+                    continue
+                gid, num, time_sp = parts
+                yield gid, int(num) if num.isdigit() else None, time_sp
+
+
+def _chunks(data_dir: str, tables: List[int], first_day: str, last_day: str, size: int) -> Iterator[List[tuple]]:
+    chunk: List[tuple] = []
+    for table_key in tables:
+        for gid, n, time_sp in iter_spins(data_dir, table_key, first_day, last_day):
+            chunk.append((table_key, gid, n, time_sp))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_csv(chunks: Iterator[List[tuple]], path: str) -> int:
+    rows = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+        w = csv.writer(f)
+        w.writerow(EXPORT_COLUMNS)
+        for chunk in chunks:
+            w.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(chunks: Iterator[List[tuple]], path: str) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("parquet precisa do pyarrow (pip install pyarrow); use csv") from None
+
+    schema = pa.schema(
+        [
+            ("table", pa.int32()),
+            ("game_id", pa.string()),
+            ("number", pa.int8()),
+            ("time", pa.timestamp("s")),
+        ]
+    )
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as w:
+        for chunk in chunks:
+            table_col, gid_col, num_col, time_col = zip(*chunk)
+            # horário (SP, sem fuso) convertido em lote, não linha a linha
+            times = pc.strptime(pa.array(time_col, pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True)
+            w.write_table(
+                pa.Table.from_arrays(
+                    [pa.array(table_col, pa.int32()), pa.array(gid_col, pa.string()), pa.array(num_col, pa.int8()), times],
+                    schema=schema,
+                ),
+                row_group_size=len(chunk),
+            )
+            rows += len(chunk)
+    return rows
+
+
+@dataclass
+class ExportResult:
+    path: str
+    rows: int
+    size: int
+    tables: List[int]
+
+
+def export_filename(tables: List[int], label: str, fmt: str) -> str:
+    who = str(tables[0]) if len(tables) == 1 else f"{len(tables)}mesas"
+    return f"giros_{who}_{label}" + (".csv.gz" if fmt == "csv" else ".parquet")
+
+
+def export_spins(
+    data_dir: str,
+    tables: List[int],
+    first_day: str,
+    last_day: str,
+    fmt: str,
+    path: str,
+    chunk_rows: int = 50_000,
+) -> ExportResult:
+    """
+    Bloqueante (rodar em thread/fora do loop). Grava em path + ".tmp" e troca no fim:
+    export pela metade nunca fica com o nome final.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"formato desconhecido: {fmt} (use {' ou '.join(EXPORT_FORMATS)})")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    chunks = _chunks(data_dir, tables, first_day, last_day, max(1, chunk_rows))
+    try:
+        rows = (_write_csv if fmt == "csv" else _write_parquet)(chunks, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return ExportResult(path=path, rows=rows, size=os.path.getsize(path), tables=tables)
+
+
+_running = asyncio.Lock()
+
+
+async def run_export(
+    data_dir: str,
+    tables: List[int],
+    first_day: str,
+    last_day: str,
+    fmt: str,
+    path: str,
+    chunk_rows: int = 50_000,
+) -> ExportResult:
+    """export_spins numa thread (o loop segue ingerindo); um /export por vez."""
+    if _running.locked():
+        raise RuntimeError("já tem um /export rodando")
+    async with _running:
+        return await asyncio.to_thread(export_spins, data_dir, tables, first_day, last_day, fmt, path, chunk_rows)
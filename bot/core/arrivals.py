@@ -0,0 +1,85 @@
+﻿# Várias conexões WS na mesma mesa: quem entrega cada giro primeiro?
+# - o dedup de verdade continua no add_results (gameId global)
+# - aqui é só a medição: vitórias e atraso de cada conexão vs a mais rápida
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# quantos gameIds recentes a gente lembra pra comparar chegadas
+ARRIVALS_MAX = 500
+
+
+@dataclass
+class ConnArrivals:
+    name: str
+    arrivals: int = 0        # giros novos entregues (primeira vez nessa conexão)
+    wins: int = 0            # entregou antes de todas as outras
+    late: int = 0            # chegou depois de outra conexão
+    lag_total: float = 0.0   # soma do atraso (s) quando chegou depois
+    lag_max: float = 0.0
+
+    def win_pct(self) -> float:
+        if self.arrivals <= 0:
+            return 0.0
+        return (self.wins / self.arrivals) * 100.0
+
+    def avg_lag_ms(self) -> float:
+        if self.late <= 0:
+            return 0.0
+        return (self.lag_total / self.late) * 1000.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: 1º em {self.wins}/{self.arrivals} ({self.win_pct():.0f}%) | "
+            f"atraso méd {self.avg_lag_ms():.0f}ms (máx {self.lag_max * 1000:.0f}ms)"
+        )
+
+
+@dataclass
+class ArrivalTracker:
+    conns: Dict[str, ConnArrivals] = field(default_factory=dict)
+    # gameId -> (conexão que entregou primeiro, quando)
+    _first: "OrderedDict[str, Tuple[str, float]]" = field(default_factory=OrderedDict)
+
+    def conn(self, name: str) -> ConnArrivals:
+        c = self.conns.get(name)
+        if c is None:
+            c = ConnArrivals(name=name)
+            self.conns[name] = c
+        return c
+
+    def on_arrival(self, name: str, game_ids: Iterable[str], now: Optional[float] = None) -> int:
+        """
+        Registra giros NOVOS pra essa conexão (não o histórico do 1º frame).
+        Retorna quantos ela entregou antes de todo mundo.
+        """
+        now = time.time() if now is None else now
+        c = self.conn(name)
+        won = 0
+        for gid in game_ids:
+            c.arrivals += 1
+            first = self._first.get(gid)
+            if first is None:
+                self._first[gid] = (name, now)
+                c.wins += 1
+                won += 1
+                continue
+            first_name, first_ts = first
+            if first_name == name:
+                continue
+            lag = max(0.0, now - first_ts)
+            c.late += 1
+            c.lag_total += lag
+            if lag > c.lag_max:
+                c.lag_max = lag
+
+        while len(self._first) > ARRIVALS_MAX:
+            self._first.popitem(last=False)
+        return won
+
+    def summaries(self) -> List[str]:
+        return [c.summary() for c in self.conns.values()]
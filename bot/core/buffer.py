@@ -3,6 +3,8 @@
 from datetime import datetime
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from bot.core.analytics import result_number
+from bot.core.views import RingView, slide_window
 from bot.storage.state import BotState, SEEN_IDS_MAX
 
 
@@ -41,6 +43,24 @@ def _normalize_game_id(value: Any) -> Optional[str]:
     return s if s else None
 
 
+def _window_append(state: BotState, r: Dict[str, Any]) -> None:
+    """
+    Coloca um resultado no log da mesa e mantém os contadores incrementais
+    de cada janela em uso (a padrão + as das visões dos assinantes):
+    - número novo entra (e o mais antigo da janela sai, se ela está cheia)
+    - par (último -> novo) entra; com a janela cheia, o par (mais antigo -> segundo) sai
+    O(1) por giro por tamanho de janela.
+    """
+    results = state.results
+    cur = result_number(r)
+
+    slide_window(results, state.window_size, state.window_stats, state.transitions, cur)
+    for wc in state.window_views.values():
+        wc.slide(results, cur)
+
+    results.append(r)
+
+
 def add_results(state: BotState, incoming: Iterable[Dict[str, Any]]) -> int:
     """
     Dedup GLOBAL por gameId:
@@ -53,6 +73,20 @@ def add_results(state: BotState, incoming: Iterable[Dict[str, Any]]) -> int:
 
     items.sort(key=_time_key)
 
+    # buraco entre o que a gente tinha e esse lote? (só olha a "emenda")
+    fresh: List[Dict[str, Any]] = []
+    overlap = False
+    for r in items:
+        gid = _normalize_game_id(r.get("gameId"))
+        if gid is None:
+            continue
+        if gid in state.seen_game_ids:
+            overlap = True
+        else:
+            fresh.append(r)
+    if fresh:
+        state.gaps.check_seam(_time_key(fresh[0])[0], overlap, state.spin_clock.interval)
+
     added = 0
     last_num: Optional[int] = None
 
@@ -73,14 +107,20 @@ def add_results(state: BotState, incoming: Iterable[Dict[str, Any]]) -> int:
             old = state.seen_game_ids_queue.popleft()
             state.seen_game_ids.discard(old)
 
-        # adiciona na janela visível (deque já controla maxlen)
-        state.results.append(r)
+        # adiciona no log (buffer circular: sobrescreve o mais antigo) e desliza as janelas
+        _window_append(state, r)
         added += 1
-
-        try:
-            last_num = int(r.get("result", r.get("number")))
-        except Exception:
-            pass
+        state.gaps.on_spin(_time_key(r)[0])
+        for sink in state.spin_sinks:
+            sink(r)
+
+        n = result_number(r)
+        if n is not None:
+            last_num = n
+            # alertas: só as regras das categorias tocadas (disparos ficam em state.alerts.pending)
+            state.alerts.on_spin(n)
+            if state.rollups is not None:
+                state.rollups.on_spin(n, r.get("time"), gid)
 
     if added > 0:
         state.total_games += added
@@ -90,9 +130,11 @@ def add_results(state: BotState, incoming: Iterable[Dict[str, Any]]) -> int:
     return added
 
 
-def current_window_label(state: BotState) -> int:
-    return state.window_size if len(state.results) >= state.window_size else len(state.results)
+def current_window_label(state: BotState, window: Optional[int] = None) -> int:
+    window = window or state.window_size
+    return window if len(state.results) >= window else len(state.results)
 
 
-def last_n_results(state: BotState) -> List[Dict[str, Any]]:
-    return list(state.results)
+def last_n_results(state: BotState, window: Optional[int] = None) -> RingView:
+    """Os giros da janela (últimos N do log da mesa), sem copiar."""
+    return state.results.tail(window or state.window_size)
@@ -0,0 +1,26 @@
+﻿# Implementação do event loop: EVENT_LOOP=auto|uvloop|asyncio
+# - uvloop é opcional (pip install uvloop): instalado = usado no "auto"
+# - pedido e não instalado: cai no asyncio da stdlib (o bot sobe do mesmo jeito)
+# - escolhe pela policy ANTES de criar o loop: vale pro run_polling, pro asyncio.run
+#   do webhook/réplica e pros workers (cada processo chama no início)
+from __future__ import annotations
+
+import asyncio
+
+
+def install_event_loop(choice: str = "auto") -> str:
+    """Instala a policy pedida. Retorna o que ficou valendo ("uvloop" ou "asyncio")."""
+    if choice == "asyncio":
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def loop_name(loop: asyncio.AbstractEventLoop) -> str:
+    """Nome do loop rodando (o que vale é o loop de fato, não o que foi pedido)."""
+    module = type(loop).__module__.split(".")[0]
+    return "uvloop" if module == "uvloop" else "asyncio"
@@ -1,9 +1,18 @@
 ﻿from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-
-from bot.core.analytics import compute_analytics, get_cor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bot.config import SECTOR_NEIGHBORS
+from bot.core.analytics import (
+    COLOR_KEYS,
+    GROUP_KEYS,
+    WHEEL_SIZE,
+    TransitionCounts,
+    compute_analytics_from_counts,
+    get_cor,
+)
 from bot.core.buffer import current_window_label, last_n_results
+from bot.core.views import ReportView
 from bot.storage.state import BotState
 from bot.telegram import texts
 
@@ -37,7 +46,7 @@ def _grid_colors(nums: List[int], per_row: int = 5) -> str:
     return "\n".join(" ".join(to_emoji(n) for n in row) for row in rows)
 
 
-def _extract_numbers(results: List[Dict[str, Any]]) -> List[int]:
+def _extract_numbers(results: Iterable[Dict[str, Any]]) -> List[int]:
     out: List[int] = []
     for r in results:
         try:
@@ -49,32 +58,62 @@ def _extract_numbers(results: List[Dict[str, Any]]) -> List[int]:
     return out
 
 
-def render_report(state: BotState) -> str:
+# Grupos de blocos => uma mensagem fixa por grupo no layout "multi".
+# O topo (horário/progresso) muda todo giro; o resto só quando os dados mudam.
+REPORT_GROUPS: Tuple[Tuple[str, ...], ...] = (
+    ("header", "updated", "status", "progress"),
+    ("numbers", "colors"),
+    ("contagem", "zeros", "duzias", "colunas", "regioes"),
+    ("setores", "transicoes", "desvios"),
+    ("footer", "ws"),
+)
+
+REPORT_BLOCKS: Tuple[str, ...] = tuple(name for group in REPORT_GROUPS for name in group)
+# sempre aparecem, mesmo numa visão com poucos blocos
+FIXED_BLOCKS: Tuple[str, ...] = ("header", "updated", "ws")
+
+LAYOUT_SINGLE = "single"
+LAYOUT_MULTI = "multi"
+
+
+def render_report_blocks(state: BotState, view: Optional[ReportView] = None) -> Dict[str, str]:
+    """Blocos do relatório na visão pedida (None = janela padrão, todos os blocos)."""
     # horário e data CERTOS (UTC−3)
     date_str = texts.fmt_date_br()
 
-    results = last_n_results(state)
+    window = view.window if view is not None else state.window_size
+    window_stats, transitions = state.window_counters(window)
+
+    results = last_n_results(state, window)
     nums = _extract_numbers(results)
 
-    visible_window = current_window_label(state)  # 0..window_size
-    ready = len(results) >= state.window_size
+    visible_window = current_window_label(state, window)  # 0..window
 
-    header = texts.header_block(ROULETTE_NAME, date_str)
+    name = ROULETTE_NAME if state.table_key is None else f"{ROULETTE_NAME} · mesa {state.table_key}"
+    header = texts.header_block(name, date_str)
     updated = texts.updated_time_block()
 
-    status = texts.status_block(total_games=state.total_games, window_size=state.window_size)
+    status = texts.status_block(
+        total_games=state.total_games,
+        window_size=window,
+        missing=state.gaps.missing_total,
+        gaps=state.gaps.gaps_total,
+    )
 
     progress = texts.loading_block(
-        progress_bar=state.progress_bar(20),
-        count=state.progress_count(),
-        window=state.window_size,
-        percent=state.progress_percent(),
+        progress_bar=state.progress_bar(20, window),
+        count=state.progress_count(window),
+        window=window,
+        percent=state.progress_percent(window),
     )
 
     numbers = texts.numbers_block(_grid_numbers(nums, 5), total=len(nums))
     colors = texts.colors_block(_grid_colors(nums, 5), total=len(nums))
 
-    analytics = compute_analytics(results, window_label=visible_window)
+    # contadores incrementais da janela (O(37), não reescaneia os resultados)
+    analytics = compute_analytics_from_counts(
+        window_stats.pockets, window_label=visible_window, sector_k=SECTOR_NEIGHBORS
+    )
 
     contagem = texts.count_block(
         window=visible_window,
@@ -92,26 +131,86 @@ def render_report(state: BotState) -> str:
     duzias = texts.dominance_duzias_block(window=visible_window, items=analytics.duzias_rank)
     colunas = texts.dominance_colunas_block(window=visible_window, items=analytics.colunas_rank)
     regioes = texts.region_rank_block(window=visible_window, items=analytics.regioes_rank)
+    setores = texts.sector_block(window=visible_window, k=analytics.sector_k, items=analytics.setores_rank)
 
-    footer = texts.footer_block(total_games=state.total_games, last_number=state.last_number)
-
-    msg = (
-        header
-        + updated
-        + status
-        + progress
-        + numbers
-        + colors
-        + contagem
-        + zeros
-        + duzias
-        + colunas
-        + regioes
-        + footer
+    transicoes = texts.transitions_block(window=visible_window, tc=transitions)
+    desvios = texts.deviation_block(
+        window=visible_window,
+        tests=window_stats.family_tests(),
+        deviations=window_stats.deviations(),
     )
 
+    footer = texts.footer_block(total_games=state.total_games, last_number=state.last_number)
+
     # se WS estiver caído, mostra uma linha (discreta) no final
+    ws = ""
     if (not state.ws_connected) and state.ws_last_error:
-        msg += f"\n⚠️ WS offline: {state.ws_last_error}\n"
+        ws = f"\n⚠️ WS offline: {state.ws_last_error}\n"
+
+    blocks = {
+        "header": header,
+        "updated": updated,
+        "status": status,
+        "progress": progress,
+        "numbers": numbers,
+        "colors": colors,
+        "contagem": contagem,
+        "zeros": zeros,
+        "duzias": duzias,
+        "colunas": colunas,
+        "regioes": regioes,
+        "setores": setores,
+        "transicoes": transicoes,
+        "desvios": desvios,
+        "footer": footer,
+        "ws": ws,
+    }
+    if view is not None and view.blocks:
+        # bloco desligado vira vazio (a ordem e as partes do layout não mudam)
+        on = set(view.blocks) | set(FIXED_BLOCKS)
+        blocks = {name: (text if name in on else "") for name, text in blocks.items()}
+    return blocks
+
+
+def render_report(state: BotState) -> str:
+    return "".join(render_report_blocks(state).values())
+
+
+def render_report_parts(state: BotState, layout: str = LAYOUT_SINGLE, view: Optional[ReportView] = None) -> List[str]:
+    """
+    Relatório em partes (uma mensagem fixa por parte).
+    - single: 1 parte com tudo (igual render_report)
+    - multi: 1 parte por grupo de REPORT_GROUPS
+    """
+    blocks = render_report_blocks(state, view)
+    if layout != LAYOUT_MULTI:
+        return ["".join(blocks.values())]
+
+    # Telegram ignora \n nas pontas; tira aqui pra comparação com o cache bater
+    # (grupo todo desligado na visão: "—", mensagem vazia o Telegram recusa)
+    return ["".join(blocks[name] for name in group).strip("\n") or "—" for group in REPORT_GROUPS]
 
-    return msg
+
+def render_view_reports(state: BotState, layout: str, views: Iterable[ReportView]) -> Dict[ReportView, List[str]]:
+    """1 render por visão distinta; todos os assinantes da visão recebem o mesmo texto."""
+    return {view: render_report_parts(state, layout, view) for view in views}
+
+
+def _matrix_csv(name: str, labels: List[str], rows: List[List[int]]) -> List[str]:
+    lines = [f"# {name}", "de\\pra," + ",".join(labels)]
+    for label, row in zip(labels, rows):
+        lines.append(label + "," + ",".join(str(v) for v in row))
+    lines.append("")
+    return lines
+
+
+def render_transitions_csv(tc: TransitionCounts) -> str:
+    """Exporta as 4 matrizes de transição (cor, dúzia, coluna, casa) num CSV só."""
+    casas = [tc.casas[i * WHEEL_SIZE:(i + 1) * WHEEL_SIZE] for i in range(WHEEL_SIZE)]
+
+    lines: List[str] = []
+    lines += _matrix_csv("cores", list(COLOR_KEYS), tc.cores)
+    lines += _matrix_csv("duzias", list(GROUP_KEYS), tc.duzias)
+    lines += _matrix_csv("colunas", list(GROUP_KEYS), tc.colunas)
+    lines += _matrix_csv("casas", [str(n) for n in range(WHEEL_SIZE)], casas)
+    return "\n".join(lines)
@@ -0,0 +1,75 @@
+﻿# Buracos no histórico: giros que a mesa rodou mas o bot nunca viu
+# - last20Results é uma lista CONTÍNUA da mesa: se o lote novo tem algum gameId
+#   já visto, não faltou nada entre ele e o que a gente tinha
+# - sem sobreposição (reconexão longa): estima quantos giros caíram no meio
+#   pelo horário (gap / intervalo típico entre giros)
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Optional
+
+
+@dataclass
+class GapEvent:
+    ts: float           # quando foi detectado
+    missing: int        # giros perdidos (estimados); 0 = não deu pra estimar
+    seconds: float      # tamanho do buraco pelo horário dos giros (0 = sem horário)
+
+
+@dataclass
+class GapTracker:
+    last_spin_ts: float = 0.0   # horário (epoch) do último giro aceito
+
+    missing_total: int = 0
+    gaps_total: int = 0
+    unknown_gaps: int = 0       # buraco sem horário pra estimar o tamanho
+    recent: Deque[GapEvent] = field(default_factory=lambda: deque(maxlen=20))
+
+    def on_spin(self, spin_ts: float) -> None:
+        if spin_ts > self.last_spin_ts:
+            self.last_spin_ts = spin_ts
+
+    def check_seam(self, oldest_ts: float, overlap: bool, interval: float) -> int:
+        """
+        Chamado com o lote novo (antes de aceitar os giros):
+        - overlap: algum gameId do lote já era conhecido
+        - oldest_ts: horário do giro NOVO mais antigo do lote (0 = sem horário)
+        Retorna quantos giros foram dados como perdidos.
+        """
+        if overlap or self.last_spin_ts <= 0:
+            return 0
+
+        if oldest_ts <= 0:
+            self.gaps_total += 1
+            self.unknown_gaps += 1
+            self.recent.append(GapEvent(ts=time.time(), missing=0, seconds=0.0))
+            return 0
+
+        hole = oldest_ts - self.last_spin_ts
+        if interval <= 0 or hole <= 0:
+            return 0
+        # hole ≈ (perdidos + 1) x intervalo
+        missing = int(round(hole / interval)) - 1
+        if missing <= 0:
+            return 0
+
+        self.gaps_total += 1
+        self.missing_total += missing
+        self.recent.append(GapEvent(ts=time.time(), missing=missing, seconds=hole))
+        return missing
+
+    def break_seam(self) -> None:
+        """Pausa proposital (/stop): o que rolar até voltar não conta como perdido."""
+        self.last_spin_ts = 0.0
+
+    def last_gap(self) -> Optional[GapEvent]:
+        return self.recent[-1] if self.recent else None
+
+    def reset(self) -> None:
+        self.last_spin_ts = 0.0
+        self.missing_total = 0
+        self.gaps_total = 0
+        self.unknown_gaps = 0
+        self.recent.clear()
@@ -0,0 +1,158 @@
+﻿# HTTP/1.1 mínimo em cima de asyncio.start_server (sem dependência extra)
+# Só o necessário pros endpoints internos: webhook do Telegram e afins.
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+# conexão keep-alive parada esse tempo sem request nova: fecha (o Telegram deixa aberta)
+IDLE_TIMEOUT = 75.0
+
+_REASONS = {
+    200: "OK",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str = "") -> None:
+        super().__init__(message or _REASONS.get(status, ""))
+        self.status = status
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]  # chaves em minúsculo
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+@dataclass
+class HttpResponse:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "application/json"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def encode(self, keep_alive: bool) -> bytes:
+        reason = _REASONS.get(self.status, "")
+        lines = [f"HTTP/1.1 {self.status} {reason}"]
+        hdrs = {
+            "Content-Type": self.content_type,
+            "Content-Length": str(len(self.body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        hdrs.update(self.headers)
+        for k, v in hdrs.items():
+            lines.append(f"{k}: {v}")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head + self.body
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+    """Lê 1 request. None = conexão fechou sem request."""
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "headers too large")
+
+    if len(raw) > MAX_HEADER_BYTES:
+        raise HttpError(400, "headers too large")
+
+    head = raw.decode("latin-1").split("\r\n")
+    try:
+        method, target, _version = head[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "bad request line")
+
+    headers: Dict[str, str] = {}
+    for line in head[1:]:
+        if not line:
+            continue
+        k, _, v = line.partition(":")
+        headers[k.strip().lower()] = v.strip()
+
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise HttpError(400, "bad content-length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413)
+
+    body = await reader.readexactly(length) if length > 0 else b""
+
+    parts = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    return HttpRequest(method=method.upper(), path=parts.path or "/", query=query, headers=headers, body=body)
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+async def serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, handler: Handler) -> None:
+    """Atende requests em sequência na mesma conexão (keep-alive) até fechar."""
+    try:
+        while True:
+            try:
+                req = await asyncio.wait_for(read_request(reader), timeout=IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+            except HttpError as e:
+                writer.write(HttpResponse(e.status, str(e).encode(), "text/plain").encode(False))
+                await writer.drain()
+                return
+            if req is None:
+                return
+
+            try:
+                resp = await handler(req)
+            except HttpError as e:
+                resp = HttpResponse(e.status, str(e).encode(), "text/plain")
+            except Exception:
+                resp = HttpResponse(500, b"internal error", "text/plain")
+
+            writer.write(resp.encode(req.keep_alive))
+            await writer.drain()
+            if not req.keep_alive:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+async def start_http_server(host: str, port: int, handler: Handler) -> Tuple[asyncio.base_events.Server, int]:
+    """Sobe o servidor. Retorna (server, porta real) — porta 0 = escolhe uma livre."""
+    server = await asyncio.start_server(
+        lambda r, w: serve_connection(r, w, handler),
+        host=host,
+        port=port,
+        limit=MAX_HEADER_BYTES * 4,
+    )
+    real_port = server.sockets[0].getsockname()[1] if server.sockets else port
+    return server, real_port
@@ -0,0 +1,119 @@
+﻿# Eleição de líder por lease (várias réplicas do serviço)
+# - todo mundo conecta no WS e ingere (estado "quente" pra assumir na hora)
+# - só o líder fala com o Telegram (polling, edits, alertas)
+# - líder grava o snapshot de controle a cada renovação; seguidores espelham
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from bot.storage.lease import LeaseBackend
+
+
+class LeaderElector:
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        holder: str,
+        ttl: float = 10.0,
+        snapshot: Optional[Callable[[], Dict[str, Any]]] = None,
+        apply_snapshot: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_change: Optional[Callable[[bool], Any]] = None,
+    ) -> None:
+        self.backend = backend
+        self.holder = holder
+        self.ttl = max(1.0, float(ttl))
+        self.snapshot = snapshot
+        self.apply_snapshot = apply_snapshot
+        self.on_change = on_change
+
+        self.is_leader = False
+        self.token = 0
+        self.leader_since = 0.0
+        self.last_ok = 0.0            # monotonic da última renovação OK
+        self.last_error: Optional[str] = None
+        self.elections = 0
+        self.current_holder: Optional[str] = None
+
+    @property
+    def interval(self) -> float:
+        # renova 3x dentro do prazo: 1 falha de rede não derruba o líder
+        return self.ttl / 3.0
+
+    async def _set_leader(self, leader: bool) -> None:
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if leader:
+            self.elections += 1
+            self.leader_since = time.time()
+        if self.on_change:
+            res = self.on_change(leader)
+            if asyncio.iscoroutine(res):
+                await res
+
+    async def tick(self) -> None:
+        """Uma rodada: pega/renova o lease e sincroniza o snapshot."""
+        try:
+            await self._tick()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            # sem falar com o backend (lease OU snapshot) não dá pra garantir que ainda
+            # é dono: larga ANTES do lease vencer (outro pode assumir logo depois)
+            if self.is_leader and (time.monotonic() - self.last_ok) > self.ttl * 0.66:
+                await self._set_leader(False)
+
+    async def _tick(self) -> None:
+        info = await asyncio.to_thread(self.backend.acquire, self.holder, self.ttl)
+        if info is not None:
+            self.token = info.token
+            self.current_holder = self.holder
+            if self.snapshot is not None:
+                if not await asyncio.to_thread(self.backend.put_snapshot, self.holder, self.snapshot()):
+                    # lease venceu entre o acquire e a gravação: outro já pode ser o dono
+                    await self._set_leader(False)
+                    return
+            # só conta como renovado com o snapshot gravado (o seguidor assume a partir dele)
+            self.last_ok = time.monotonic()
+            self.last_error = None
+            await self._set_leader(True)
+            return
+
+        # seguidor: espelha o controle do líder (assinantes/message_ids, janela, on/off)
+        await self._set_leader(False)
+        cur = await asyncio.to_thread(self.backend.current)
+        self.current_holder = cur.holder if cur is not None else None
+        if self.apply_snapshot is not None:
+            snap = await asyncio.to_thread(self.backend.get_snapshot)
+            if snap:
+                self.apply_snapshot(snap)
+        self.last_error = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                # on_change/apply_snapshot com erro: a eleição não pode parar (o lease vence sozinho)
+                self.last_error = f"{type(e).__name__}: {e}"
+            await asyncio.sleep(self.interval)
+
+    async def release(self) -> None:
+        """Saída limpa: libera o lease (o seguidor assume na próxima rodada dele)."""
+        if not self.is_leader:
+            return
+        try:
+            if self.snapshot is not None:
+                await asyncio.to_thread(self.backend.put_snapshot, self.holder, self.snapshot())
+            await asyncio.to_thread(self.backend.release, self.holder)
+        except Exception:
+            pass
+        await self._set_leader(False)
+
+    def summary(self) -> str:
+        role = "líder ✅" if self.is_leader else f"seguidor (líder: {self.current_holder or '—'})"
+        txt = f"{self.holder}: {role} | token {self.token} | eleições {self.elections} | ttl {self.ttl:.0f}s"
+        if self.last_error:
+            txt += f" | erro: {self.last_error}"
+        return txt
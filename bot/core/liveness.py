@@ -0,0 +1,212 @@
+﻿# Saúde do feed do WS: "conectado" não quer dizer "recebendo dados"
+# - conexão meio-aberta responde ping mas para de mandar last20Results
+# - o intervalo típico entre giros é aprendido (EWMA dos gaps observados)
+# - watchdog: sem last20Results por FEED_STALE_FACTOR x intervalo => reconecta
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class SpinClock:
+    """
+    Intervalo típico entre giros (s), aprendido dos gaps entre giros NOVOS.
+    Compartilhado entre conexões (o ritmo é da mesa, não do socket).
+    """
+    interval: float = 45.0
+    floor: float = 10.0
+    ceiling: float = 180.0
+    alpha: float = 0.2
+
+    samples: int = 0
+    last_gap: float = 0.0
+
+    def observe(self, gap: float) -> None:
+        if gap <= 0:
+            return
+        # gap absurdo (mesa pausada, reconexão) não ensina nada
+        if gap > self.ceiling * 2:
+            return
+        gap = min(self.ceiling, max(self.floor, gap))
+        self.last_gap = gap
+        if self.samples == 0:
+            self.interval = gap
+        else:
+            self.interval += self.alpha * (gap - self.interval)
+        self.samples += 1
+
+
+@dataclass
+class FeedLiveness:
+    """
+    Liveness de UMA conexão (zera a cada connect):
+    - last_frame_ts: último frame qualquer (JSON válido)
+    - last_results_ts: último frame com last20Results
+    - last_spin_ts: último giro NOVO visto nessa conexão
+    """
+    name: str = "ws1"
+    clock: SpinClock = field(default_factory=SpinClock)
+    stale_factor: float = 3.0
+    stale_min: float = 30.0
+    stale_max: float = 600.0
+
+    connected_ts: float = 0.0
+    last_frame_ts: float = 0.0
+    last_results_ts: float = 0.0
+    last_spin_ts: float = 0.0
+    frames: int = 0
+    spins: int = 0
+
+    # gameIds do último last20Results (pra saber quantos giros são novos)
+    _last_ids: List[str] = field(default_factory=list)
+    # giros novos do último frame (vazio no 1º frame da conexão = só histórico)
+    new_ids: List[str] = field(default_factory=list)
+
+    # histórico (sobrevive às reconexões)
+    stale_reconnects: int = 0
+    last_stale_reason: Optional[str] = None
+    disconnected_ts: float = 0.0
+    reconnects: int = 0
+    first_data_latency: float = 0.0    # connect -> primeiro last20Results (última reconexão)
+    outage_seconds: float = 0.0        # queda -> primeiro last20Results (última reconexão)
+    max_outage_seconds: float = 0.0
+
+    def on_disconnect(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        # só a PRIMEIRA queda conta (tentativas que falham não empurram o início)
+        if self.disconnected_ts <= 0 and self.connected_ts > 0:
+            self.disconnected_ts = now
+        self.connected_ts = 0.0
+
+    def on_connect(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.connected_ts = now
+        self.last_frame_ts = 0.0
+        self.last_results_ts = 0.0
+        self.last_spin_ts = 0.0
+        self.frames = 0
+        self.spins = 0
+        self._last_ids = []
+        self.new_ids = []
+
+    def on_frame(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.last_frame_ts = now
+        self.frames += 1
+
+    def on_results(self, batch: List[Dict[str, Any]], now: Optional[float] = None) -> int:
+        """
+        Marca um last20Results. Retorna quantos giros novos vieram
+        (em relação ao frame anterior DESSA conexão).
+        """
+        now = time.time() if now is None else now
+        self.last_results_ts = now
+
+        ids = [str(r.get("gameId")) for r in batch]
+        if not self._last_ids:
+            # primeiro frame da conexão: é só o histórico, não dá pra medir gap
+            self._last_ids = ids
+            self.new_ids = []
+            self._first_data(now)
+            return 0
+
+        prev = set(self._last_ids)
+        self.new_ids = [gid for gid in ids if gid not in prev]
+        self._last_ids = ids
+        new = len(self.new_ids)
+        if new <= 0:
+            return 0
+
+        if self.last_spin_ts > 0:
+            # mais de 1 giro novo no mesmo frame: divide o gap
+            self.clock.observe((now - self.last_spin_ts) / new)
+        self.last_spin_ts = now
+        self.spins += new
+        return new
+
+    def _first_data(self, now: float) -> None:
+        self.first_data_latency = max(0.0, now - self.connected_ts)
+        if self.disconnected_ts > 0:
+            self.reconnects += 1
+            self.outage_seconds = max(0.0, now - self.disconnected_ts)
+            self.max_outage_seconds = max(self.max_outage_seconds, self.outage_seconds)
+            self.disconnected_ts = 0.0
+
+    def threshold(self) -> float:
+        """Quanto tempo (s) sem last20Results é considerado feed parado."""
+        t = self.clock.interval * self.stale_factor
+        return min(self.stale_max, max(self.stale_min, t))
+
+    def silent_for(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        ref = self.last_results_ts or self.connected_ts
+        if ref <= 0:
+            return 0.0
+        return max(0.0, now - ref)
+
+    def time_left(self, now: Optional[float] = None) -> float:
+        return max(0.0, self.threshold() - self.silent_for(now))
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return self.connected_ts > 0 and self.time_left(now) <= 0
+
+    def mark_stale(self, now: Optional[float] = None) -> str:
+        silent = self.silent_for(now)
+        self.stale_reconnects += 1
+        self.last_stale_reason = f"sem last20Results há {silent:.0f}s (limite {self.threshold():.0f}s)"
+        return self.last_stale_reason
+
+    def connected(self) -> bool:
+        return self.connected_ts > 0
+
+    def summary(self, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        if self.connected_ts <= 0:
+            return "sem conexão"
+
+        def ago(ts: float) -> str:
+            return f"{now - ts:.0f}s" if ts > 0 else "—"
+
+        return (
+            f"último frame {ago(self.last_frame_ts)} | "
+            f"último last20Results {ago(self.last_results_ts)} | "
+            f"último giro novo {ago(self.last_spin_ts)} | "
+            f"giro a cada ~{self.clock.interval:.0f}s ({self.clock.samples} amostras) | "
+            f"limite {self.threshold():.0f}s | reconexões por feed parado: {self.stale_reconnects}"
+        )
+
+    def reconnect_summary(self) -> str:
+        if self.reconnects <= 0:
+            return "nenhuma"
+        return (
+            f"{self.reconnects}x | última: 1º dado {self.first_data_latency:.1f}s após conectar, "
+            f"{self.outage_seconds:.1f}s sem dados (pior {self.max_outage_seconds:.1f}s)"
+        )
+
+
+def new_spin_clock() -> SpinClock:
+    from bot.config import FEED_SPIN_INTERVAL
+
+    return SpinClock(interval=FEED_SPIN_INTERVAL)
+
+
+def new_liveness(name: str = "ws1", clock: Optional[SpinClock] = None) -> FeedLiveness:
+    """Liveness com os parâmetros das variáveis de ambiente."""
+    from bot.config import (
+        FEED_STALE_FACTOR,
+        FEED_STALE_MIN_SECONDS,
+        FEED_STALE_MAX_SECONDS,
+    )
+
+    if clock is None:
+        clock = new_spin_clock()
+    stale_min = max(1.0, FEED_STALE_MIN_SECONDS)
+    return FeedLiveness(
+        name=name,
+        clock=clock,
+        stale_factor=max(1.5, FEED_STALE_FACTOR),
+        stale_min=stale_min,
+        stale_max=max(stale_min, FEED_STALE_MAX_SECONDS),
+    )
@@ -0,0 +1,202 @@
+﻿# Memória do processo (roda semanas num container pequeno)
+# - RSS lido do /proc (barato) + amostragem periódica pra ver tendência
+# - custo aproximado das estruturas de cada BotState (log, dedup, visões, rollups...)
+# - tracemalloc só sob demanda (/mem trace): tem custo enquanto está ligado
+# - alerta opcional quando o RSS cresce mais que X MB desde o boot
+from __future__ import annotations
+
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+def rss_kb(pid: Optional[int] = None) -> int:
+    """RSS atual em KB (Linux). Fora do Linux cai no pico do getrusage."""
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS devolve bytes, Linux KB
+        return peak // 1024 if sys.platform == "darwin" else peak
+    except (ImportError, OSError):
+        return 0
+
+
+def fmt_kb(kb: float) -> str:
+    return f"{kb / 1024:.1f} MB" if kb >= 1024 else f"{kb:.0f} KB"
+
+
+def _container_bytes(items: Any, deep: bool = True) -> int:
+    total = sys.getsizeof(items)
+    if not deep:
+        return total
+    for it in items:
+        total += sys.getsizeof(it)
+        if isinstance(it, dict):
+            total += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in it.items())
+    return total
+
+
+def state_footprint(state: Any) -> Dict[str, Tuple[int, int]]:
+    """estrutura -> (itens, bytes aprox.). O(janela + dedup): só sob demanda / na amostragem."""
+    out: Dict[str, Tuple[int, int]] = {
+        "log": (len(state.results), _container_bytes(state.results)),
+        "dedup_ids": (len(state.seen_game_ids), _container_bytes(state.seen_game_ids)),
+        # a fila aponta pras MESMAS strings do set: só o container conta
+        "dedup_fila": (len(state.seen_game_ids_queue), _container_bytes(state.seen_game_ids_queue, deep=False)),
+        "assinantes": (len(state.subscribers), _container_bytes(state.subscribers, deep=False)),
+    }
+    views = getattr(state, "window_views", None)
+    if views:
+        # 1 jogo de contadores por tamanho de janela em uso (não por assinante)
+        out["visoes"] = (len(views), sum(sys.getsizeof(wc.transitions.casas) for wc in views.values()))
+    rollups = getattr(state, "rollups", None)
+    if rollups is not None:
+        buckets = len(rollups.hours) + len(rollups.days)
+        # bucket = lista de 37 ints pequenos (cache do CPython): só a lista pesa
+        out["rollups"] = (buckets, buckets * sys.getsizeof([0] * 37))
+    return out
+
+
+def footprint_total(fp: Dict[str, Tuple[int, int]]) -> int:
+    return sum(b for _, b in fp.values())
+
+
+def footprint_line(fp: Dict[str, Tuple[int, int]]) -> str:
+    parts = [f"{k} {n} (~{fmt_kb(b / 1024)})" for k, (n, b) in fp.items()]
+    return " | ".join(parts) + f" | total ~{fmt_kb(footprint_total(fp) / 1024)}"
+
+
+@dataclass
+class MemSample:
+    ts: float
+    rss_kb: int
+
+
+@dataclass
+class MemorySampler:
+    every: float = 300.0
+    alert_growth_mb: float = 0.0      # 0 = sem alerta
+    samples: Deque[MemSample] = field(default_factory=lambda: deque(maxlen=288))
+
+    baseline_kb: int = 0
+    peak_kb: int = 0
+    alerts_sent: int = 0
+    _next_alert_kb: int = 0
+
+    # tracemalloc (/mem trace | /mem diff)
+    _snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def sample(self) -> MemSample:
+        s = MemSample(ts=time.time(), rss_kb=rss_kb())
+        if not self.samples:
+            self.baseline_kb = s.rss_kb
+            self._next_alert_kb = s.rss_kb + int(self.alert_growth_mb * 1024)
+        self.samples.append(s)
+        self.peak_kb = max(self.peak_kb, s.rss_kb)
+        return s
+
+    def check_growth(self, s: MemSample) -> Optional[str]:
+        """Texto do alerta quando passa do próximo degrau (baseline + k * limite)."""
+        if self.alert_growth_mb <= 0 or s.rss_kb < self._next_alert_kb:
+            return None
+        step = int(self.alert_growth_mb * 1024)
+        while self._next_alert_kb <= s.rss_kb:
+            self._next_alert_kb += step
+        self.alerts_sent += 1
+        hours = (s.ts - self.samples[0].ts) / 3600.0
+        return (
+            "🧠 ALERTA DE MEMÓRIA\n\n"
+            f"RSS {fmt_kb(s.rss_kb)} (+{fmt_kb(s.rss_kb - self.baseline_kb)} em {hours:.1f}h)\n"
+            "Use /mem pra ver por estrutura e /mem trace + /mem diff pra achar quem cresce."
+        )
+
+    async def run(self, on_alert: Optional[Callable[[str], Any]] = None) -> None:
+        while True:
+            s = self.sample()
+            text = self.check_growth(s)
+            if text and on_alert:
+                res = on_alert(text)
+                if asyncio.iscoroutine(res):
+                    await res
+            await asyncio.sleep(self.every)
+
+    def trend(self) -> str:
+        if len(self.samples) < 2:
+            return "sem amostras suficientes"
+        first, last = self.samples[0], self.samples[-1]
+        hours = (last.ts - first.ts) / 3600.0
+        txt = f"{fmt_kb(first.rss_kb)} -> {fmt_kb(last.rss_kb)} em {hours:.1f}h"
+        if hours >= 0.5:
+            # taxa só com janela razoável (senão o aquecimento do boot vira "vazamento")
+            txt += f" ({(last.rss_kb - first.rss_kb) / hours / 1024:+.2f} MB/h)"
+        return txt
+
+    # ---------- tracemalloc ----------
+    def trace_start(self, frames: int = 1) -> str:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._snapshot = self._take()
+        return "tracemalloc ligado; snapshot base tirado. Espere um tempo e mande /mem diff."
+
+    def trace_stop(self) -> str:
+        self._snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            return "tracemalloc desligado."
+        return "tracemalloc já estava desligado."
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        # tira as alocações do próprio tracemalloc/importlib da conta
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            )
+        )
+
+    def trace_diff(self, top: int = 10) -> str:
+        """Top-N linhas que mais cresceram desde o último snapshot (e vira a nova base)."""
+        if not tracemalloc.is_tracing() or self._snapshot is None:
+            return "tracemalloc desligado. Mande /mem trace primeiro."
+        new = self._take()
+        stats = new.compare_to(self._snapshot, "lineno")
+        self._snapshot = new
+        lines: List[str] = []
+        for st in stats[:top]:
+            frame = st.traceback[0]
+            name = os.sep.join(frame.filename.split(os.sep)[-2:])
+            lines.append(
+                f"{name}:{frame.lineno} {st.size_diff / 1024:+.1f} KB ({st.count_diff:+d} obj) = {st.size / 1024:.1f} KB"
+            )
+        cur, peak = tracemalloc.get_traced_memory()
+        head = f"rastreado agora {fmt_kb(cur / 1024)} (pico {fmt_kb(peak / 1024)})"
+        return head + "\n\n" + ("\n".join(lines) if lines else "nada cresceu")
+
+
+def gc_summary() -> str:
+    """Objetos vivos no gc (O(objetos), só sob demanda)."""
+    counts = gc.get_count()
+    return f"{len(gc.get_objects())} objetos rastreados | gerações {counts[0]}/{counts[1]}/{counts[2]}"
+
+
+def new_memory_sampler() -> MemorySampler:
+    from bot.config import MEM_ALERT_GROWTH_MB, MEM_SAMPLE_SECONDS
+
+    return MemorySampler(every=MEM_SAMPLE_SECONDS, alert_growth_mb=MEM_ALERT_GROWTH_MB)
@@ -0,0 +1,102 @@
+﻿# Ritmo adaptativo de edição por chat (guiado pelo 429 / RetryAfter do Telegram)
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Optional
+
+
+@dataclass
+class EditPacer:
+    """
+    AIMD simples por chat:
+    - 429 (RetryAfter): respeita o retry_after e multiplica o intervalo (backoff)
+    - edit OK: encolhe o intervalo aos poucos, sondando de volta até o piso
+    """
+    interval: float = 1.2
+    floor: float = 1.0
+    ceiling: float = 30.0
+    backoff_factor: float = 2.0
+    probe_factor: float = 0.9
+
+    last_edit_ts: float = 0.0
+    blocked_until: float = 0.0
+
+    # métricas
+    ok_count: int = 0
+    retry_after_count: int = 0
+    backoff_seconds: float = 0.0
+    recent_edits: Deque[float] = field(default_factory=deque)
+
+    def ready(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if now < self.blocked_until:
+            return False
+        return (now - self.last_edit_ts) >= self.interval
+
+    def next_ready_in(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        at = max(self.blocked_until, self.last_edit_ts + self.interval)
+        return max(0.0, at - now)
+
+    def on_success(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.last_edit_ts = now
+        self.ok_count += 1
+        self.recent_edits.append(now)
+        self._trim(now)
+        self.interval = max(self.floor, self.interval * self.probe_factor)
+
+    def on_retry_after(self, retry_after: float, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        retry_after = max(0.0, float(retry_after))
+        self.retry_after_count += 1
+        # não conta duas vezes o mesmo período bloqueado
+        self.backoff_seconds += max(0.0, now + retry_after - max(now, self.blocked_until))
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.interval = min(self.ceiling, max(self.interval * self.backoff_factor, self.floor))
+
+    def _trim(self, now: float) -> None:
+        while self.recent_edits and (now - self.recent_edits[0]) > 60.0:
+            self.recent_edits.popleft()
+
+    def edits_per_minute(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        self._trim(now)
+        return len(self.recent_edits)
+
+    def in_backoff(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now < self.blocked_until
+
+
+def new_pacer() -> EditPacer:
+    """Pacer com os parâmetros das variáveis de ambiente."""
+    from bot.config import (
+        MIN_SECONDS_BETWEEN_EDITS,
+        EDIT_INTERVAL_FLOOR,
+        EDIT_INTERVAL_MAX,
+        EDIT_BACKOFF_FACTOR,
+        EDIT_PROBE_FACTOR,
+    )
+
+    floor = min(EDIT_INTERVAL_FLOOR, MIN_SECONDS_BETWEEN_EDITS)
+    return EditPacer(
+        interval=MIN_SECONDS_BETWEEN_EDITS,
+        floor=floor,
+        ceiling=max(EDIT_INTERVAL_MAX, MIN_SECONDS_BETWEEN_EDITS),
+        backoff_factor=max(1.0, EDIT_BACKOFF_FACTOR),
+        probe_factor=min(1.0, max(0.1, EDIT_PROBE_FACTOR)),
+    )
+
+
+def retry_after_seconds(value) -> float:
+    """RetryAfter.retry_after pode vir int (PTB 21) ou timedelta (versões novas)."""
+    total = getattr(value, "total_seconds", None)
+    if callable(total):
+        return float(total())
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 1.0
@@ -0,0 +1,293 @@
+﻿# Profiler por amostragem (sob demanda, /profile N) + monitor de travada do event loop
+# - amostra a pilha do loop a cada ~5ms (SIGALRM na thread principal; thread como reserva):
+#   nada é instrumentado, custo zero quando desligado
+# - saída no formato "collapsed" (pilha;pilha;folha contagem) — abre direto no
+#   flamegraph.pl / speedscope / inferno
+# - cada amostra ganha uma raiz com a etapa do bot (ws_receive, add_results,
+#   compute_analytics, render_report, edit, bot_api, idle...) = etapa mais interna da pilha
+# - monitor de travada: o loop bate um "ponto" a cada probe; se uma thread vê o
+#   ponto parado há mais que o limite, guarda a pilha do callback que está travando
+# - histograma do atraso de agendamento (quanto o sleep do probe passou do combinado):
+#   dá pra comparar asyncio x uvloop com a mesma carga
+from __future__ import annotations
+
+import asyncio
+import bisect
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+# (etapa, arquivo, funções) — a 1ª que bater, da folha pra raiz, é a etapa da amostra
+STAGE_RULES: Tuple[Tuple[str, str, Tuple[str, ...]], ...] = (
+    ("compute_analytics", "analytics.py", ("compute_analytics", "compute_analytics_from_counts")),
+    ("render_report", "formatter.py", ("render_report_parts", "render_report", "render_report_blocks")),
+    ("add_results", "buffer.py", ("add_results",)),
+    ("edit", "messenger.py", ("_edit_part", "edit_fixed_message", "send_fixed_message")),
+    ("ws_receive", "websocket_client.py", ("_read_loop",)),
+)
+# bibliotecas: etapa pelo pacote (quando nenhuma função do bot está mais perto da folha)
+STAGE_PACKAGES: Tuple[Tuple[str, str], ...] = (
+    ("ws_receive", f"{os.sep}websockets{os.sep}"),
+    ("bot_api", f"{os.sep}telegram{os.sep}_"),
+    ("bot_api", f"{os.sep}httpx{os.sep}"),
+    ("bot_api", f"{os.sep}httpcore{os.sep}"),
+)
+# uvloop: o loop é C, então ocioso = nenhum frame Python acima do run_forever
+IDLE_FUNCS = ("select", "poll", "epoll", "_run_once", "run_forever")
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+def _stack(frame: Optional[FrameType]) -> List[FrameType]:
+    out: List[FrameType] = []
+    while frame is not None:
+        out.append(frame)
+        frame = frame.f_back
+    out.reverse()  # raiz -> folha
+    return out
+
+
+def stage_of(frames: List[FrameType]) -> str:
+    for fr in reversed(frames):
+        code = fr.f_code
+        base = os.path.basename(code.co_filename)
+        for stage, filename, funcs in STAGE_RULES:
+            if base == filename and code.co_name in funcs:
+                return stage
+    for fr in reversed(frames):
+        path = fr.f_code.co_filename
+        for stage, needle in STAGE_PACKAGES:
+            if needle in path:
+                return stage
+    leaf = frames[-1].f_code if frames else None
+    if leaf is not None and (leaf.co_name in IDLE_FUNCS or os.path.basename(leaf.co_filename) == "selectors.py"):
+        return "idle"
+    return "outros"
+
+
+@dataclass
+class ProfileResult:
+    seconds: float
+    samples: int
+    stacks: Counter
+    stages: Counter
+
+    def collapsed(self) -> bytes:
+        lines = [f"{stack} {n}" for stack, n in self.stacks.most_common()]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def stage_summary(self) -> str:
+        if self.samples <= 0:
+            return "sem amostras"
+        parts = [f"{st} {n * 100 / self.samples:.0f}%" for st, n in self.stages.most_common()]
+        return " | ".join(parts)
+
+
+class SamplingProfiler:
+    """
+    Amostra a pilha da thread do loop.
+    - loop na thread principal (normal): SIGALRM via setitimer; o handler roda no
+      próprio loop, entre dois bytecodes = pilha exata (inclusive tempo ocioso no select)
+    - fora dela (ou sem setitimer): thread lendo sys._current_frames. Tende a cair
+      onde o loop solta o GIL (I/O), então subestima CPU puro
+    """
+
+    def __init__(self, target_thread_id: int, interval: float = 0.005) -> None:
+        self.target = target_thread_id
+        self.interval = max(0.001, interval)
+        self.stacks: Counter = Counter()
+        self.stages: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._old_handler = None
+        self.use_signal = hasattr(signal, "setitimer") and target_thread_id == threading.main_thread().ident
+
+    def _record(self, frame: Optional[FrameType]) -> None:
+        if frame is None:
+            return
+        frames = _stack(frame)
+        stage = stage_of(frames)
+        self.stacks[";".join([f"[{stage}]"] + [_frame_name(f) for f in frames])] += 1
+        self.stages[stage] += 1
+        self.samples += 1
+
+    def _on_signal(self, signum: int, frame: Optional[FrameType]) -> None:
+        self._record(frame)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._record(sys._current_frames().get(self.target))
+
+    def start(self) -> None:
+        if self.use_signal:
+            self._old_handler = signal.signal(signal.SIGALRM, self._on_signal)
+            signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+            return
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self.use_signal:
+            # timer antes do handler: SIGALRM sem handler derruba o processo
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._old_handler or signal.SIG_DFL)
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+_running = asyncio.Lock()
+
+
+async def profile_loop(seconds: float, interval: float = 0.005) -> ProfileResult:
+    """Perfila a thread do loop atual por `seconds` (um /profile por vez)."""
+    if _running.locked():
+        raise RuntimeError("já tem um /profile rodando")
+    async with _running:
+        prof = SamplingProfiler(threading.get_ident(), interval)
+        t0 = time.monotonic()
+        prof.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.stop()
+        return ProfileResult(time.monotonic() - t0, prof.samples, prof.stacks, prof.stages)
+
+
+# =========================
+# Travadas do event loop
+# =========================
+# limites (ms) das faixas do histograma de atraso; a última faixa é "acima de 1s"
+LAG_BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+@dataclass
+class SlowCallback:
+    ts: float
+    blocked: float          # segundos que o loop ficou sem rodar
+    stage: str
+    where: str              # folha da pilha na hora (quem estava segurando o loop)
+
+
+@dataclass
+class LoopLagMonitor:
+    probe: float = 0.1
+    threshold: float = 0.1
+
+    max_lag: float = 0.0
+    last_lag: float = 0.0
+    slow_count: int = 0
+    slow: Deque[SlowCallback] = field(default_factory=lambda: deque(maxlen=20))
+    # histograma do atraso desde o boot: hist[i] = probes na faixa i de LAG_BUCKETS_MS
+    hist: List[int] = field(default_factory=lambda: [0] * (len(LAG_BUCKETS_MS) + 1))
+    probes: int = 0
+
+    _beat: float = 0.0
+    _loop_thread: int = 0
+    _captured: bool = False
+    _stop: threading.Event = field(default_factory=threading.Event)
+
+    async def run(self) -> None:
+        """Task no loop: bate o ponto e mede o atraso do próprio sleep."""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        watcher = threading.Thread(target=self._watch, name="loop-lag-watch", daemon=True)
+        watcher.start()
+        try:
+            while True:
+                t0 = time.monotonic()
+                await asyncio.sleep(self.probe)
+                now = time.monotonic()
+                self.last_lag = max(0.0, now - t0 - self.probe)
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.hist[bisect.bisect_left(LAG_BUCKETS_MS, self.last_lag * 1000)] += 1
+                self.probes += 1
+                if self._captured and self.slow:
+                    # a pilha foi tirada no meio da travada: guarda a duração inteira
+                    self.slow[-1].blocked = max(self.slow[-1].blocked, self.last_lag)
+                self._beat = now
+                self._captured = False
+        finally:
+            self._stop.set()
+
+    def _watch(self) -> None:
+        """Thread: loop sem bater o ponto além do limite = callback travando. Guarda a pilha 1x."""
+        step = max(0.01, self.threshold / 2)
+        while not self._stop.wait(step):
+            blocked = time.monotonic() - self._beat - self.probe
+            if blocked < self.threshold or self._captured:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            frames = _stack(frame)
+            self._captured = True
+            self.slow_count += 1
+            self.slow.append(
+                SlowCallback(
+                    ts=time.time(),
+                    blocked=blocked,
+                    stage=stage_of(frames),
+                    where=" <- ".join(_frame_name(f) for f in reversed(frames[-3:])),
+                )
+            )
+
+    def percentile(self, q: float) -> float:
+        """Atraso (ms) no quantil q, pelo limite de cima da faixa (acima de 1s = máx visto)."""
+        if self.probes <= 0:
+            return 0.0
+        need = q * self.probes
+        seen = 0
+        for i, n in enumerate(self.hist):
+            seen += n
+            if seen >= need and n:
+                return LAG_BUCKETS_MS[i] if i < len(LAG_BUCKETS_MS) else self.max_lag * 1000
+        return self.max_lag * 1000
+
+    def stats(self) -> Dict[str, float]:
+        """Resumo pequeno (vai no batimento dos workers)."""
+        return {
+            "p50": self.percentile(0.50),
+            "p99": self.percentile(0.99),
+            "max": round(self.max_lag * 1000, 1),
+            "slow": self.slow_count,
+        }
+
+    def histogram(self) -> str:
+        if self.probes <= 0:
+            return "sem amostras"
+        labels = [f"≤{b:g}ms" for b in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]:g}ms"]
+        parts = [f"{lab} {n * 100 / self.probes:.1f}%" for lab, n in zip(labels, self.hist) if n]
+        return (
+            f"{self.probes} probes | p50 ≤{self.percentile(0.50):g}ms p99 ≤{self.percentile(0.99):g}ms | "
+            + " · ".join(parts)
+        )
+
+    def summary(self) -> str:
+        txt = (
+            f"lag agora {self.last_lag * 1000:.0f}ms | máx {self.max_lag * 1000:.0f}ms | "
+            f"travadas > {self.threshold * 1000:.0f}ms: {self.slow_count}"
+        )
+        if self.slow:
+            s = self.slow[-1]
+            txt += f" | última: {s.blocked * 1000:.0f}ms em [{s.stage}] {s.where}"
+        return txt
+
+
+def new_loop_monitor() -> LoopLagMonitor:
+    from bot.config import LOOP_LAG_PROBE_MS, LOOP_LAG_THRESHOLD_MS
+
+    return LoopLagMonitor(probe=LOOP_LAG_PROBE_MS / 1000.0, threshold=LOOP_LAG_THRESHOLD_MS / 1000.0)
@@ -0,0 +1,264 @@
+﻿# Agregados por hora / por dia de cada mesa (sem guardar giro bruto)
+# - bucket = contagem das 37 casas; cor/par/dúzia/coluna/região/zero saem dela em O(37)
+# - atualizado a cada giro novo (O(1)), chave pelo horário de SP do próprio giro
+# - persistido em JSON compacto (DATA_DIR/rollups/<mesa>.json), gravado de tempos em tempos,
+#   junto com os últimos gameIds contados: o 1º frame do WS (last20Results) repete o histórico
+#   a cada boot/troca de dono da mesa, e o que já está no arquivo não pode contar de novo
+# - várias réplicas: todas contam, só o líder grava o arquivo; quem assume relê o arquivo e
+#   soma por cima só os giros dele que o líder antigo não chegou a gravar
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import pytz
+
+from bot.core.analytics import WHEEL_SIZE
+
+
+# dia "de negócio" = dia em São Paulo (mesmo fuso do relatório)
+TZ_NAME = "America/Sao_Paulo"
+HOUR_FMT = "%Y-%m-%d %H"
+DAY_FMT = "%Y-%m-%d"
+# gameIds guardados com o arquivo (folga sobre os 20 do histórico que o WS reenvia)
+RECENT_IDS_MAX = 500
+# seguidor: giros guardados pra completar o arquivo do líder antigo ao assumir
+FOLLOWER_TAIL_MAX = 2_000
+
+
+def now_sp() -> datetime:
+    """Agora em SP, sem tzinfo (compara direto com o horário dos giros)."""
+    return datetime.now(pytz.timezone(TZ_NAME)).replace(tzinfo=None)
+
+
+def _empty() -> List[int]:
+    return [0] * WHEEL_SIZE
+
+
+def bucket_keys(time_sp: Optional[str], now: Optional[datetime] = None) -> Tuple[str, str]:
+    """
+    (hora, dia) do giro. time_sp já vem em SP ("YYYY-MM-DD HH:MM:SS", normalizado no WS);
+    sem horário, usa o agora de SP.
+    """
+    dt: Optional[datetime] = None
+    if time_sp:
+        try:
+            dt = datetime.strptime(str(time_sp).strip(), "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            dt = None
+    if dt is None:
+        dt = now or now_sp()
+    return dt.strftime(HOUR_FMT), dt.strftime(DAY_FMT)
+
+
+@dataclass
+class TableRollups:
+    table_key: int = 0
+    hours_keep: int = 24 * 14
+    days_keep: int = 400
+
+    hours: Dict[str, List[int]] = field(default_factory=dict)
+    days: Dict[str, List[int]] = field(default_factory=dict)
+    dirty: bool = False
+    # últimos gameIds já contados (fila + set: O(1) pra checar e pra descartar o mais antigo)
+    recent_ids: Deque[str] = field(default_factory=deque)
+    recent_set: Set[str] = field(default_factory=set)
+    active: bool = True                      # False = réplica seguidora (não grava)
+    tail: Deque[Tuple[str, int, Optional[str]]] = field(default_factory=lambda: deque(maxlen=FOLLOWER_TAIL_MAX))
+
+    def add(self, n: int, hour_key: str, day_key: str) -> None:
+        if not (0 <= n < WHEEL_SIZE):
+            return
+        h = self.hours.get(hour_key)
+        if h is None:
+            h = self.hours[hour_key] = _empty()
+            self._trim(self.hours, self.hours_keep)
+        h[n] += 1
+
+        d = self.days.get(day_key)
+        if d is None:
+            d = self.days[day_key] = _empty()
+            self._trim(self.days, self.days_keep)
+        d[n] += 1
+        self.dirty = True
+
+    def on_spin(self, n: int, time_sp: Optional[str], game_id: Optional[str] = None) -> None:
+        if game_id:
+            if game_id in self.recent_set:
+                # já contado antes do boot (veio do arquivo)
+                return
+            self._remember(game_id)
+            if not self.active:
+                self.tail.append((game_id, n, time_sp))
+        self.add(n, *bucket_keys(time_sp))
+
+    def set_active(self, active: bool, data_dir: str) -> None:
+        """
+        Líder grava; seguidor conta em memória e guarda a cauda. Ao assumir: o arquivo do
+        líder antigo é a base, e entram só os giros da cauda depois do último que ele tem.
+        """
+        if active and not self.active:
+            base = load_rollups(data_dir, self.table_key, hours_keep=self.hours_keep, days_keep=self.days_keep)
+            tail = list(self.tail)
+            last = max((i for i, (gid, _, _) in enumerate(tail) if gid in base.recent_set), default=-1)
+            self.hours, self.days = base.hours, base.days
+            self.recent_ids, self.recent_set = base.recent_ids, base.recent_set
+            self.active = True
+            for gid, n, time_sp in tail[last + 1 :]:
+                self.on_spin(n, time_sp, gid)
+            self.tail.clear()
+            self.dirty = True
+        self.active = active
+
+    def _remember(self, game_id: str) -> None:
+        self.recent_ids.append(game_id)
+        self.recent_set.add(game_id)
+        while len(self.recent_ids) > RECENT_IDS_MAX:
+            self.recent_set.discard(self.recent_ids.popleft())
+
+    @staticmethod
+    def _trim(buckets: Dict[str, List[int]], keep: int) -> None:
+        # chaves ISO ordenam por data: remove as mais antigas (só quando abre bucket novo)
+        if len(buckets) <= keep:
+            return
+        for k in sorted(buckets)[: len(buckets) - keep]:
+            del buckets[k]
+
+    # ---------- consulta (O(buckets)) ----------
+    def sum_days(self, day_keys: List[str]) -> List[int]:
+        out = _empty()
+        for k in day_keys:
+            b = self.days.get(k)
+            if b:
+                for i, v in enumerate(b):
+                    out[i] += v
+        return out
+
+    def hours_of_day(self, day_key: str) -> List[Tuple[str, List[int]]]:
+        prefix = day_key + " "
+        return sorted((k, v) for k, v in self.hours.items() if k.startswith(prefix))
+
+    def last_hours(self, now: datetime, n: int) -> List[int]:
+        out = _empty()
+        for i in range(n):
+            b = self.hours.get((now - timedelta(hours=i)).strftime(HOUR_FMT))
+            if b:
+                for j, v in enumerate(b):
+                    out[j] += v
+        return out
+
+    # ---------- persistência ----------
+    def to_json(self) -> Dict[str, object]:
+        return {"table_key": self.table_key, "hours": self.hours, "days": self.days, "recent_ids": list(self.recent_ids)}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, object], **kw) -> "TableRollups":
+        r = cls(**kw)
+        r.table_key = int(data.get("table_key", r.table_key) or 0)
+        for attr in ("hours", "days"):
+            raw = data.get(attr) or {}
+            if isinstance(raw, dict):
+                getattr(r, attr).update(
+                    {str(k): [int(x) for x in v][:WHEEL_SIZE] for k, v in raw.items() if isinstance(v, list)}
+                )
+        # arquivo antigo (sem recent_ids): o 1º frame depois do boot ainda pode contar 2x, uma vez só
+        raw_ids = data.get("recent_ids") or []
+        if isinstance(raw_ids, list):
+            for gid in raw_ids[-RECENT_IDS_MAX:]:
+                r._remember(str(gid))
+        return r
+
+
+def query(
+    r: TableRollups, periodo: str, now: Optional[datetime] = None
+) -> Tuple[str, List[int], List[Tuple[str, List[int]]]]:
+    """
+    periodo: hoje | ontem | 24h | Nd (ex: 7d) | YYYY-MM-DD
+    -> (rótulo, contagem por casa somada, horas do dia quando é um dia só)
+    ValueError se não reconhecer.
+    """
+    now = now or now_sp()
+    p = (periodo or "hoje").strip().lower()
+
+    day: Optional[str] = None
+    if p == "hoje":
+        day = now.strftime(DAY_FMT)
+    elif p == "ontem":
+        day = (now - timedelta(days=1)).strftime(DAY_FMT)
+    elif p.endswith("h") and p[:-1].isdigit():
+        n = max(1, min(r.hours_keep, int(p[:-1])))
+        return f"últimas {n}h", r.last_hours(now, n), []
+    elif p.endswith("d") and p[:-1].isdigit():
+        n = max(1, min(r.days_keep, int(p[:-1])))
+        keys = [(now - timedelta(days=i)).strftime(DAY_FMT) for i in range(n)]
+        return f"últimos {n} dias", r.sum_days(keys), []
+    else:
+        day = datetime.strptime(p, DAY_FMT).strftime(DAY_FMT)
+
+    label = datetime.strptime(day, DAY_FMT).strftime("%d/%m/%Y")
+    return label, r.sum_days([day]), r.hours_of_day(day)
+
+
+def rollup_path(data_dir: str, table_key: int) -> str:
+    return os.path.join(data_dir, "rollups", f"{table_key}.json")
+
+
+def load_rollups(data_dir: str, table_key: int, **kw) -> TableRollups:
+    path = rollup_path(data_dir, table_key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            r = TableRollups.from_json(json.load(f), **kw)
+    except (OSError, ValueError):
+        r = TableRollups(**kw)
+    r.table_key = table_key
+    return r
+
+
+def _write_atomic(path: str, payload: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def save_rollups(data_dir: str, r: TableRollups) -> None:
+    """Grava atômico (tmp + replace)."""
+    _write_atomic(rollup_path(data_dir, r.table_key), json.dumps(r.to_json(), separators=(",", ":")))
+    r.dirty = False
+
+
+async def flush_rollups(data_dir: str, items: Iterable[TableRollups]) -> None:
+    """Só as mesas com giro novo. Serializa no loop (dict muda a cada giro), grava em thread."""
+    for r in items:
+        if not r.dirty or not r.active:
+            continue
+        payload = json.dumps(r.to_json(), separators=(",", ":"))
+        r.dirty = False
+        try:
+            await asyncio.to_thread(_write_atomic, rollup_path(data_dir, r.table_key), payload)
+        except OSError:
+            # disco cheio/sem permissão: tenta de novo na próxima rodada
+            r.dirty = True
+
+
+async def flush_loop(data_dir: str, get_items: Callable[[], Iterable[TableRollups]], every: float) -> None:
+    try:
+        while True:
+            await asyncio.sleep(every)
+            await flush_rollups(data_dir, list(get_items()))
+    finally:
+        # cancelado no shutdown: não perde a última hora
+        await flush_rollups(data_dir, list(get_items()))
+
+
+def new_rollups(table_key: int) -> TableRollups:
+    """Rollups da mesa já com o que estava salvo em disco."""
+    from bot.config import DATA_DIR, ROLLUP_DAYS_KEEP, ROLLUP_HOURS_KEEP
+
+    return load_rollups(DATA_DIR, table_key, hours_keep=ROLLUP_HOURS_KEEP, days_keep=ROLLUP_DAYS_KEEP)
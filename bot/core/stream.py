@@ -0,0 +1,208 @@
+﻿# Saída em stream dos giros normalizados (pra outros serviços internos não abrirem
+# conexão própria com a Pragmatic)
+# - 1 linha JSON por giro (NDJSON), serializada 1x e reaproveitada pra todos
+# - seq global crescente; os últimos N giros ficam num buffer circular pra retomada
+# - seq recomeça em cada boot: epoch (ms do boot) vai em cada linha e identifica a sequência
+# - cada assinante tem fila limitada: se não acompanha, é desconectado (não segura os outros)
+#
+# Protocolo (Unix socket ou TCP):
+#   cliente -> 1ª linha opcional: epoch e último seq que já tem (ex: "1760870000000:1234\n");
+#              só o seq ("1234\n") ainda vale, mas aí não dá pra saber se é de outro boot;
+#              sem nada = só ao vivo
+#   servidor -> {"type":"spin","epoch":E,"seq":1235,"table":204,"gameId":"...","number":17,"time":"..."}
+#               {"type":"gap","epoch":E,"from":10,"to":99}    pedido mais antigo que o buffer (perdidos)
+#               {"type":"reset","epoch":E,"from_epoch":E0}   seq pedido é de outro boot: o que veio
+#                   depois dele lá se perdeu; segue a sequência nova desde o começo (ou gap)
+#
+#   STREAM_LISTEN="unix:/tmp/roleta.sock"  ou  "tcp:127.0.0.1:9100"
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from bot.core.analytics import result_number
+
+
+# (gameId, número, horário SP) — o que cruza o pipe dos workers
+SpinTuple = Tuple[str, Optional[int], Optional[str]]
+
+HELLO_TIMEOUT = 0.5
+WRITE_CHUNK = 256
+
+
+def spin_tuple(r: Dict[str, Any]) -> SpinTuple:
+    return (str(r.get("gameId", "")), result_number(r), r.get("time"))
+
+
+def _line(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+@dataclass
+class StreamStats:
+    published: int = 0
+    connected: int = 0
+    dropped_slow: int = 0
+    resumed: int = 0
+    replayed: int = 0
+    resets: int = 0
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    writer: asyncio.StreamWriter
+    limit: int
+    buf: Deque[bytes] = field(default_factory=deque)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    closed: bool = False
+
+    def offer(self, line: bytes) -> bool:
+        """False = não acompanhou (fila cheia)."""
+        if len(self.buf) >= self.limit:
+            return False
+        self.buf.append(line)
+        self.ready.set()
+        return True
+
+
+class SpinStream:
+    def __init__(self, replay: int = 10_000, sub_buffer: int = 1_000, epoch: Optional[int] = None) -> None:
+        self.epoch = int(time.time() * 1000) if epoch is None else epoch
+        self.seq = 0
+        self.ring: Deque[Tuple[int, bytes]] = deque(maxlen=max(1, replay))
+        self.sub_buffer = max(1, sub_buffer)
+        self.subs: Set[_Subscriber] = set()
+        self.stats = StreamStats()
+
+    # ---------- entrada (loop do ingest) ----------
+    def publish(self, table_key: int, spin: SpinTuple) -> None:
+        self.seq += 1
+        gid, number, ts = spin
+        line = _line(
+            {
+                "type": "spin",
+                "epoch": self.epoch,
+                "seq": self.seq,
+                "table": table_key,
+                "gameId": gid,
+                "number": number,
+                "time": ts,
+            }
+        )
+        self.ring.append((self.seq, line))
+        self.stats.published += 1
+
+        for sub in list(self.subs):
+            if not sub.offer(line):
+                self._drop(sub)
+
+    def _drop(self, sub: _Subscriber) -> None:
+        self.stats.dropped_slow += 1
+        self._close(sub)
+
+    def _close(self, sub: _Subscriber) -> None:
+        if sub.closed:
+            return
+        sub.closed = True
+        sub.ready.set()
+        self.subs.discard(sub)
+        try:
+            sub.writer.close()
+        except Exception:
+            pass
+
+    # ---------- saída (1 task por conexão) ----------
+    def _backlog(self, since: int) -> Tuple[Optional[bytes], List[bytes]]:
+        """Linhas com seq > since que ainda estão no buffer (+ aviso de buraco, se faltou)."""
+        if not self.ring or since >= self.seq:
+            return None, []
+        oldest = self.ring[0][0]
+        gap = None
+        if since + 1 < oldest:
+            gap = _line({"type": "gap", "epoch": self.epoch, "from": since + 1, "to": oldest - 1})
+        # seq é contíguo no ring: pula direto pro índice
+        start = max(0, since + 1 - oldest)
+        return gap, [line for _, line in islice(self.ring, start, None)]
+
+    async def _read_since(self, reader: asyncio.StreamReader) -> Optional[Tuple[Optional[int], int]]:
+        """(epoch, seq) da 1ª linha; epoch None = cliente antigo (só o seq)."""
+        try:
+            raw = await asyncio.wait_for(reader.readline(), timeout=HELLO_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            return None
+        raw = raw.strip()
+        if not raw:
+            return None
+        epoch, _, seq = raw.rpartition(b":")
+        try:
+            return (int(epoch) if epoch else None), max(0, int(seq))
+        except ValueError:
+            return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        hello = await self._read_since(reader)
+
+        sub = _Subscriber(writer=writer, limit=self.sub_buffer)
+        if hello is not None:
+            epoch, since = hello
+            # seq de outro boot (epoch diferente, ou maior que o daqui): a contagem recomeçou
+            if (epoch is not None and epoch != self.epoch) or since > self.seq:
+                sub.buf.append(_line({"type": "reset", "epoch": self.epoch, "from_epoch": epoch}))
+                since = 0
+                self.stats.resets += 1
+            # sem await entre o backlog e o registro: nenhum giro cai no meio
+            gap, lines = self._backlog(since)
+            if gap is not None:
+                sub.buf.append(gap)
+            sub.buf.extend(lines)
+            sub.limit += len(sub.buf)
+            self.stats.resumed += 1
+            self.stats.replayed += len(lines)
+        self.subs.add(sub)
+        self.stats.connected += 1
+
+        try:
+            while not sub.closed:
+                if not sub.buf:
+                    sub.ready.clear()
+                    await sub.ready.wait()
+                    continue
+                n = min(WRITE_CHUNK, len(sub.buf))
+                writer.write(b"".join(sub.buf.popleft() for _ in range(n)))
+                await writer.drain()
+                # backlog da retomada já foi: volta pro limite normal
+                sub.limit = max(self.sub_buffer, len(sub.buf))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._close(sub)
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"epoch {self.epoch} seq {self.seq} | {len(self.subs)} assinante(s) | {s.connected} conexões | "
+            f"{s.dropped_slow} derrubado(s) por lentidão | {s.resumed} retomada(s) ({s.replayed} reenviados, "
+            f"{s.resets} de outro boot)"
+        )
+
+
+async def start_stream_server(listen: str, stream: SpinStream) -> Tuple[asyncio.base_events.Server, str]:
+    """unix:/caminho.sock | tcp:host:porta (porta 0 = livre). Retorna (server, endereço real)."""
+    if listen.startswith("unix:"):
+        path = listen[len("unix:"):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(stream.handle, path=path)
+        return server, listen
+    if listen.startswith("tcp:"):
+        host, _, port = listen[len("tcp:"):].rpartition(":")
+        server = await asyncio.start_server(stream.handle, host=host or "127.0.0.1", port=int(port))
+        real = server.sockets[0].getsockname()[1] if server.sockets else port
+        return server, f"tcp:{host or '127.0.0.1'}:{real}"
+    raise ValueError(f"STREAM_LISTEN inválido: {listen!r} (use unix:/caminho.sock ou tcp:host:porta)")
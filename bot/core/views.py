@@ -0,0 +1,197 @@
+﻿# Visões personalizadas (janela + blocos por assinante) sobre UM log de giros por mesa
+# - o log da mesa (state.results) é um buffer circular de WINDOW_MAX posições, alocado
+#   1x: append sobrescreve o mais antigo; janela = view (início + tamanho), sem cópia
+# - trocar o tamanho da janela não mexe no log (aumentar de novo já vem cheio);
+#   os contadores andam só a diferença entre os tamanhos
+# - contadores incrementais (WindowStats + TransitionCounts): 1 jogo por TAMANHO de janela
+#   em uso, não por assinante (20 chats com janela 20 = 1 jogo só)
+# - ReportView = (janela, blocos): assinantes com a mesma visão recebem o MESMO texto,
+#   renderizado 1x por giro
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from bot.core.analytics import TransitionCounts, WindowStats, result_number
+
+
+class ReportView(NamedTuple):
+    window: int
+    blocks: Tuple[str, ...] = ()    # vazio = todos os blocos
+
+
+class SpinRing:
+    """
+    Buffer circular de capacidade fixa (o log de giros da mesa).
+    Índice igual ao de deque: 0 = mais antigo, -1 = mais novo. Acesso O(1) em qualquer posição.
+    """
+
+    def __init__(self, capacity: int, items: Iterable[Dict[str, Any]] = ()) -> None:
+        self.capacity = max(1, capacity)
+        self._buf: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._start = 0
+        self._len = 0
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Dict[str, Any]) -> None:
+        if self._len < self.capacity:
+            self._buf[(self._start + self._len) % self.capacity] = item
+            self._len += 1
+            return
+        # cheio: sobrescreve o mais antigo
+        self._buf[self._start] = item
+        self._start = (self._start + 1) % self.capacity
+
+    def clear(self) -> None:
+        self._buf = [None] * self.capacity
+        self._start = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("SpinRing index out of range")
+        return self._buf[(self._start + i) % self.capacity]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.tail(self._len))
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self._buf)
+
+    def tail(self, n: int) -> "RingView":
+        """Os últimos n giros, sem copiar (vale até o próximo append)."""
+        n = max(0, min(n, self._len))
+        return RingView(self, (self._start + self._len - n) % self.capacity, n)
+
+
+@dataclass(frozen=True)
+class RingView:
+    """Janela = início (posição no buffer) + tamanho."""
+    ring: SpinRing
+    pos: int
+    length: int
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("RingView index out of range")
+        return self.ring._buf[(self.pos + i) % self.ring.capacity]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        buf, cap = self.ring._buf, self.ring.capacity
+        p = self.pos
+        for _ in range(self.length):
+            yield buf[p]
+            p += 1
+            if p == cap:
+                p = 0
+
+
+def tail_numbers(log: SpinRing, size: int) -> List[Optional[int]]:
+    """Números dos últimos `size` giros do log (O(size))."""
+    return [result_number(r) for r in log.tail(size)]
+
+
+def resize_window(
+    log: SpinRing,
+    old: int,
+    new: int,
+    stats: WindowStats,
+    transitions: TransitionCounts,
+) -> None:
+    """
+    Contadores da janela `old` viram os da janela `new` andando só a diferença:
+    aumentar = os giros mais antigos (e os pares deles) entram; diminuir = saem.
+    O(|new - old|); o log não muda.
+    """
+    n = len(log)
+    w_old, w_new = min(n, old), min(n, new)
+    if w_new == w_old:
+        return
+    lo, hi = n - max(w_old, w_new), n - min(w_old, w_new)
+    if w_new > w_old:
+        push_n, push_p = stats.push, transitions.push
+    else:
+        push_n, push_p = stats.pop, transitions.pop
+    for i in range(lo, hi):
+        cur = result_number(log[i])
+        if cur is not None:
+            push_n(cur)
+        # par (i -> i+1): o da "emenda" (i+1 = 1º da janela menor) também entra/sai
+        if i + 1 < n:
+            nxt = result_number(log[i + 1])
+            if cur is not None and nxt is not None:
+                push_p(cur, nxt)
+
+
+def slide_window(
+    log: SpinRing,
+    size: int,
+    stats: WindowStats,
+    transitions: TransitionCounts,
+    cur: Optional[int],
+) -> None:
+    """
+    Giro `cur` vai entrar no log (chamar ANTES do append), janela de `size`:
+    - janela cheia: o mais antigo dela sai (e o par mais antigo -> segundo junto)
+    - par (último -> novo) entra
+    O(1) por giro.
+    """
+    n = len(log)
+    prev: Optional[int] = None
+    if size >= 2 and n:
+        prev = result_number(log[-1])
+
+    if n >= size:
+        oldest = result_number(log[n - size])
+        if oldest is not None:
+            stats.pop(oldest)
+        if size >= 2:
+            second = result_number(log[n - size + 1])
+            if oldest is not None and second is not None:
+                transitions.pop(oldest, second)
+
+    if cur is not None:
+        stats.push(cur)
+    if prev is not None and cur is not None:
+        transitions.push(prev, cur)
+
+
+@dataclass
+class WindowCounters:
+    """Contadores de UMA janela (tamanho fixo) sobre o log compartilhado."""
+    size: int
+    stats: WindowStats = field(default_factory=WindowStats)
+    transitions: TransitionCounts = field(default_factory=TransitionCounts)
+
+    def rebuild(self, log: SpinRing) -> None:
+        nums = tail_numbers(log, self.size)
+        self.stats.rebuild(nums)
+        self.transitions.rebuild(nums)
+
+    def slide(self, log: SpinRing, cur: Optional[int]) -> None:
+        slide_window(log, self.size, self.stats, self.transitions, cur)
+
+
+def new_view(window: int, blocks: Optional[Tuple[str, ...]] = None) -> ReportView:
+    """Visão canônica: blocos na ordem do relatório, sem repetição (mesma visão = mesmo texto)."""
+    from bot.core.formatter import REPORT_BLOCKS
+
+    if not blocks:
+        return ReportView(window, ())
+    wanted = set(blocks)
+    canon = tuple(b for b in REPORT_BLOCKS if b in wanted)
+    if canon == REPORT_BLOCKS:
+        canon = ()
+    return ReportView(window, canon)
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import asyncio
 import json
+import random
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Callable, Dict, Iterable, List, Optional, Awaitable
@@ -10,6 +11,8 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Awaitable
 import pytz
 import websockets
 
+from bot.core.liveness import FeedLiveness
+
 
 @dataclass
 class WSConfig:
@@ -79,11 +82,81 @@ def _normalize_result(item: Dict[str, Any], tz_name: str) -> Optional[Dict[str,
     return norm
 
 
+# reconexão: 1ª tentativa quase imediata (blip curto não perde giro),
+# depois exponencial com jitter (várias instâncias não batem juntas no servidor)
+BACKOFF_FIRST = (0.1, 0.5)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+def backoff_delay(attempt: int) -> float:
+    """Espera (s) antes da tentativa `attempt` (0 = primeira depois da queda)."""
+    if attempt <= 0:
+        return random.uniform(*BACKOFF_FIRST)
+    cap = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** min(attempt, 10)))
+    return random.uniform(cap / 2, cap)
+
+
+class FeedStale(Exception):
+    """Conexão de pé, mas sem last20Results dentro do limite (watchdog)."""
+
+
+async def _watchdog(liveness: FeedLiveness) -> str:
+    """Retorna (com o motivo) quando o feed dessa conexão fica parado."""
+    while True:
+        left = liveness.time_left()
+        if left <= 0:
+            return liveness.mark_stale()
+        # acorda no prazo; se chegou dado no meio, o prazo andou e ele dorme de novo.
+        # O limite encolhe quando o intervalo é aprendido: não dorme mais que o mínimo.
+        await asyncio.sleep(max(0.05, min(left, liveness.stale_min)))
+
+
+async def _read_loop(
+    websocket: Any,
+    cfg: WSConfig,
+    on_results: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+    should_run: Callable[[], bool],
+    liveness: Optional[FeedLiveness],
+) -> None:
+    while should_run():
+        raw = await websocket.recv()
+        if not raw:
+            continue
+
+        try:
+            data = json.loads(raw)
+        except Exception:
+            continue
+
+        if liveness:
+            liveness.on_frame()
+
+        results = data.get("last20Results")
+        if not results:
+            continue
+        if not isinstance(results, list):
+            continue
+
+        batch: List[Dict[str, Any]] = []
+        for item in results:
+            norm = _normalize_result(item, cfg.tz_name)
+            if norm:
+                batch.append(norm)
+
+        if liveness:
+            liveness.on_results(batch)
+
+        if batch:
+            await on_results(batch)
+
+
 async def ws_run_forever(
     cfg: WSConfig,
     on_results: Callable[[List[Dict[str, Any]]], Awaitable[None]],
     should_run: Callable[[], bool],
     on_connection_change: Optional[Callable[[bool, Optional[str]], None]] = None,
+    liveness: Optional[FeedLiveness] = None,
 ) -> None:
     """
     Loop infinito:
@@ -96,9 +169,12 @@ async def ws_run_forever(
 
     should_run(): se retornar False, o loop finaliza.
     on_connection_change(connected, error_msg): callback opcional pra status.
+    liveness: se vier, marca frames/giros e um watchdog derruba a conexão
+    quando o feed para (mesmo com o ping respondendo).
     """
-    backoff = 2.0
-    backoff_max = 30.0
+    attempt = 0
+    # sem liveness de fora, usa uma local só pra saber se a conexão chegou a entregar dado
+    live = liveness or FeedLiveness()
 
     while should_run():
         try:
@@ -114,32 +190,26 @@ async def ws_run_forever(
                 payload = build_subscribe_payload(cfg.casino_id, cfg.currency, cfg.table_key)
                 await websocket.send(json.dumps(payload))
 
-                backoff = 2.0  # reset backoff quando conecta com sucesso
+                live.on_connect()
 
-                while should_run():
-                    raw = await websocket.recv()
-                    if not raw:
-                        continue
+                reader = asyncio.create_task(_read_loop(websocket, cfg, on_results, should_run, live))
+                tasks = {reader}
+                watchdog = None
+                if liveness:
+                    watchdog = asyncio.create_task(_watchdog(liveness))
+                    tasks.add(watchdog)
 
-                    try:
-                        data = json.loads(raw)
-                    except Exception:
-                        continue
+                try:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for t in tasks:
+                        t.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
 
-                    results = data.get("last20Results")
-                    if not results:
-                        continue
-                    if not isinstance(results, list):
-                        continue
-
-                    batch: List[Dict[str, Any]] = []
-                    for item in results:
-                        norm = _normalize_result(item, cfg.tz_name)
-                        if norm:
-                            batch.append(norm)
-
-                    if batch:
-                        await on_results(batch)
+                if watchdog is not None and watchdog in done:
+                    # half-open: o recv() nunca ia falhar sozinho
+                    raise FeedStale(watchdog.result())
+                reader.result()
 
         except asyncio.CancelledError:
             # encerramento limpo
@@ -151,9 +221,14 @@ async def ws_run_forever(
             if on_connection_change:
                 on_connection_change(False, err)
 
-            # backoff antes de reconectar
-            await asyncio.sleep(backoff)
-            backoff = min(backoff * 1.6, backoff_max)
+            # conexão que chegou a entregar dado = queda nova, volta rápido;
+            # conexão que nem entregou nada = continua subindo o backoff
+            if live.last_results_ts > 0:
+                attempt = 0
+            live.on_disconnect()
+
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
 
     # se should_run() ficou False, sai
     if on_connection_change:
@@ -0,0 +1,78 @@
+﻿# Export dos giros brutos pela linha de comando (mesmo arquivo do /export, sem limite do Telegram)
+#
+#   python -m bot.export --tables 1000,1001 --period 2024-05-01:2024-05-31 --format parquet --out maio.parquet
+#
+# - lê DATA_DIR/spins (o que o bot gravou) dia a dia e escreve em pedaços: memória fixa
+# - pode rodar com o bot de pé (só lê; o dia corrente vem até o último flush do arquivo)
+# - no fim imprime linhas, tamanho e caminho em JSON
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+from bot.core.archive import EXPORT_FORMATS, ExportError, archive_tables, day_range, export_filename, export_spins
+
+
+def _parser() -> argparse.ArgumentParser:
+    from bot.config import DATA_DIR, EXPORT_CHUNK_ROWS
+
+    ap = argparse.ArgumentParser(prog="python -m bot.export", description="Exporta os giros gravados pelo bot")
+    ap.add_argument("--tables", default="todas", help="mesas separadas por vírgula ou 'todas'")
+    ap.add_argument(
+        "--period", default="tudo", help="hoje | ontem | Nd | AAAA-MM-DD | AAAA-MM-DD:AAAA-MM-DD | tudo"
+    )
+    ap.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="csv")
+    ap.add_argument("--out", default="", help="arquivo de saída (padrão: DATA_DIR/exports/<nome automático>)")
+    ap.add_argument("--data-dir", default=DATA_DIR)
+    ap.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = _parser()
+    args = ap.parse_args(argv)
+
+    if args.tables == "todas":
+        tables = archive_tables(args.data_dir)
+    else:
+        try:
+            tables = [int(x) for x in args.tables.split(",") if x]
+        except ValueError:
+            ap.error(f"--tables inválido: {args.tables}")
+    if not tables:
+        ap.error(f"nenhuma mesa com giros em {os.path.join(args.data_dir, 'spins')}")
+
+    try:
+        first, last, label = day_range(args.period)
+    except ValueError:
+        ap.error(f"--period inválido: {args.period}")
+
+    out = args.out or os.path.join(args.data_dir, "exports", export_filename(tables, label, args.fmt))
+    t0 = time.monotonic()
+    try:
+        result = export_spins(args.data_dir, tables, first, last, args.fmt, out, chunk_rows=args.chunk_rows)
+    except ExportError as e:
+        sys.exit(f"erro: {e}")
+
+    print(
+        json.dumps(
+            {
+                "path": result.path,
+                "rows": result.rows,
+                "bytes": result.size,
+                "tables": result.tables,
+                "period": [first, last] if label != "tudo" else "tudo",
+                "seconds": round(time.monotonic() - t0, 1),
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
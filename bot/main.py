@@ -1,22 +1,65 @@
 ﻿from __future__ import annotations
 
 import asyncio
+from telegram.error import TelegramError
 from telegram.ext import Application
 
 from bot.config import (
     TELEGRAM_BOT_TOKEN,
-    MIN_SECONDS_BETWEEN_EDITS,
-    ROULETTE_WS_URL,
+    TELEGRAM_API_BASE_URL,
+    BOT_MODE,
+    EVENT_LOOP,
+    WEBHOOK_SECRET,
+    ADMIN_CHAT_IDS,
+    BROADCAST_CHAT_IDS,
+    BROADCAST_GLOBAL_RATE,
+    BROADCAST_BURST,
+    REPORT_LAYOUT,
+    OUTBOX_CONCURRENCY,
+    TG_CONCURRENT_UPDATES,
+    TG_POLL_TIMEOUT,
+    ROULETTE_WS_URLS,
+    WS_CONNECTIONS,
     CASINO_ID,
     CURRENCY,
     TABLE_KEY,
+    TABLE_KEYS,
+    SHARD_WORKERS,
+    LEADER_BACKEND,
+    LEADER_ID,
+    LEADER_TTL,
+    DATA_DIR,
+    ROLLUP_FLUSH_SECONDS,
+    ARCHIVE_FLUSH_SECONDS,
+    API_LISTEN,
+    API_PORT,
+    SECTOR_NEIGHBORS,
+    STREAM_LISTEN,
+    STREAM_REPLAY,
+    STREAM_SUB_BUFFER,
 )
+from bot.core.alerts import FiredAlert
+from bot.core.api import SnapshotCache, encode_payload, start_api
+from bot.core.archive import archive_loop, new_archive
 from bot.core.buffer import add_results
-from bot.core.formatter import render_report
+from bot.core.eventloop import install_event_loop
+from bot.core.formatter import render_report_parts, render_view_reports
+from bot.core.leader import LeaderElector
+from bot.core.memory import new_memory_sampler
+from bot.core.profiler import new_loop_monitor
+from bot.core.rollups import flush_loop, new_rollups
+from bot.core.stream import SpinStream, spin_tuple, start_stream_server
 from bot.core.websocket_client import WSConfig, ws_run_forever
+from bot.shard.supervisor import Supervisor
+from bot.storage.lease import open_lease_backend
 from bot.storage.state import BotState
 from bot.telegram.handlers import build_handlers
-from bot.telegram.messenger import edit_fixed_message
+from bot.telegram import texts
+from bot.telegram.broadcast import Broadcaster
+from bot.telegram.outbox import PRIO_ALERT, Outbox, TokenBucket, install_outbox
+from bot.telegram.transport import build_requests
+from bot.telegram.webhook import run_webhook
+from bot.telegram.messenger import send_ephemeral
 
 
 def _get_state(app: Application) -> BotState:
@@ -25,84 +68,370 @@ def _get_state(app: Application) -> BotState:
     return app.bot_data["state"]
 
 
+async def _send_alerts(app: Application, state: BotState) -> None:
+    fired = state.alerts.drain()
+    if not fired or not state.is_leader:
+        # seguidor descarta (o líder já mandou os mesmos alertas)
+        return
+
+    for f in fired:
+        text = texts.alert_text(f.rule.rule_id, f.rule.describe(), f.rule.text, f.numero, f.table_key)
+        targets = list(state.subscribers)
+        if f.table_key is not None:
+            # modo supervisor: só quem acompanha a mesa onde disparou
+            targets = [
+                chat_id
+                for chat_id, sub in state.subscribers.items()
+                if (sub.table_key if sub.table_key is not None else state.default_table) == f.table_key
+            ]
+        # todos os chats de uma vez: a fila de saída é que dita o ritmo (prioridade de alerta)
+        await asyncio.gather(
+            *(send_ephemeral(app.bot, chat_id, text, prio=PRIO_ALERT) for chat_id in targets or list(ADMIN_CHAT_IDS)),
+            # alerta perdido (chat bloqueado etc.) não derruba os outros
+            return_exceptions=True,
+        )
+
+
 async def _post_init(app: Application) -> None:
-    """Roda quando o app inicia. Aqui a gente sobe o WebSocket em background."""
+    """Roda quando o app inicia. Aqui a gente sobe o WebSocket e o broadcast em background."""
     state = _get_state(app)
 
-    ws_cfg = WSConfig(
-        ws_url=ROULETTE_WS_URL,
-        casino_id=CASINO_ID,
-        currency=CURRENCY,
-        table_key=TABLE_KEY,
+    for chat_id in BROADCAST_CHAT_IDS:
+        state.subscribe(chat_id)
+
+    # tudo que sai pro Telegram passa pela mesma fila (limite global + prioridade)
+    outbox = Outbox(
+        bucket=TokenBucket(rate=BROADCAST_GLOBAL_RATE, capacity=BROADCAST_BURST),
+        concurrency=OUTBOX_CONCURRENCY,
     )
+    outbox.start()
+    install_outbox(outbox)
+    app.bot_data["outbox"] = outbox
+
+    broadcaster = Broadcaster()
+    app.bot_data["broadcaster"] = broadcaster
+
+    # RSS de tempos em tempos (tendência no /mem; alerta opcional de crescimento)
+    async def on_mem_alert(text: str) -> None:
+        if not state.is_leader:
+            return
+        for chat_id in ADMIN_CHAT_IDS:
+            try:
+                await send_ephemeral(app.bot, chat_id, text, prio=PRIO_ALERT)
+            except TelegramError:
+                continue
+
+    mem = new_memory_sampler()
+    app.bot_data["mem"] = mem
+    app.bot_data["mem_task"] = app.create_task(mem.run(on_alert=on_mem_alert), name="mem_task")
+
+    # travadas do event loop (callback lento = pilha guardada pro /status e /profile)
+    loop_lag = new_loop_monitor()
+    app.bot_data["loop_lag"] = loop_lag
+    app.bot_data["loop_lag_task"] = app.create_task(loop_lag.run(), name="loop_lag_task")
+
+    if LEADER_BACKEND:
+        # várias réplicas: todas ingerem, só o líder fala com o Telegram
+        def on_leader_change(leader: bool) -> None:
+            state.is_leader = leader
+            # DATA_DIR é compartilhado: só o líder grava giros brutos e rollups
+            if state.rollups is not None:
+                state.rollups.set_active(leader, DATA_DIR)
+            if state.archive is not None:
+                state.archive.set_active(leader)
+            supervisor = app.bot_data.get("supervisor")
+            if supervisor is not None:
+                if leader:
+                    # assinantes/regras vieram do snapshot do líder antigo: workers daqui ainda não têm
+                    supervisor.configure(views=state.views_by_table(), alerts=state.alerts.specs(), leader=True)
+                else:
+                    supervisor.configure(leader=False)
+            if leader:
+                broadcaster.notify()
+
+        elector = LeaderElector(
+            backend=open_lease_backend(LEADER_BACKEND),
+            holder=LEADER_ID,
+            ttl=LEADER_TTL,
+            snapshot=state.control_snapshot,
+            apply_snapshot=state.apply_control_snapshot,
+            on_change=on_leader_change,
+        )
+        state.is_leader = False
+        # 1ª rodada já no boot: réplica sozinha vira líder sem esperar
+        await elector.tick()
+        app.bot_data["elector"] = elector
+        app.bot_data["elector_task"] = app.create_task(elector.run(), name="elector_task")
+
+    api_cache = None
+    if API_PORT > 0:
+        # dashboards: JSON pronto em cache, refeito só quando entra giro / conexão muda
+        api_cache = SnapshotCache()
+        api_server, api_handler, api_port = await start_api(API_LISTEN, API_PORT, api_cache)
+        app.bot_data["api_server"] = api_server
+        app.bot_data["api"] = api_handler
+        app.bot_data["api_port"] = api_port
+
+    stream = None
+    if STREAM_LISTEN:
+        # giros pros serviços internos (em vez de cada um abrir conexão com a Pragmatic)
+        stream = SpinStream(replay=STREAM_REPLAY, sub_buffer=STREAM_SUB_BUFFER)
+        stream_server, stream_addr = await start_stream_server(STREAM_LISTEN, stream)
+        app.bot_data["stream_server"] = stream_server
+        app.bot_data["stream"] = stream
+        app.bot_data["stream_addr"] = stream_addr
+
+    if SHARD_WORKERS > 0:
+        # modo supervisor: ingest/analytics nos workers, aqui fica só o gateway do Telegram
+        state.default_table = TABLE_KEYS[0]
+
+        def on_report(table_key: int) -> None:
+            if state.running:
+                broadcaster.notify()
+
+        def on_spins(table_key: int, spins) -> None:
+            for spin in spins:
+                stream.publish(table_key, spin)
+
+        def on_alert(table_key: int, rule_id: int, value: int, numero: int) -> None:
+            # regra avaliada no worker; aqui só resolve o id e manda pros assinantes da mesa
+            rule = state.alerts.rules.get(rule_id)
+            if rule is None or not state.running:
+                return
+            state.alerts.pending.append(FiredAlert(rule=rule, value=value, numero=numero, table_key=table_key))
+            app.create_task(_send_alerts(app, state))
+
+        supervisor = Supervisor(
+            state,
+            TABLE_KEYS,
+            SHARD_WORKERS,
+            on_report=on_report,
+            on_snapshot=api_cache.publish if api_cache is not None else None,
+            on_spins=on_spins if stream is not None else None,
+            on_alert=on_alert,
+        )
+        # ainda sem workers: só entra no config com que eles sobem
+        supervisor.configure(leader=state.is_leader)
+        supervisor.start()
+        app.bot_data["supervisor"] = supervisor
+        app.bot_data["broadcast_task"] = app.create_task(broadcaster.run(app.bot, state), name="broadcast_task")
+        return
 
     async def on_results(batch):
         # só processa se o bot estiver ligado via /start
         if not state.running:
             return
 
+        # várias conexões entregam o mesmo giro: o dedup por gameId deixa passar só o primeiro
         added = add_results(state, batch)
         if added <= 0:
             return
 
-        text = render_report(state)
+        # alertas saem como mensagens separadas, em task à parte: o ingest não espera o envio
+        if state.alerts.pending:
+            app.create_task(_send_alerts(app, state))
+
+        # renderiza 1x por visão distinta; o broadcaster distribui pra todos os assinantes
+        state.report_parts = render_report_parts(state, REPORT_LAYOUT)
+        state.view_reports = render_view_reports(state, REPORT_LAYOUT, state.views_in_use())
+        broadcaster.notify()
+        publish_api()
+
+    def publish_api() -> None:
+        if api_cache is not None:
+            api_cache.publish(TABLE_KEY, encode_payload(state, TABLE_KEY, SECTOR_NEIGHBORS))
 
-        await edit_fixed_message(
-            bot=app.bot,
-            state=state,
-            text=text,
-            min_seconds_between_edits=MIN_SECONDS_BETWEEN_EDITS,
-            force=False,
+    if stream is not None:
+        # cada giro novo (já sem duplicata) vira 1 linha no stream
+        state.spin_sinks.append(lambda r: stream.publish(TABLE_KEY, spin_tuple(r)))
+
+    # agregados por hora/dia (/resumo): carrega o que já tinha e grava de tempos em tempos
+    # (seguidor conta também, pra assumir com tudo em dia, mas não grava)
+    state.rollups = new_rollups(TABLE_KEY)
+    state.rollups.set_active(state.is_leader, DATA_DIR)
+    app.bot_data["rollup_task"] = app.create_task(
+        flush_loop(DATA_DIR, lambda: [state.rollups], ROLLUP_FLUSH_SECONDS), name="rollup_task"
+    )
+
+    # giros brutos por dia (/export): o sink só enfileira, a gravação é em lote numa thread
+    state.archive = new_archive(TABLE_KEY)
+    if state.archive is not None:
+        state.archive.set_active(state.is_leader)
+        state.spin_sinks.append(state.archive.on_spin)
+        app.bot_data["archive_task"] = app.create_task(
+            archive_loop(lambda: [state.archive], ARCHIVE_FLUSH_SECONDS), name="archive_task"
         )
 
     def should_run_ws() -> bool:
         # o cancel do task cuida de parar
         return True
 
-    def on_connection_change(connected: bool, error_msg: str | None):
-        state.ws_connected = connected
-        state.ws_last_error = error_msg
+    conn_status = {}
 
-    async def ws_task():
-        await ws_run_forever(
-            cfg=ws_cfg,
-            on_results=on_results,
-            should_run=should_run_ws,
-            on_connection_change=on_connection_change,
+    def make_ws_task(name: str, url: str):
+        cfg = WSConfig(
+            ws_url=url,
+            casino_id=CASINO_ID,
+            currency=CURRENCY,
+            table_key=TABLE_KEY,
         )
+        feed = state.add_feed(name)
+
+        async def on_conn_results(batch):
+            # mede quem chegou primeiro (só giros novos, não o histórico do 1º frame)
+            if feed.new_ids:
+                state.arrivals.on_arrival(name, feed.new_ids)
+            await on_results(batch)
+
+        def on_connection_change(connected: bool, error_msg: str | None):
+            conn_status[name] = (connected, error_msg)
+            # "conectado" = pelo menos uma conexão de pé
+            state.ws_connected = any(c for c, _ in conn_status.values())
+            errors = [f"{n}: {e}" for n, (c, e) in conn_status.items() if e and not c]
+            state.ws_last_error = "; ".join(errors) or None
+            publish_api()
+
+        async def ws_task():
+            await ws_run_forever(
+                cfg=cfg,
+                on_results=on_conn_results,
+                should_run=should_run_ws,
+                on_connection_change=on_connection_change,
+                liveness=feed,
+            )
 
-    # cria task dentro do loop do PTB
-    app.bot_data["ws_task"] = app.create_task(ws_task(), name="ws_task")
+        return ws_task()
+
+    # cria tasks dentro do loop do PTB
+    ws_tasks = []
+    for i in range(WS_CONNECTIONS):
+        name = f"ws{i + 1}"
+        url = ROULETTE_WS_URLS[i % len(ROULETTE_WS_URLS)]
+        ws_tasks.append(app.create_task(make_ws_task(name, url), name=f"ws_task_{name}"))
+    app.bot_data["ws_tasks"] = ws_tasks
+    app.bot_data["broadcast_task"] = app.create_task(broadcaster.run(app.bot, state), name="broadcast_task")
 
 
 async def _post_shutdown(app: Application) -> None:
-    """Roda quando o app vai desligar. Cancela o WebSocket bonitinho."""
-    task = app.bot_data.get("ws_task")
-    if task:
+    """Roda quando o app vai desligar. Cancela WebSocket, broadcast, workers, API/stream e fila de saída bonitinho."""
+    tasks = list(app.bot_data.get("ws_tasks", []))
+    for name in ("broadcast_task", "elector_task", "rollup_task", "archive_task", "mem_task", "loop_lag_task"):
+        if app.bot_data.get(name):
+            tasks.append(app.bot_data[name])
+    for task in tasks:
         task.cancel()
         try:
             await task
-        except Exception:
+        except (Exception, asyncio.CancelledError):
             pass
 
+    supervisor = app.bot_data.get("supervisor")
+    if supervisor:
+        await supervisor.stop()
+
+    # sem wait_closed: não espera long-poll/assinante do stream pendurado terminar
+    for name in ("api_server", "stream_server"):
+        server = app.bot_data.get(name)
+        if server:
+            server.close()
+
+    # libera o lease: o seguidor assume na próxima rodada (não espera o TTL vencer)
+    elector = app.bot_data.get("elector")
+    if elector:
+        await elector.release()
+
+    outbox = app.bot_data.get("outbox")
+    if outbox:
+        install_outbox(None)
+        await outbox.stop()
+
+
+async def _run_polling_as_replica(app: Application) -> None:
+    """
+    Polling com eleição: getUpdates só no líder (duas réplicas no getUpdates = 409 Conflict).
+    Seguidor fica com o app de pé (WS + estado quente) e liga o polling quando assume.
+    """
+    import signal
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+    elector: LeaderElector = app.bot_data["elector"]
+    try:
+        while not stop.is_set():
+            if elector.is_leader and not app.updater.running:
+                # sem drop_pending_updates: comando mandado durante a troca não se perde
+                await app.updater.start_polling(timeout=TG_POLL_TIMEOUT)
+            elif app.updater.running and not elector.is_leader:
+                await app.updater.stop()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if app.updater.running:
+            await app.updater.stop()
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
 
 def run() -> None:
     if not TELEGRAM_BOT_TOKEN:
         raise RuntimeError("Faltou TELEGRAM_BOT_TOKEN nas variáveis de ambiente.")
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        raise RuntimeError("BOT_MODE=webhook exige WEBHOOK_SECRET (valida quem faz POST).")
 
-    app = (
+    # uvloop (se pedido/instalado) antes de qualquer loop existir
+    install_event_loop(EVENT_LOOP)
+
+    # pools HTTP separados: long-poll não disputa conexão com edits/sends
+    send_request, poll_request = build_requests()
+
+    builder = (
         Application.builder()
         .token(TELEGRAM_BOT_TOKEN)
+        .request(send_request)
+        .get_updates_request(poll_request)
+        .concurrent_updates(TG_CONCURRENT_UPDATES)
         .post_init(_post_init)
         .post_shutdown(_post_shutdown)
-        .build()
     )
+    if TELEGRAM_API_BASE_URL:
+        # ex.: "http://127.0.0.1:8081/bot" (o token vai colado no final, igual ao oficial)
+        builder = builder.base_url(TELEGRAM_API_BASE_URL)
+    app = builder.build()
+    app.bot_data["http_pools"] = [send_request.stats, poll_request.stats]
 
     for h in build_handlers():
         app.add_handler(h)
 
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+        return
+
+    if LEADER_BACKEND:
+        asyncio.run(_run_polling_as_replica(app))
+        return
+
+    # run_polling pega o loop "atual": cria um já pela policy (o uvloop não cria sozinho)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
     # run_polling já cuida de init/start/idle/shutdown do jeito certo
-    app.run_polling(drop_pending_updates=True)
+    app.run_polling(drop_pending_updates=True, timeout=TG_POLL_TIMEOUT)
 
 
 if __name__ == "__main__":
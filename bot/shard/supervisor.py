@@ -0,0 +1,332 @@
+﻿# Supervisor (roda no processo do gateway = o processo do Telegram)
+# - sobe N workers (processos) e divide as mesas entre eles
+# - recebe os deltas de relatório pelos pipes e aplica em state.table_reports
+# - worker morreu (processo saiu / pipe fechou / sem batimento): as mesas dele vão
+#   pros vivos na hora, um substituto sobe e as mesas são reequilibradas
+# - mesa que troca de worker vivo: 1º o dono antigo para e grava ("released"), só então
+#   o novo dono sobe a mesa (carrega o arquivo já completo; nunca os dois ingerindo)
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from bot.shard.worker import (
+    MSG_ALERT,
+    MSG_ASSIGN,
+    MSG_CONFIG,
+    MSG_HEARTBEAT,
+    MSG_RELEASED,
+    MSG_REPORT,
+    MSG_SNAPSHOT,
+    MSG_SPINS,
+    MSG_STOP,
+    worker_main,
+)
+from bot.storage.state import BotState
+
+
+def plan_assignment(tables: List[int], alive: List[int], current: Dict[int, int]) -> Dict[int, int]:
+    """
+    mesa -> slot, mexendo o mínimo:
+    - mesa em slot vivo fica onde está
+    - órfã vai pro slot vivo com menos mesas
+    - depois equilibra (diferença máx. de 1 mesa entre slots)
+    """
+    if not alive:
+        return {}
+    load: Dict[int, List[int]] = {s: [] for s in alive}
+    for t in tables:
+        s = current.get(t)
+        if s in load:
+            load[s].append(t)
+
+    for t in tables:
+        if current.get(t) not in load:
+            target = min(alive, key=lambda s: (len(load[s]), s))
+            load[target].append(t)
+
+    while True:
+        big = max(alive, key=lambda s: (len(load[s]), -s))
+        small = min(alive, key=lambda s: (len(load[s]), s))
+        if len(load[big]) - len(load[small]) <= 1:
+            break
+        load[small].append(load[big].pop())
+
+    return {t: s for s, ts in load.items() for t in ts}
+
+
+@dataclass
+class WorkerSlot:
+    slot: int
+    process: Optional[multiprocessing.process.BaseProcess] = None
+    conn: Any = None
+    tables: List[int] = field(default_factory=list)
+
+    started_ts: float = 0.0
+    last_hb_ts: float = 0.0
+    restarts: int = 0
+    last_death: Optional[str] = None
+    status: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    rss_kb: int = 0
+    loop: Dict[str, Any] = field(default_factory=dict)   # atraso do event loop do worker
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive() and self.conn is not None
+
+
+class Supervisor:
+    def __init__(
+        self,
+        state: BotState,
+        table_keys: List[int],
+        workers: int,
+        on_report: Optional[Callable[[int], None]] = None,
+        on_snapshot: Optional[Callable[[int, bytes], None]] = None,
+        on_spins: Optional[Callable[[int, List[tuple]], None]] = None,
+        on_alert: Optional[Callable[[int, int, int, int], None]] = None,
+    ) -> None:
+        from bot.config import SHARD_HEARTBEAT_SECONDS, SHARD_RESTART_DELAY
+
+        self.state = state
+        self.table_keys = list(dict.fromkeys(int(k) for k in table_keys))
+        self.slots = [WorkerSlot(slot=i) for i in range(max(1, min(workers, len(self.table_keys))))]
+        self.on_report = on_report
+        self.on_snapshot = on_snapshot
+        self.on_spins = on_spins
+        self.on_alert = on_alert
+        self.heartbeat_seconds = SHARD_HEARTBEAT_SECONDS
+        self.restart_delay = SHARD_RESTART_DELAY
+
+        self.assignment: Dict[int, int] = {}
+        self.releasing: Dict[int, int] = {}      # mesa -> slot antigo que ainda não confirmou
+        self.config: Dict[str, Any] = {}
+        self.reports = 0
+        self.report_bytes = 0
+        self.deaths = 0
+
+        # spawn: não herda o loop/threads do PTB do processo pai
+        self._ctx = multiprocessing.get_context("spawn")
+        self._monitor: Optional["asyncio.Task[None]"] = None
+        self._respawns: Dict[int, "asyncio.Task[None]"] = {}
+        self._stopping = False
+
+    # ---------- ciclo de vida ----------
+    def start(self) -> None:
+        self.assignment = plan_assignment(self.table_keys, [s.slot for s in self.slots], {})
+        for slot in self.slots:
+            self._spawn(slot)
+        self._monitor = asyncio.create_task(self._watch(), name="shard_monitor")
+
+    async def stop(self) -> None:
+        # daqui pra frente worker saindo é esperado (não reinicia)
+        self._stopping = True
+        tasks = list(self._respawns.values())
+        if self._monitor:
+            tasks.append(self._monitor)
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
+            try:
+                await t
+            except (Exception, asyncio.CancelledError):
+                pass
+
+        for slot in self.slots:
+            self._send(slot, (MSG_STOP,))
+        deadline = time.monotonic() + 5.0
+        for slot in self.slots:
+            proc = slot.process
+            if proc is None:
+                continue
+            await asyncio.to_thread(proc.join, max(0.1, deadline - time.monotonic()))
+            if proc.is_alive():
+                proc.terminate()
+            self._detach(slot)
+
+    # ---------- processos ----------
+    def _spawn(self, slot: WorkerSlot) -> None:
+        parent, child = self._ctx.Pipe(duplex=True)
+        tables = self._tables_for(slot.slot)
+        proc = self._ctx.Process(
+            target=worker_main,
+            args=(slot.slot, child, tables, dict(self.config)),
+            name=f"shard-worker-{slot.slot}",
+            daemon=True,
+        )
+        proc.start()
+        child.close()
+
+        slot.process = proc
+        slot.conn = parent
+        slot.tables = tables
+        slot.started_ts = time.time()
+        slot.last_hb_ts = slot.started_ts
+        slot.status = {}
+        asyncio.get_running_loop().add_reader(parent.fileno(), self._on_readable, slot)
+
+    def _detach(self, slot: WorkerSlot) -> None:
+        if slot.conn is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(slot.conn.fileno())
+            except (OSError, ValueError):
+                pass
+            try:
+                slot.conn.close()
+            except OSError:
+                pass
+        slot.conn = None
+
+    def _send(self, slot: WorkerSlot, msg: tuple) -> None:
+        if slot.conn is None:
+            return
+        try:
+            slot.conn.send(msg)
+        except (BrokenPipeError, EOFError, OSError):
+            self._on_death(slot, "pipe fechado")
+
+    # ---------- mensagens dos workers ----------
+    def _on_readable(self, slot: WorkerSlot) -> None:
+        conn = slot.conn
+        try:
+            while conn is not None and conn.poll():
+                self._handle(slot, conn.recv())
+        except (EOFError, OSError):
+            self._on_death(slot, "pipe fechado")
+
+    def _handle(self, slot: WorkerSlot, msg: tuple) -> None:
+        kind = msg[0]
+        if kind == MSG_REPORT:
+            _, table_key, n_parts, delta, view = msg
+            # mesa que já mudou de dono: ignora o que o dono antigo ainda mandou
+            if self.assignment.get(table_key) != slot.slot:
+                return
+            # visão personalizada: relatório à parte, mesma montagem por delta
+            reports = self.state.table_reports if view is None else self.state.table_view_reports
+            rkey = table_key if view is None else (table_key, view)
+            parts = list(reports.get(rkey, []))
+            parts = (parts + [""] * n_parts)[:n_parts]
+            for idx, text in delta.items():
+                parts[idx] = text
+                self.report_bytes += len(text)
+            reports[rkey] = parts
+            self.reports += 1
+            if self.on_report:
+                self.on_report(table_key)
+        elif kind == MSG_SNAPSHOT:
+            _, table_key, body = msg
+            if self.on_snapshot and self.assignment.get(table_key) == slot.slot:
+                self.on_snapshot(table_key, body)
+        elif kind == MSG_SPINS:
+            _, table_key, spins = msg
+            if self.on_spins and self.assignment.get(table_key) == slot.slot:
+                self.on_spins(table_key, spins)
+        elif kind == MSG_ALERT:
+            _, table_key, rule_id, value, numero = msg
+            if self.on_alert and self.assignment.get(table_key) == slot.slot:
+                self.on_alert(table_key, rule_id, value, numero)
+        elif kind == MSG_RELEASED:
+            done = [t for t in msg[1] if self.releasing.get(t) == slot.slot]
+            for t in done:
+                del self.releasing[t]
+            if done:
+                self._push_assignment()
+        elif kind == MSG_HEARTBEAT:
+            slot.last_hb_ts = time.time()
+            slot.status = msg[2]
+            slot.rss_kb = msg[3]
+            slot.loop = msg[4]
+
+    # ---------- falhas / rebalanceamento ----------
+    def _on_death(self, slot: WorkerSlot, reason: str) -> None:
+        if slot.conn is None or self._stopping:
+            return
+        self.deaths += 1
+        slot.last_death = reason
+        self._detach(slot)
+        if slot.process is not None and slot.process.is_alive():
+            slot.process.terminate()
+        slot.status = {}
+        self._rebalance()
+        if slot.slot not in self._respawns:
+            self._respawns[slot.slot] = asyncio.create_task(self._respawn(slot))
+
+    async def _respawn(self, slot: WorkerSlot) -> None:
+        try:
+            await asyncio.sleep(self.restart_delay)
+            slot.restarts += 1
+            # sobe vazio (as mesas dele já foram pros vivos); o rebalanceamento devolve parte
+            self._spawn(slot)
+            self._rebalance()
+        finally:
+            self._respawns.pop(slot.slot, None)
+
+    def _tables_for(self, slot_id: int) -> List[int]:
+        # mesa ainda saindo do dono antigo não vai pro novo
+        return sorted(t for t, s in self.assignment.items() if s == slot_id and t not in self.releasing)
+
+    def _rebalance(self) -> None:
+        alive = [s.slot for s in self.slots if s.alive()]
+        # dono antigo morreu no meio da entrega: não tem mais o que esperar
+        self.releasing = {t: s for t, s in self.releasing.items() if self.slots[s].alive()}
+        new = plan_assignment(self.table_keys, alive, self.assignment)
+        owner = {t: slot.slot for slot in self.slots if slot.alive() for t in slot.tables}
+        for t, s in new.items():
+            if owner.get(t, s) != s:
+                self.releasing[t] = owner[t]
+        self.assignment = new
+        self._push_assignment()
+
+    def _push_assignment(self) -> None:
+        for slot in self.slots:
+            if not slot.alive():
+                continue
+            tables = self._tables_for(slot.slot)
+            if tables != slot.tables:
+                slot.tables = tables
+                self._send(slot, (MSG_ASSIGN, tables))
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+            now = time.time()
+            for slot in self.slots:
+                if slot.conn is None:
+                    continue
+                if slot.process is None or not slot.process.is_alive():
+                    self._on_death(slot, "processo saiu")
+                elif now - slot.last_hb_ts > self.heartbeat_seconds * 3:
+                    # travado (loop bloqueado): mata e redistribui
+                    self._on_death(slot, "sem batimento")
+
+    # ---------- comandos ----------
+    def configure(self, **cfg: Any) -> None:
+        self.config.update(cfg)
+        for slot in self.slots:
+            self._send(slot, (MSG_CONFIG, dict(cfg)))
+
+    def summary(self) -> List[str]:
+        now = time.time()
+        lines = []
+        for slot in self.slots:
+            if slot.alive():
+                pid = slot.process.pid if slot.process else "?"
+                hb = f"{now - slot.last_hb_ts:.0f}s"
+                up = sum(1 for st in slot.status.values() if st.get("connected"))
+                line = (
+                    f"worker {slot.slot} (pid {pid}): {len(slot.tables)} mesa(s), {up} conectada(s) | "
+                    f"batimento {hb} | reinícios {slot.restarts}"
+                )
+                if slot.loop:
+                    lp = slot.loop
+                    line += (
+                        f" | loop {lp.get('impl')} p50 ≤{lp.get('p50', 0):g}ms p99 ≤{lp.get('p99', 0):g}ms "
+                        f"máx {lp.get('max', 0):g}ms"
+                    )
+                lines.append(line)
+            else:
+                lines.append(f"worker {slot.slot}: reiniciando ({slot.last_death}) | reinícios {slot.restarts}")
+        lines.append(f"relatórios recebidos: {self.reports} ({self.report_bytes // 1024} KB) | mortes: {self.deaths}")
+        return lines
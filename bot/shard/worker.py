@@ -0,0 +1,375 @@
+﻿# Processo worker: dono de um pedaço das mesas (ingest + dedup + analytics)
+# - 1 BotState por mesa, WS_CONNECTIONS conexões WS por mesa (ROULETTE_WS_URLS em rodízio)
+# - renderiza o relatório aqui e manda pro gateway SÓ as partes que mudaram
+# - fala com o supervisor por um Pipe (mensagens = tuplas pequenas, pickle); o envio
+#   é numa thread: pipe cheio (gateway ocupado) não trava o loop que ingere
+#
+# Protocolo (worker -> gateway):
+#   ("report", table_key, n_parts, {idx: texto}, view)  partes alteradas do relatório
+#                                                   (view = ReportView, None = a padrão)
+#   ("hb", worker_id, {table_key: resumo}, rss_kb, loop)  batimento + status por mesa + RSS do
+#                                                   processo + atraso do event loop (p50/p99/máx, ms)
+#   ("snap", table_key, bytes)                      JSON da API já pronto (só com API_PORT)
+#   ("spins", table_key, [(gameId, n, time), ...])  giros novos pro stream (só com STREAM_LISTEN)
+#   ("alert", table_key, rule_id, valor, número)    regra de alerta disparou nessa mesa
+#   ("released", [table_key, ...])                  mesas tiradas no último assign já paradas e
+#                                                   gravadas: o gateway pode passar pro novo dono
+# Protocolo (gateway -> worker):
+#   ("assign", [table_key, ...])                    conjunto COMPLETO de mesas desse worker
+#   ("config", {"window_size": n, "views": {table_key: [ReportView, ...]},
+#               "alerts": [(rule_id, texto, cooldown), ...], "leader": bool})
+#                                                   janela e alertas valem pra todas as mesas;
+#                                                   visões personalizadas (assinantes) por mesa;
+#                                                   leader=False (réplica seguidora): não grava
+#                                                   rollups nem giros brutos
+#   ("stop",)
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+MSG_REPORT = "report"
+MSG_HEARTBEAT = "hb"
+MSG_SNAPSHOT = "snap"
+MSG_SPINS = "spins"
+MSG_ALERT = "alert"
+MSG_RELEASED = "released"
+MSG_ASSIGN = "assign"
+MSG_CONFIG = "config"
+MSG_STOP = "stop"
+
+
+@dataclass
+class TableWorker:
+    table_key: int
+    state: Any                               # BotState (import tardio: processo novo)
+    tasks: List["asyncio.Task[None]"] = field(default_factory=list)   # 1 por conexão WS
+    sent_parts: List[str] = field(default_factory=list)
+    views: List[Any] = field(default_factory=list)               # ReportView dos assinantes dessa mesa
+    sent_views: Dict[Any, List[str]] = field(default_factory=dict)
+    new_spins: List[tuple] = field(default_factory=list)
+    mem_bytes: int = 0                       # custo aprox. das estruturas (atualizado de tempos em tempos)
+
+    def delta(self, parts: List[str], view: Any = None) -> Dict[int, str]:
+        """Partes que mudaram desde o último envio pro gateway (da visão, None = padrão)."""
+        sent = self.sent_parts if view is None else self.sent_views.get(view, [])
+        out = {}
+        for i, text in enumerate(parts):
+            if i >= len(sent) or sent[i] != text:
+                out[i] = text
+        if view is None:
+            self.sent_parts = list(parts)
+        else:
+            self.sent_views[view] = list(parts)
+        return out
+
+    def set_views(self, views: List[Any]) -> None:
+        self.views = list(views)
+        self.sent_views = {v: p for v, p in self.sent_views.items() if v in self.views}
+        self.state.sync_views(self.views)
+
+    def status(self) -> Dict[str, Any]:
+        st = self.state
+        return {
+            "connected": st.ws_connected,
+            "error": st.ws_last_error,
+            "total": st.total_games,
+            "missing": st.gaps.missing_total,
+            "last_results_ts": max((f.last_results_ts for f in st.feeds.values()), default=0.0),
+            "mem_bytes": self.mem_bytes,
+        }
+
+
+class ShardWorker:
+    def __init__(self, worker_id: int, conn: Any) -> None:
+        self.worker_id = worker_id
+        self.conn = conn
+        self.tables: Dict[int, TableWorker] = {}
+        self.config: Dict[str, Any] = {}
+        self._inbox: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self.loop_lag: Any = None                # LoopLagMonitor (criado no run)
+        self._outq: "queue.SimpleQueue[Optional[tuple]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def leader(self) -> bool:
+        # réplica seguidora ingere igual, mas DATA_DIR é do líder
+        return bool(self.config.get("leader", True))
+
+    # ---------- pipe ----------
+    def _send(self, msg: tuple) -> None:
+        # conn.send bloqueia com o pipe cheio: quem grava é a thread, o loop só enfileira
+        self._outq.put(msg)
+
+    def _write_loop(self) -> None:
+        while True:
+            msg = self._outq.get()
+            if msg is None:
+                return
+            try:
+                self.conn.send(msg)
+            except (BrokenPipeError, EOFError, OSError):
+                # gateway foi embora: o loop principal percebe no recv e encerra
+                return
+
+    def _on_readable(self) -> None:
+        try:
+            while self.conn.poll():
+                self._inbox.put_nowait(self.conn.recv())
+        except (EOFError, OSError):
+            self._inbox.put_nowait((MSG_STOP,))
+
+    # ---------- mesas ----------
+    def _new_state(self, table_key: int):
+        from bot.config import DATA_DIR, DEFAULT_WINDOW_SIZE
+        from bot.core.archive import new_archive
+        from bot.core.rollups import new_rollups
+        from bot.storage.state import BotState
+
+        st = BotState(window_size=self.config.get("window_size", DEFAULT_WINDOW_SIZE))
+        st.table_key = table_key
+        # rollups da mesa ficam com o worker dono; o gateway lê o arquivo no /resumo
+        st.rollups = new_rollups(table_key)
+        st.rollups.set_active(self.leader, DATA_DIR)
+        # giros brutos também: cada worker grava só as mesas dele
+        st.archive = new_archive(table_key)
+        if st.archive is not None:
+            st.archive.set_active(self.leader)
+            st.spin_sinks.append(st.archive.on_spin)
+        # alertas: as regras são as do gateway; o disparo volta pelo pipe
+        st.alerts.set_rules(self.config.get("alerts", []))
+        # no worker não tem /start: ingere sempre (o gateway decide se publica)
+        st.running = True
+        return st
+
+    def _start_table(self, table_key: int) -> None:
+        from bot.config import CASINO_ID, CURRENCY, ROULETTE_WS_URLS, STREAM_LISTEN, WS_CONNECTIONS
+        from bot.core.buffer import add_results
+        from bot.core.stream import spin_tuple
+        from bot.core.websocket_client import WSConfig, ws_run_forever
+
+        tw = TableWorker(table_key=table_key, state=self._new_state(table_key))
+        tw.set_views(self.config.get("views", {}).get(table_key, []))
+        if STREAM_LISTEN:
+            tw.state.spin_sinks.append(lambda r: tw.new_spins.append(spin_tuple(r)))
+        conn_status: Dict[str, tuple] = {}
+
+        async def on_results(batch):
+            if add_results(tw.state, batch) > 0:
+                if tw.new_spins:
+                    # o gateway serializa e distribui (1 stream só pra todas as mesas)
+                    self._send((MSG_SPINS, tw.table_key, tw.new_spins))
+                    tw.new_spins = []
+                self._relay_alerts(tw)
+                self._publish(tw)
+                self._snapshot(tw)
+
+        # mesmas conexões redundantes do modo de 1 processo (o dedup junta tudo)
+        for i in range(WS_CONNECTIONS):
+            name = f"ws{i + 1}"
+            feed = tw.state.add_feed(name)
+            cfg = WSConfig(
+                ws_url=ROULETTE_WS_URLS[i % len(ROULETTE_WS_URLS)],
+                casino_id=CASINO_ID,
+                currency=CURRENCY,
+                table_key=table_key,
+            )
+
+            async def on_conn_results(batch, name=name, feed=feed):
+                if feed.new_ids:
+                    tw.state.arrivals.on_arrival(name, feed.new_ids)
+                await on_results(batch)
+
+            def on_connection_change(connected: bool, error_msg: Optional[str], name=name) -> None:
+                conn_status[name] = (connected, error_msg)
+                tw.state.ws_connected = any(c for c, _ in conn_status.values())
+                errors = [f"{n}: {e}" for n, (c, e) in conn_status.items() if e and not c]
+                tw.state.ws_last_error = "; ".join(errors) or None
+                self._snapshot(tw)
+
+            tw.tasks.append(
+                asyncio.create_task(
+                    ws_run_forever(
+                        cfg=cfg,
+                        on_results=on_conn_results,
+                        should_run=lambda: True,
+                        on_connection_change=on_connection_change,
+                        liveness=feed,
+                    ),
+                    name=f"ws_table_{table_key}_{name}",
+                )
+            )
+        self.tables[table_key] = tw
+
+    async def _stop_table(self, table_key: int) -> None:
+        from bot.config import DATA_DIR
+        from bot.core.archive import flush_archives
+        from bot.core.rollups import flush_rollups
+
+        tw = self.tables.pop(table_key, None)
+        if tw is None:
+            return
+        # para de ingerir ANTES de gravar: giro que chegasse no meio do flush se perderia
+        for task in tw.tasks:
+            task.cancel()
+        for task in tw.tasks:
+            try:
+                await task
+            except (Exception, asyncio.CancelledError):
+                pass
+        # mesa indo pra outro worker: grava já (o novo dono carrega do arquivo)
+        await flush_rollups(DATA_DIR, [tw.state.rollups])
+        if tw.state.archive is not None:
+            await flush_archives([tw.state.archive])
+
+    def _publish(self, tw: TableWorker) -> None:
+        from bot.config import REPORT_LAYOUT
+        from bot.core.formatter import render_report_parts
+
+        # 1 render por visão distinta da mesa (a padrão + as dos assinantes)
+        for view in [None] + tw.views:
+            parts = render_report_parts(tw.state, REPORT_LAYOUT, view)
+            delta = tw.delta(parts, view)
+            if delta:
+                self._send((MSG_REPORT, tw.table_key, len(parts), delta, view))
+
+    def _relay_alerts(self, tw: TableWorker) -> None:
+        # quem manda pro Telegram é o gateway (assinantes, fila de saída, líder/seguidor)
+        for f in tw.state.alerts.drain():
+            self._send((MSG_ALERT, tw.table_key, f.rule.rule_id, f.value, f.numero))
+
+    def _snapshot(self, tw: TableWorker) -> None:
+        from bot.config import API_PORT, SECTOR_NEIGHBORS
+        from bot.core.api import encode_payload
+
+        if API_PORT > 0:
+            # serializa aqui (1x por giro); o gateway só guarda os bytes
+            self._send((MSG_SNAPSHOT, tw.table_key, encode_payload(tw.state, tw.table_key, SECTOR_NEIGHBORS)))
+
+    async def _assign(self, table_keys: List[int]) -> None:
+        wanted = set(int(k) for k in table_keys)
+        released = [k for k in self.tables if k not in wanted]
+        for key in released:
+            await self._stop_table(key)
+        if released:
+            # já gravadas: o gateway só entrega pro novo dono depois disso
+            self._send((MSG_RELEASED, released))
+        for key in sorted(wanted - set(self.tables)):
+            self._start_table(key)
+
+    def _configure(self, cfg: Dict[str, Any]) -> None:
+        self.config.update(cfg)
+        n = cfg.get("window_size")
+        views = cfg.get("views")
+        if "leader" in cfg:
+            from bot.config import DATA_DIR
+
+            for tw in self.tables.values():
+                tw.state.rollups.set_active(self.leader, DATA_DIR)
+                if tw.state.archive is not None:
+                    tw.state.archive.set_active(self.leader)
+        specs = cfg.get("alerts")
+        if specs is not None:
+            for tw in self.tables.values():
+                tw.state.alerts.set_rules(specs)
+                # regra nova cuja condição já vale: dispara agora, não no próximo giro
+                self._relay_alerts(tw)
+        if n is None and views is None:
+            return
+        for tw in self.tables.values():
+            if n is not None:
+                tw.state.set_window_size(int(n))
+                tw.sent_parts = []
+            if views is not None:
+                tw.set_views(views.get(tw.table_key, []))
+            self._publish(tw)
+
+    # ---------- loop ----------
+    async def _heartbeat(self, every: float) -> None:
+        from bot.config import MEM_SAMPLE_SECONDS
+        from bot.core.eventloop import loop_name
+        from bot.core.memory import footprint_total, rss_kb, state_footprint
+
+        last_mem = 0.0
+        while True:
+            now = time.monotonic()
+            if now - last_mem >= MEM_SAMPLE_SECONDS or last_mem == 0.0:
+                # O(dedup) por mesa: não roda a cada batimento
+                last_mem = now
+                for tw in self.tables.values():
+                    tw.mem_bytes = footprint_total(state_footprint(tw.state))
+            statuses = {k: tw.status() for k, tw in self.tables.items()}
+            loop = dict(self.loop_lag.stats(), impl=loop_name(asyncio.get_running_loop()))
+            self._send((MSG_HEARTBEAT, self.worker_id, statuses, rss_kb(), loop))
+            await asyncio.sleep(every)
+
+    async def run(self, table_keys: List[int]) -> None:
+        from bot.config import ARCHIVE_FLUSH_SECONDS, DATA_DIR, ROLLUP_FLUSH_SECONDS, SHARD_HEARTBEAT_SECONDS
+        from bot.core.archive import archive_loop
+        from bot.core.profiler import new_loop_monitor
+        from bot.core.rollups import flush_loop
+
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.conn.fileno(), self._on_readable)
+        self._writer = threading.Thread(target=self._write_loop, name="shard-pipe-writer", daemon=True)
+        self._writer.start()
+        # o atraso que importa com muitas mesas é o do loop do worker (é ele que ingere)
+        self.loop_lag = new_loop_monitor()
+        lag = asyncio.create_task(self.loop_lag.run())
+        hb = asyncio.create_task(self._heartbeat(SHARD_HEARTBEAT_SECONDS))
+        flush = asyncio.create_task(
+            flush_loop(DATA_DIR, lambda: [tw.state.rollups for tw in self.tables.values()], ROLLUP_FLUSH_SECONDS)
+        )
+        archive = asyncio.create_task(
+            archive_loop(
+                lambda: [tw.state.archive for tw in self.tables.values() if tw.state.archive is not None],
+                ARCHIVE_FLUSH_SECONDS,
+            )
+        )
+        try:
+            await self._assign(table_keys)
+            while True:
+                msg = await self._inbox.get()
+                kind = msg[0]
+                if kind == MSG_ASSIGN:
+                    await self._assign(msg[1])
+                elif kind == MSG_CONFIG:
+                    self._configure(msg[1])
+                elif kind == MSG_STOP:
+                    break
+        finally:
+            loop.remove_reader(self.conn.fileno())
+            lag.cancel()
+            hb.cancel()
+            flush.cancel()
+            archive.cancel()
+            for key in list(self.tables):
+                await self._stop_table(key)
+            # o que já estava na fila ainda sai; gateway travado não segura o processo
+            self._outq.put(None)
+            await asyncio.to_thread(self._writer.join, 5.0)
+
+
+def worker_main(worker_id: int, conn: Any, table_keys: List[int], config: Dict[str, Any]) -> None:
+    """Entry point do processo (multiprocessing, spawn)."""
+    from bot.config import EVENT_LOOP
+    from bot.core.eventloop import install_event_loop
+
+    install_event_loop(EVENT_LOOP)
+
+    async def _main() -> None:
+        worker = ShardWorker(worker_id, conn)
+        worker.config.update(config)
+        await worker.run(table_keys)
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        # Ctrl+C chega em todos os processos do grupo: quem encerra é o supervisor
+        pass
+    finally:
+        conn.close()
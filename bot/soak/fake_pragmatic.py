@@ -0,0 +1,188 @@
+﻿# Servidor WS falso da Pragmatic (teste de carga/soak, nunca em produção)
+# - fala o mesmo subscribe do build_subscribe_payload (key = [mesa])
+# - N mesas girando no ritmo configurado; cada giro manda o last20Results da mesa
+#   pra todas as conexões inscritas nela (mesmo formato de horário da Pragmatic, UTC)
+# - sujeira de propósito: frames sem resultado, lixo não-JSON, frame repetido,
+#   lista embaralhada e queda forçada de conexão
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import websockets
+
+
+@dataclass
+class Chaos:
+    noise: float = 0.05          # frame extra sem last20Results (ou lixo) por giro
+    duplicate: float = 0.05      # manda o mesmo frame 2x
+    shuffle: float = 0.10        # last20Results fora de ordem
+    disconnect: float = 0.002    # derruba a conexão (por frame enviado)
+
+
+@dataclass
+class FakeStats:
+    spins: int = 0
+    frames: int = 0
+    noise_frames: int = 0
+    duplicates: int = 0
+    shuffled: int = 0
+    connections: int = 0
+    forced_disconnects: int = 0
+    bad_subscribes: int = 0
+
+
+@dataclass
+class FakeTable:
+    key: int
+    interval: float
+    history: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=20))
+    next_game: int = 0
+
+    def spin(self, rng: random.Random) -> Dict[str, Any]:
+        self.next_game += 1
+        now = datetime.now(timezone.utc)
+        item = {
+            "gameId": f"{self.key}{self.next_game:09d}",
+            "result": str(rng.randrange(37)),
+            "time": now.strftime("%b %d, %Y %I:%M:%S %p"),
+        }
+        self.history.appendleft(item)
+        return item
+
+
+class FakePragmaticServer:
+    def __init__(
+        self,
+        table_keys: List[int],
+        spin_interval: float = 30.0,
+        chaos: Optional[Chaos] = None,
+        seed: int = 1,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.chaos = chaos or Chaos()
+        self.tables: Dict[int, FakeTable] = {
+            k: FakeTable(key=k, interval=spin_interval) for k in dict.fromkeys(table_keys)
+        }
+        self.subs: Dict[int, Set[Any]] = {k: set() for k in self.tables}
+        self.stats = FakeStats()
+        self.on_spin = None               # callback(table_key, gameId) opcional (driver)
+        self._server = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self.port = 0
+
+    # ---------- ciclo de vida ----------
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        # histórico inicial: o 1º frame de cada conexão já vem com 20 giros
+        for t in self.tables.values():
+            for _ in range(20):
+                t.spin(self.rng)
+        self._server = await websockets.serve(self._handle, host, port, max_queue=64)
+        self.port = self._server.sockets[0].getsockname()[1]
+        for t in self.tables.values():
+            self._tasks.append(asyncio.create_task(self._spinner(t)))
+        return self.port
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # ---------- mesas ----------
+    async def _spinner(self, table: FakeTable) -> None:
+        # fase aleatória: as mesas não giram todas no mesmo instante
+        await asyncio.sleep(self.rng.uniform(0, table.interval))
+        while True:
+            item = table.spin(self.rng)
+            self.stats.spins += 1
+            if self.on_spin:
+                self.on_spin(table.key, item["gameId"])
+            self._broadcast(table)
+            await asyncio.sleep(table.interval * self.rng.uniform(0.8, 1.2))
+
+    def _frame(self, table: FakeTable) -> str:
+        items = list(table.history)
+        if self.rng.random() < self.chaos.shuffle:
+            self.rng.shuffle(items)
+            self.stats.shuffled += 1
+        return json.dumps({"tableId": str(table.key), "last20Results": items})
+
+    def _broadcast(self, table: FakeTable) -> None:
+        subs = self.subs.get(table.key)
+        if not subs:
+            return
+        frame = self._frame(table)
+        for ws in list(subs):
+            self._send(ws, frame)
+            if self.rng.random() < self.chaos.duplicate:
+                self.stats.duplicates += 1
+                self._send(ws, frame)
+            if self.rng.random() < self.chaos.noise:
+                self.stats.noise_frames += 1
+                noise = self.rng.choice(
+                    [json.dumps({"tableId": str(table.key), "type": "tableUpdate"}), "{not json", ""]
+                )
+                self._send(ws, noise)
+            if self.rng.random() < self.chaos.disconnect:
+                self.stats.forced_disconnects += 1
+                asyncio.ensure_future(ws.close(code=1011, reason="soak: queda forçada"))
+
+    def _send(self, ws: Any, frame: str) -> None:
+        self.stats.frames += 1
+        # sem await: cliente lento enche o buffer dele, não trava as outras mesas
+        asyncio.ensure_future(self._safe_send(ws, frame))
+
+    @staticmethod
+    async def _safe_send(ws: Any, frame: str) -> None:
+        try:
+            await ws.send(frame)
+        except websockets.ConnectionClosed:
+            pass
+
+    # ---------- conexões ----------
+    async def _handle(self, ws: Any, path: str = "/") -> None:
+        self.stats.connections += 1
+        keys: List[int] = []
+        try:
+            msg = json.loads(await ws.recv())
+            if msg.get("type") != "subscribe":
+                raise ValueError("type")
+            keys = [int(k) for k in msg.get("key") or [] if int(k) in self.tables]
+        except (ValueError, TypeError, AttributeError):
+            self.stats.bad_subscribes += 1
+            await ws.close(code=1008, reason="subscribe inválido")
+            return
+        except websockets.ConnectionClosed:
+            return
+
+        for k in keys:
+            self.subs[k].add(ws)
+            # igual à real: assim que inscreve já vem o histórico
+            await ws.send(self._frame(self.tables[k]))
+        try:
+            await ws.wait_closed()
+        finally:
+            for k in keys:
+                self.subs[k].discard(ws)
+
+    def summary(self) -> Dict[str, Any]:
+        s = self.stats
+        return {
+            "tables": len(self.tables),
+            "spins": s.spins,
+            "frames": s.frames,
+            "connections": s.connections,
+            "live_connections": sum(len(v) for v in self.subs.values()),
+            "forced_disconnects": s.forced_disconnects,
+            "duplicates": s.duplicates,
+            "shuffled": s.shuffled,
+            "noise_frames": s.noise_frames,
+        }
@@ -0,0 +1,222 @@
+﻿# Bot API falso (teste de carga/soak): o bot aponta pra cá com TELEGRAM_API_BASE_URL
+# - responde o que o bot usa: getMe, getUpdates (long-poll), sendMessage,
+#   editMessageText, deleteMessage, sendDocument, set/deleteWebhook
+# - limite por chat e global igual ao do Telegram (429 + retry_after), pra
+#   exercitar o pacer e a fila de saída
+# - mede a latência giro -> edit por chat (aprox.: 1º edit do chat depois do giro)
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import re
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from bot.core.http import HttpError, HttpRequest, HttpResponse, start_http_server
+
+
+_PATH_RE = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)$")
+_MULTIPART_CHAT_RE = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+
+class _Window:
+    """Quantos eventos no último segundo (janela deslizante)."""
+
+    def __init__(self) -> None:
+        self.ts: Deque[float] = deque()
+
+    def hit(self, now: float, limit: float) -> Optional[float]:
+        while self.ts and now - self.ts[0] >= 1.0:
+            self.ts.popleft()
+        if len(self.ts) >= limit:
+            return 1.0 - (now - self.ts[0])
+        self.ts.append(now)
+        return None
+
+
+@dataclass
+class FakeTelegramStats:
+    calls: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    too_many: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+
+class FakeTelegram:
+    def __init__(self, token: str, chat_rate: float = 1.0, global_rate: float = 30.0) -> None:
+        self.token = token
+        self.chat_rate = chat_rate
+        self.global_rate = global_rate
+        self.stats = FakeTelegramStats()
+
+        self._next_message_id = 1
+        self._next_update_id = 1
+        self._updates: Deque[Dict[str, Any]] = deque()
+        self._has_updates = asyncio.Event()
+        self._chat_windows: Dict[int, _Window] = defaultdict(_Window)
+        self._global_window = _Window()
+
+        # latência: chat -> horários (monotonic) dos giros que o chat ainda não "viu"
+        self.chat_table: Dict[int, int] = {}
+        self._pending: Dict[int, List[float]] = defaultdict(list)
+        self.port = 0
+        self._server = None
+        self._closing = False
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server, self.port = await start_http_server(host, port, self)
+        return self.port
+
+    async def stop(self) -> None:
+        # solta quem está no long-poll antes de fechar (senão o asyncio.run reclama no fim)
+        self._closing = True
+        self._has_updates.set()
+        await asyncio.sleep(0.1)
+        if self._server is not None:
+            self._server.close()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    # ---------- lado do driver ----------
+    def push_command(self, chat_id: int, text: str) -> None:
+        """Enfileira um comando como se o admin tivesse digitado."""
+        cmd = text.split()[0]
+        self._updates.append(
+            {
+                "update_id": self._next_update_id,
+                "message": {
+                    "message_id": self._new_message_id(),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": "soak"},
+                    "text": text,
+                    "entities": [{"type": "bot_command", "offset": 0, "length": len(cmd)}],
+                },
+            }
+        )
+        self._next_update_id += 1
+        self._has_updates.set()
+
+    def on_spin(self, table_key: int) -> None:
+        now = time.monotonic()
+        for chat_id, key in self.chat_table.items():
+            if key == table_key:
+                self._pending[chat_id].append(now)
+
+    # ---------- HTTP ----------
+    def _new_message_id(self) -> int:
+        mid = self._next_message_id
+        self._next_message_id += 1
+        return mid
+
+    @staticmethod
+    def _params(req: HttpRequest) -> Dict[str, Any]:
+        ctype = req.headers.get("content-type", "")
+        if ctype.startswith("application/json"):
+            return json.loads(req.body or b"{}")
+        if ctype.startswith("multipart/form-data"):
+            m = _MULTIPART_CHAT_RE.search(req.body)
+            return {"chat_id": m.group(1).decode() if m else "0"}
+        return {k: v[-1] for k, v in parse_qs(req.body.decode("utf-8")).items()}
+
+    @staticmethod
+    def _ok(result: Any) -> HttpResponse:
+        return HttpResponse(200, json.dumps({"ok": True, "result": result}).encode("utf-8"))
+
+    def _message(self, chat_id: int, text: str = "", message_id: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "message_id": message_id or self._new_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+            "text": text,
+        }
+
+    def _limited(self, chat_id: int) -> Optional[HttpResponse]:
+        now = time.monotonic()
+        wait = self._global_window.hit(now, self.global_rate)
+        if wait is None:
+            wait = self._chat_windows[chat_id].hit(now, self.chat_rate)
+        if wait is None:
+            return None
+        self.stats.too_many += 1
+        retry = max(1, math.ceil(wait))
+        body = {
+            "ok": False,
+            "error_code": 429,
+            "description": f"Too Many Requests: retry after {retry}",
+            "parameters": {"retry_after": retry},
+        }
+        return HttpResponse(429, json.dumps(body).encode("utf-8"))
+
+    def _delivered(self, chat_id: int) -> None:
+        pending = self._pending.get(chat_id)
+        if pending:
+            now = time.monotonic()
+            self.stats.latencies.extend(now - t for t in pending)
+            pending.clear()
+
+    async def __call__(self, req: HttpRequest) -> HttpResponse:
+        m = _PATH_RE.match(req.path)
+        if m is None or m.group("token") != self.token:
+            raise HttpError(404)
+        method = m.group("method")
+        self.stats.calls[method] += 1
+        p = self._params(req)
+
+        if method == "getMe":
+            return self._ok({"id": 1, "is_bot": True, "first_name": "soak", "username": "soak_bot"})
+
+        if method == "getUpdates":
+            offset = int(p.get("offset") or 0)
+            while self._updates and self._updates[0]["update_id"] < offset:
+                self._updates.popleft()
+            if not self._updates and not self._closing:
+                self._has_updates.clear()
+                try:
+                    await asyncio.wait_for(self._has_updates.wait(), timeout=float(p.get("timeout") or 0))
+                except asyncio.TimeoutError:
+                    pass
+            return self._ok(list(self._updates))
+
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            chat_id = int(p.get("chat_id") or 0)
+            limited = self._limited(chat_id)
+            if limited is not None:
+                return limited
+            self._delivered(chat_id)
+            mid = int(p["message_id"]) if method == "editMessageText" else None
+            return self._ok(self._message(chat_id, str(p.get("text", "")), mid))
+
+        # deleteMessage, setWebhook, deleteWebhook, pin etc.
+        return self._ok(True)
+
+    # ---------- relatório ----------
+    def pending(self) -> int:
+        """Giros que ainda não viraram edit (progresso no meio do soak)."""
+        return sum(len(v) for v in self._pending.values())
+
+    def summary(self) -> Dict[str, Any]:
+        lat = sorted(self.stats.latencies)
+
+        def pct(q: float) -> Optional[float]:
+            if not lat:
+                return None
+            return round(lat[min(len(lat) - 1, int(q * len(lat)))], 3)
+
+        return {
+            "calls": dict(self.stats.calls),
+            "too_many_requests": self.stats.too_many,
+            "spin_to_edit_seconds": {
+                "n": len(lat),
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+                "max": round(lat[-1], 3) if lat else None,
+            },
+        }
+
@@ -0,0 +1,184 @@
+﻿# Soak / carga local: bot completo contra a Pragmatic falsa + Bot API falso
+#
+#   python -m bot.soak.run --tables 200 --workers 4 --spin-interval 5 --chats 50 --duration 300
+#
+# - sobe os dois servidores falsos neste processo
+# - roda `python -m bot.main` num subprocesso, apontado pra eles (mesmo código de produção)
+# - manda /start e espalha os chats nas mesas com /assinar
+# - no fim: giros/s, chamadas ao Bot API, 429, latência giro -> edit e RSS do bot
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bot.soak.fake_pragmatic import Chaos, FakePragmaticServer
+from bot.soak.fake_telegram import FakeTelegram
+
+
+SOAK_TOKEN = "1:soak"
+ADMIN_ID = 1000
+
+
+def _rss_kb(pid: int) -> int:
+    """RSS do processo + filhos diretos (workers do modo supervisor), em KB. 0 fora do Linux."""
+    pids = [pid]
+    try:
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "r") as f:
+                    # campo 4 = ppid (o nome do processo pode ter espaço: corta no ")")
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(name))
+            except (OSError, ValueError, IndexError):
+                continue
+    except OSError:
+        return 0
+
+    total = 0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def _bot_env(args: argparse.Namespace, ws_port: int, tg: FakeTelegram, tables: List[int]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": SOAK_TOKEN,
+            "TELEGRAM_API_BASE_URL": tg.base_url,
+            "ROULETTE_WS_URL": f"ws://127.0.0.1:{ws_port}/ws",
+            "ROULETTE_WS_URLS": "",
+            "ADMIN_CHAT_ID": str(ADMIN_ID),
+            "TABLE_KEY": str(tables[0]),
+            "TABLE_KEYS": ",".join(str(t) for t in tables),
+            "SHARD_WORKERS": str(args.workers),
+            "BOT_MODE": "polling",
+            "LEADER_BACKEND": "",
+            "TG_POLL_TIMEOUT": "2",
+            "DATA_DIR": args.data_dir,
+            # o soak mede ritmo, não a regra de negócio: ritmo de giro curto = limite curto
+            "FEED_SPIN_INTERVAL": str(max(5.0, args.spin_interval)),
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    return env
+
+
+async def soak(args: argparse.Namespace) -> Dict[str, object]:
+    tables = [args.first_table + i for i in range(args.tables)]
+    if args.tables > 1 and args.workers <= 0:
+        raise SystemExit("várias mesas precisam do modo supervisor: use --workers N")
+
+    chaos = Chaos(
+        noise=args.noise,
+        duplicate=args.duplicate,
+        shuffle=args.shuffle,
+        disconnect=args.disconnect,
+    )
+    pragmatic = FakePragmaticServer(tables, spin_interval=args.spin_interval, chaos=chaos, seed=args.seed)
+    tg = FakeTelegram(SOAK_TOKEN, chat_rate=args.tg_chat_rate, global_rate=args.tg_global_rate)
+    pragmatic.on_spin = lambda table_key, _gid: tg.on_spin(table_key)
+
+    ws_port = await pragmatic.start()
+    await tg.start()
+
+    # admin acompanha a mesa padrão; os chats "canais" são espalhados nas mesas
+    tg.chat_table[ADMIN_ID] = tables[0]
+    tg.push_command(ADMIN_ID, "/start")
+    for i in range(args.chats):
+        chat_id = -100_000 - i
+        key = tables[i % len(tables)]
+        tg.chat_table[chat_id] = key
+        tg.push_command(ADMIN_ID, f"/assinar {chat_id} {key}" if args.workers > 0 else f"/assinar {chat_id}")
+
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "bot.main", env=_bot_env(args, ws_port, tg, tables)
+    )
+    t0 = time.monotonic()
+    peak_rss = 0
+    try:
+        while time.monotonic() - t0 < args.duration:
+            await asyncio.sleep(min(5.0, args.duration))
+            if proc.returncode is not None:
+                raise SystemExit(f"o bot saiu sozinho (código {proc.returncode})")
+            rss = _rss_kb(proc.pid)
+            peak_rss = max(peak_rss, rss)
+            p = pragmatic.summary()
+            print(
+                f"[soak] {time.monotonic() - t0:5.0f}s | giros {p['spins']} | conexões {p['live_connections']} | "
+                f"edits {tg.stats.calls.get('editMessageText', 0)} | 429 {tg.stats.too_many} | "
+                f"esperando edit {tg.pending()} | RSS {rss // 1024} MB",
+                flush=True,
+            )
+    finally:
+        if proc.returncode is None:
+            proc.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=20)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+        await pragmatic.stop()
+        await tg.stop()
+
+    elapsed = time.monotonic() - t0
+    p = pragmatic.summary()
+    return {
+        "duration_seconds": round(elapsed, 1),
+        "tables": len(tables),
+        "workers": args.workers,
+        "chats": args.chats,
+        "pragmatic": p,
+        "spins_per_second": round(p["spins"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "telegram": tg.summary(),
+        "bot_peak_rss_mb": round(peak_rss / 1024, 1),
+        "bot_exit_code": proc.returncode,
+    }
+
+
+def _parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m bot.soak.run", description="Soak do bot contra servidores falsos")
+    ap.add_argument("--tables", type=int, default=1)
+    ap.add_argument("--first-table", type=int, default=1000)
+    ap.add_argument("--workers", type=int, default=0, help="SHARD_WORKERS do bot (obrigatório com várias mesas)")
+    ap.add_argument("--spin-interval", type=float, default=30.0, help="segundos entre giros de cada mesa")
+    ap.add_argument("--chats", type=int, default=0, help="chats assinantes além do admin")
+    ap.add_argument("--duration", type=float, default=120.0)
+    ap.add_argument("--noise", type=float, default=0.05)
+    ap.add_argument("--duplicate", type=float, default=0.05)
+    ap.add_argument("--shuffle", type=float, default=0.10)
+    ap.add_argument("--disconnect", type=float, default=0.002)
+    ap.add_argument("--tg-chat-rate", type=float, default=1.0, help="msgs/s por chat antes do 429")
+    ap.add_argument("--tg-global-rate", type=float, default=30.0, help="msgs/s no total antes do 429")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--data-dir", default="/tmp/roleta-soak")
+    ap.add_argument("--json", dest="json_out", default="", help="grava o resultado nesse arquivo")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parser().parse_args(argv)
+    result = asyncio.run(soak(args))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+﻿# Lease de líder (várias réplicas, só uma fala com o Telegram)
+# - lease com prazo (ttl): o dono renova; se parar de renovar, outro assume
+# - token de "fencing" sobe a cada troca de dono
+# - junto do lease vai um snapshot pequeno do controle (running, janela, assinantes
+#   e message_ids) pro novo líder continuar editando as MESMAS mensagens
+#
+# Backends:
+#   LEADER_BACKEND="sqlite:///data/leader.db"   (arquivo SQLite compartilhado)
+#   LEADER_BACKEND="file:///data/leader.json"   (JSON + flock, mesma máquina/volume)
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class LeaseInfo:
+    holder: str
+    expires: float
+    token: int
+
+    def valid(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return bool(self.holder) and self.expires > now
+
+
+class LeaseBackend:
+    """Interface: tudo síncrono (o elector chama via asyncio.to_thread)."""
+
+    def acquire(self, holder: str, ttl: float) -> Optional[LeaseInfo]:
+        """Pega ou renova. Retorna o lease se `holder` é o dono agora, senão None."""
+        raise NotImplementedError
+
+    def release(self, holder: str) -> None:
+        raise NotImplementedError
+
+    def current(self) -> Optional[LeaseInfo]:
+        raise NotImplementedError
+
+    def put_snapshot(self, holder: str, snapshot: Dict[str, Any]) -> bool:
+        """Só o dono atual grava. False = não é mais dono."""
+        raise NotImplementedError
+
+    def get_snapshot(self) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+def _take(cur: Optional[LeaseInfo], holder: str, ttl: float, now: float) -> Optional[LeaseInfo]:
+    """Regra comum: renova se é meu, assume se está livre/vencido, senão nada."""
+    if cur is not None and cur.valid(now) and cur.holder != holder:
+        return None
+    token = cur.token if cur is not None else 0
+    if cur is None or cur.holder != holder or not cur.valid(now):
+        token += 1
+    return LeaseInfo(holder=holder, expires=now + ttl, token=token)
+
+
+class SqliteLease(LeaseBackend):
+    def __init__(self, path: str, name: str = "bot") -> None:
+        self.path = path
+        self.name = name
+        db = self._connect()
+        try:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS lease ("
+                " name TEXT PRIMARY KEY, holder TEXT, expires REAL, token INTEGER, snapshot TEXT)"
+            )
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: a gente controla o BEGIN IMMEDIATE (trava de escrita)
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def _row(self, db: sqlite3.Connection) -> Optional[LeaseInfo]:
+        row = db.execute("SELECT holder, expires, token FROM lease WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            return None
+        return LeaseInfo(holder=row[0] or "", expires=float(row[1] or 0.0), token=int(row[2] or 0))
+
+    def acquire(self, holder: str, ttl: float) -> Optional[LeaseInfo]:
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            new = _take(self._row(db), holder, ttl, time.time())
+            if new is not None:
+                db.execute(
+                    "INSERT INTO lease (name, holder, expires, token) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, "
+                    "expires = excluded.expires, token = excluded.token",
+                    (self.name, new.holder, new.expires, new.token),
+                )
+            db.execute("COMMIT")
+            return new
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            raise
+        finally:
+            db.close()
+
+    def release(self, holder: str) -> None:
+        db = self._connect()
+        try:
+            db.execute("UPDATE lease SET expires = 0 WHERE name = ? AND holder = ?", (self.name, holder))
+        finally:
+            db.close()
+
+    def current(self) -> Optional[LeaseInfo]:
+        db = self._connect()
+        try:
+            return self._row(db)
+        finally:
+            db.close()
+
+    def put_snapshot(self, holder: str, snapshot: Dict[str, Any]) -> bool:
+        db = self._connect()
+        try:
+            cur = db.execute(
+                "UPDATE lease SET snapshot = ? WHERE name = ? AND holder = ? AND expires > ?",
+                (json.dumps(snapshot), self.name, holder, time.time()),
+            )
+            return cur.rowcount > 0
+        finally:
+            db.close()
+
+    def get_snapshot(self) -> Optional[Dict[str, Any]]:
+        db = self._connect()
+        try:
+            row = db.execute("SELECT snapshot FROM lease WHERE name = ?", (self.name,)).fetchone()
+        finally:
+            db.close()
+        if row is None or not row[0]:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+
+class FileLease(LeaseBackend):
+    """JSON num arquivo; flock num .lock do lado garante leitura+escrita atômica."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock_path = path + ".lock"
+
+    def _locked(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _unlock(self, fd: int) -> None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _info(data: Dict[str, Any]) -> Optional[LeaseInfo]:
+        if not data.get("holder") and not data.get("token"):
+            return None
+        return LeaseInfo(
+            holder=str(data.get("holder") or ""),
+            expires=float(data.get("expires") or 0.0),
+            token=int(data.get("token") or 0),
+        )
+
+    def acquire(self, holder: str, ttl: float) -> Optional[LeaseInfo]:
+        fd = self._locked()
+        try:
+            data = self._read()
+            new = _take(self._info(data), holder, ttl, time.time())
+            if new is not None:
+                data.update(holder=new.holder, expires=new.expires, token=new.token)
+                self._write(data)
+            return new
+        finally:
+            self._unlock(fd)
+
+    def release(self, holder: str) -> None:
+        fd = self._locked()
+        try:
+            data = self._read()
+            if data.get("holder") == holder:
+                data["expires"] = 0.0
+                self._write(data)
+        finally:
+            self._unlock(fd)
+
+    def current(self) -> Optional[LeaseInfo]:
+        return self._info(self._read())
+
+    def put_snapshot(self, holder: str, snapshot: Dict[str, Any]) -> bool:
+        fd = self._locked()
+        try:
+            data = self._read()
+            info = self._info(data)
+            if info is None or info.holder != holder or not info.valid():
+                return False
+            data["snapshot"] = snapshot
+            self._write(data)
+            return True
+        finally:
+            self._unlock(fd)
+
+    def get_snapshot(self) -> Optional[Dict[str, Any]]:
+        snap = self._read().get("snapshot")
+        return snap if isinstance(snap, dict) else None
+
+
+def open_lease_backend(url: str) -> LeaseBackend:
+    """sqlite:///caminho.db | file:///caminho.json"""
+    url = (url or "").strip()
+    if url.startswith("sqlite://"):
+        return SqliteLease(url[len("sqlite://"):])
+    if url.startswith("file://"):
+        return FileLease(url[len("file://"):])
+    raise ValueError(f"LEADER_BACKEND inválido: {url!r} (use sqlite:///... ou file:///...)")
@@ -1,92 +1,360 @@
 ﻿from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Optional, Deque, Dict, Any, Set
+from typing import Optional, Deque, Dict, Any, List, Set, Callable, Tuple
 from collections import deque
 import time
 
+from bot.config import WINDOW_MAX
+from bot.core.alerts import AlertEngine
+from bot.core.analytics import TransitionCounts, WindowStats
+from bot.core.archive import SpinArchive
+from bot.core.arrivals import ArrivalTracker
+from bot.core.gaps import GapTracker
+from bot.core.liveness import FeedLiveness, SpinClock, new_liveness, new_spin_clock
+from bot.core.pacing import EditPacer, new_pacer
+from bot.core.rollups import TableRollups
+from bot.core.views import ReportView, SpinRing, WindowCounters, new_view, resize_window, tail_numbers
+
 
 # Quantos IDs a gente guarda pra deduplicar globalmente (sessão do bot).
 # 10k é bem tranquilo e evita “recontar” ao trocar janela.
 SEEN_IDS_MAX = 10_000
 
 
+@dataclass
+class FixedPart:
+    """Uma parte do relatório = uma mensagem editável, com cache do próprio texto."""
+    message_id: Optional[int] = None
+    last_render_text: str = ""
+
+
+@dataclass
+class FixedMessage:
+    """Mensagem(ns) fixa(s) editável(is) num chat/canal assinante (1 por parte do layout)."""
+    chat_id: int
+    parts: List[FixedPart] = field(default_factory=list)
+
+    # mesa que esse chat acompanha (None = mesa padrão)
+    table_key: Optional[int] = None
+
+    # visão própria (None / vazio = a do bot: janela padrão, todos os blocos)
+    window_size: Optional[int] = None
+    blocks: Tuple[str, ...] = ()
+
+    # anti-spam / performance (por chat)
+    last_edit_ts: float = 0.0
+    last_error: Optional[str] = None
+
+    # erro permanente (bloqueou o bot, chat apagado, sem permissão): fora do fan-out
+    # até /assinar (ou /start no próprio chat) de novo
+    suspended: bool = False
+
+    # ritmo adaptativo (429 / RetryAfter)
+    pacer: EditPacer = field(default_factory=new_pacer)
+
+    def can_edit_now(self) -> bool:
+        return self.pacer.ready()
+
+    def ensure_parts(self, n: int) -> None:
+        while len(self.parts) < n:
+            self.parts.append(FixedPart())
+
+    def changed_parts(self, texts: List[str]) -> List[int]:
+        """Índices das partes cujo texto mudou desde o último envio."""
+        self.ensure_parts(len(texts))
+        return [i for i, t in enumerate(texts) if t and self.parts[i].last_render_text != t]
+
+    def view(self, default_window: int) -> Optional[ReportView]:
+        """Visão desse chat, ou None se for a padrão (recebe state.report_parts)."""
+        window = self.window_size or default_window
+        if window == default_window and not self.blocks:
+            return None
+        return new_view(window, self.blocks)
+
+    def mark_edited(self, idx: int, new_text: str) -> None:
+        # o pacer conta a rodada inteira (1x por chat), não cada parte: quem chama avisa
+        self.parts[idx].last_render_text = new_text
+        self.last_edit_ts = time.time()
+        self.last_error = None
+
+    def mark_synced(self, idx: int, text: str) -> None:
+        """O Telegram já tinha esse texto ("not modified"): só acerta o cache; não é edit pro pacer."""
+        self.parts[idx].last_render_text = text
+
+
 @dataclass
 class BotState:
     running: bool = False
 
-    # mensagem fixa editável
-    chat_id: Optional[int] = None
-    message_id: Optional[int] = None
+    # várias réplicas: só o líder fala com o Telegram (sem eleição = sempre líder)
+    is_leader: bool = True
+
+    # assinantes: uma mensagem fixa por chat/canal (chat_id -> FixedMessage)
+    subscribers: Dict[int, FixedMessage] = field(default_factory=dict)
+
+    # último relatório renderizado, já em partes (renderiza 1x, distribui pra todos)
+    report_parts: List[str] = field(default_factory=list)
 
-    # janela e dados
+    # várias mesas (modo supervisor): relatório de cada mesa, vindo dos workers
+    table_key: Optional[int] = None            # mesa desse state (worker)
+    default_table: Optional[int] = None        # mesa de quem assinou sem escolher
+    table_reports: Dict[int, List[str]] = field(default_factory=dict)
+
+    # visões personalizadas: 1 relatório por visão distinta (local / por mesa dos workers)
+    view_reports: Dict[ReportView, List[str]] = field(default_factory=dict)
+    table_view_reports: Dict[Tuple[int, ReportView], List[str]] = field(default_factory=dict)
+
+    # janela padrão e o log de giros da mesa (buffer circular de WINDOW_MAX; janela = últimos N)
     window_size: int = 40
-    results: Deque[Dict[str, Any]] = field(default_factory=deque)
+    results: SpinRing = field(default_factory=lambda: SpinRing(WINDOW_MAX))
 
     # ✅ dedup GLOBAL (não depende da janela)
     seen_game_ids: Set[str] = field(default_factory=set)
     seen_game_ids_queue: Deque[str] = field(default_factory=deque)
 
+    # contadores incrementais da janela padrão (atualizados no append/saída)
+    transitions: TransitionCounts = field(default_factory=TransitionCounts)
+    window_stats: WindowStats = field(default_factory=WindowStats)
+    # ... e das outras janelas em uso pelos assinantes (tamanho -> contadores)
+    window_views: Dict[int, WindowCounters] = field(default_factory=dict)
+
+    # regras de alerta (avaliadas a cada giro novo)
+    alerts: AlertEngine = field(default_factory=AlertEngine)
+
     # acumulados desde que o processo iniciou
     total_games: int = 0
     last_number: Optional[int] = None
 
+    # giros que a mesa rodou e o bot não viu (reconexões)
+    gaps: GapTracker = field(default_factory=GapTracker)
+
+    # agregados por hora/dia da mesa (persistidos; None = não acumula)
+    rollups: Optional[TableRollups] = None
+
+    # giros brutos gravados por dia pro /export (None = ARCHIVE_SPINS=0)
+    archive: Optional[SpinArchive] = None
+
+    # quem mais recebe cada giro novo (já deduplicado), ex.: stream pros serviços internos
+    spin_sinks: List[Callable[[Dict[str, Any]], None]] = field(default_factory=list)
+
     # modo “esperando o usuário mandar 20”
     awaiting_window_size: bool = False
     awaiting_window_size_chat_id: Optional[int] = None
 
-    # anti-spam / performance
-    last_render_text: str = ""
-    last_edit_ts: float = 0.0
-
     # status WS
     ws_connected: bool = False
     ws_last_error: Optional[str] = None
-    ws_last_msg_ts: float = 0.0
+    # uma liveness por conexão WS (nome -> último frame / last20Results / giro novo)
+    # o ritmo da mesa (intervalo entre giros) é um só, compartilhado
+    spin_clock: SpinClock = field(default_factory=new_spin_clock)
+    feeds: Dict[str, FeedLiveness] = field(default_factory=dict)
+    # qual conexão entrega cada giro primeiro
+    arrivals: ArrivalTracker = field(default_factory=ArrivalTracker)
 
     def __post_init__(self) -> None:
-        # garante maxlen alinhado ao window_size desde o início
-        if not isinstance(self.results, deque) or self.results.maxlen != self.window_size:
-            self.results = deque(list(self.results), maxlen=self.window_size)
+        # o log guarda a maior janela possível (todas as visões leem dele); alocado 1x
+        cap = max(WINDOW_MAX, self.window_size)
+        if not isinstance(self.results, SpinRing) or self.results.capacity < cap:
+            self.results = SpinRing(cap, self.results)
+        self.rebuild_window_counters()
+
+    def rebuild_window_counters(self) -> None:
+        """Recalcula os contadores da janela padrão a partir do log (O(janela))."""
+        nums = tail_numbers(self.results, self.window_size)
+        self.transitions.rebuild(nums)
+        self.window_stats.rebuild(nums)
 
     def set_window_size(self, n: int) -> None:
-        """Atualiza janela sem resetar dedup global."""
+        """
+        Atualiza janela sem resetar dedup global. O log não muda (aumentar de novo já vem cheio).
+        Contadores: se algum assinante já usa esse tamanho, adota os dele (O(1));
+        senão anda só a diferença (O(|n - antiga|)).
+        """
+        old = self.window_size
         self.window_size = n
-        old = list(self.results)
-        self.results = deque(old[-n:], maxlen=n)
+        spare = self.window_views.pop(n, None)
+        if spare is not None:
+            self.window_stats, self.transitions = spare.stats, spare.transitions
+        else:
+            resize_window(self.results, old, n, self.window_stats, self.transitions)
+        # quem tinha a janela nova própria passa a usar a padrão (e vice-versa)
+        self.sync_views()
         # ⚠️ NÃO mexe no seen_game_ids aqui (senão reconta IDs antigos)
 
+    def window_counters(self, size: int) -> Tuple[WindowStats, TransitionCounts]:
+        """Contadores de uma janela qualquer (cria na 1ª vez: O(janela))."""
+        if size == self.window_size:
+            return self.window_stats, self.transitions
+        wc = self.window_views.get(size)
+        if wc is None:
+            wc = WindowCounters(size=size)
+            wc.rebuild(self.results)
+            self.window_views[size] = wc
+        return wc.stats, wc.transitions
+
+    def views_in_use(self, table_key: Optional[int] = None) -> List[ReportView]:
+        """Visões distintas dos assinantes (da mesa, se informada), sem a padrão."""
+        out: Dict[ReportView, None] = {}
+        for sub in self.subscribers.values():
+            if table_key is not None and (sub.table_key or self.default_table) != table_key:
+                continue
+            view = sub.view(self.window_size)
+            if view is not None:
+                out[view] = None
+        return list(out)
+
+    def views_by_table(self) -> Dict[int, List[ReportView]]:
+        """Modo supervisor: mesa -> visões que os workers precisam renderizar."""
+        out: Dict[int, Dict[ReportView, None]] = {}
+        for sub in self.subscribers.values():
+            key = sub.table_key if sub.table_key is not None else self.default_table
+            view = sub.view(self.window_size)
+            if key is not None and view is not None:
+                out.setdefault(key, {})[view] = None
+        return {k: list(v) for k, v in out.items()}
+
+    def sync_views(self, views: Optional[List[ReportView]] = None) -> None:
+        """Deixa só os contadores/relatórios das visões em uso (o resto é memória à toa)."""
+        if views is None:
+            views = self.views_in_use()
+        sizes = {v.window for v in views}
+        for size in [s for s in self.window_views if s not in sizes or s == self.window_size]:
+            del self.window_views[size]
+        for size in sizes:
+            self.window_counters(size)
+        keep = set(views)
+        for view in [v for v in self.view_reports if v not in keep]:
+            del self.view_reports[view]
+        if self.table_view_reports:
+            by_table = self.views_by_table()
+            for key in [k for k in self.table_view_reports if k[1] not in by_table.get(k[0], [])]:
+                del self.table_view_reports[key]
+
     def reset_history(self) -> None:
         """Limpa histórico visível e dedup (use só se você REALMENTE quiser zerar a sessão)."""
         self.results.clear()
+        self.transitions.reset()
+        self.window_stats.reset()
+        for wc in self.window_views.values():
+            wc.stats.reset()
+            wc.transitions.reset()
         self.seen_game_ids.clear()
         self.seen_game_ids_queue.clear()
         self.total_games = 0
         self.last_number = None
+        self.gaps.reset()
 
-    def progress_count(self) -> int:
-        return min(len(self.results), self.window_size)
+    def progress_count(self, window: Optional[int] = None) -> int:
+        return min(len(self.results), window or self.window_size)
 
-    def progress_percent(self) -> int:
-        if self.window_size <= 0:
+    def progress_percent(self, window: Optional[int] = None) -> int:
+        window = window or self.window_size
+        if window <= 0:
             return 0
-        return int((self.progress_count() / self.window_size) * 100)
+        return int((self.progress_count(window) / window) * 100)
 
-    def progress_bar(self, width: int = 20) -> str:
-        if self.window_size <= 0:
+    def progress_bar(self, width: int = 20, window: Optional[int] = None) -> str:
+        window = window or self.window_size
+        if window <= 0:
             return "░" * width
-        filled = int((self.progress_count() / self.window_size) * width)
+        filled = int((self.progress_count(window) / window) * width)
         filled = max(0, min(width, filled))
         return ("█" * filled) + ("░" * (width - filled))
 
-    def can_edit_now(self, min_seconds_between_edits: float) -> bool:
-        now = time.time()
-        return (now - self.last_edit_ts) >= float(min_seconds_between_edits)
+    def add_feed(self, name: str) -> FeedLiveness:
+        feed = self.feeds.get(name)
+        if feed is None:
+            feed = new_liveness(name, self.spin_clock)
+            self.feeds[name] = feed
+        return feed
 
-    def mark_edited(self, new_text: str) -> None:
-        self.last_render_text = new_text
-        self.last_edit_ts = time.time()
+    def subscribe(self, chat_id: int, table_key: Optional[int] = None) -> FixedMessage:
+        sub = self.subscribers.get(chat_id)
+        if sub is None:
+            sub = FixedMessage(chat_id=chat_id, table_key=table_key)
+            self.subscribers[chat_id] = sub
+        elif table_key is not None and sub.table_key != table_key:
+            # trocou de mesa: as mensagens fixas continuam, o texto muda todo
+            sub.table_key = table_key
+        return sub
+
+    def control_snapshot(self) -> Dict[str, Any]:
+        """O mínimo pra outra réplica assumir sem recriar mensagens (vai no lease)."""
+        return {
+            "running": self.running,
+            "window_size": self.window_size,
+            "subscribers": [
+                {
+                    "chat_id": sub.chat_id,
+                    "table_key": sub.table_key,
+                    "message_ids": [p.message_id for p in sub.parts],
+                    "window_size": sub.window_size,
+                    "blocks": list(sub.blocks),
+                    "suspended": sub.suspended,
+                }
+                for sub in self.subscribers.values()
+            ],
+            # regras de alerta: /alerta só chega no líder, quem assume precisa delas
+            "alerts": [list(spec) for spec in self.alerts.specs()],
+            "alert_next_id": self.alerts.next_id,
+        }
+
+    def apply_control_snapshot(self, snap: Dict[str, Any]) -> None:
+        """Seguidor: espelha o controle do líder (os dados ele ingere sozinho)."""
+        self.running = bool(snap.get("running", self.running))
+
+        n = snap.get("window_size")
+        if isinstance(n, int) and n > 0 and n != self.window_size:
+            self.set_window_size(n)
+
+        keep = set()
+        for item in snap.get("subscribers") or []:
+            try:
+                chat_id = int(item["chat_id"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            keep.add(chat_id)
+            sub = self.subscribe(chat_id, item.get("table_key"))
+            sub.window_size = item.get("window_size")
+            sub.blocks = tuple(item.get("blocks") or ())
+            sub.suspended = bool(item.get("suspended"))
+            ids = item.get("message_ids") or []
+            sub.ensure_parts(len(ids))
+            for part, mid in zip(sub.parts, ids):
+                if part.message_id != mid:
+                    part.message_id = mid
+                    # texto desconhecido: o 1º edit depois de assumir manda tudo
+                    part.last_render_text = ""
+
+        for chat_id in [c for c in self.subscribers if c not in keep]:
+            self.subscribers.pop(chat_id, None)
+        self.sync_views()
+
+        specs = snap.get("alerts")
+        if isinstance(specs, list):
+            # mesmos ids do líder (o /alerta_del de depois da troca acha a regra)
+            self.alerts.set_rules([(int(i), str(t), float(c)) for i, t, c in specs])
+            # id de regra apagada no líder não volta a ser usado
+            self.alerts.next_id = max(self.alerts.next_id, int(snap.get("alert_next_id") or 0))
+
+    def report_for(self, sub: FixedMessage) -> List[str]:
+        """
+        Relatório que esse assinante deve ver (da mesa dele, ou o local; da visão dele).
+        Visão ainda não renderizada (acabou de mudar): vai a padrão até o próximo giro.
+        """
+        key = sub.table_key if sub.table_key is not None else self.default_table
+        view = sub.view(self.window_size)
+        if key is not None and key in self.table_reports:
+            if view is not None and (key, view) in self.table_view_reports:
+                return self.table_view_reports[(key, view)]
+            return self.table_reports[key]
+        if view is not None and view in self.view_reports:
+            return self.view_reports[view]
+        return self.report_parts
 
-    def set_fixed_message(self, chat_id: int, message_id: int) -> None:
-        self.chat_id = chat_id
-        self.message_id = message_id
+    def unsubscribe(self, chat_id: int) -> bool:
+        removed = self.subscribers.pop(chat_id, None) is not None
+        if removed:
+            self.sync_views()
+        return removed
@@ -0,0 +1,106 @@
+﻿# Distribui O MESMO relatório renderizado pra todos os assinantes
+# - renderiza 1x por giro (quem chama), aqui só faz fan-out
+# - limite global: fica no outbox (token bucket compartilhado com admin/alertas)
+# - limite por chat (pacer adaptativo: ~1 edit/s, desacelera com 429)
+# - prioridade pros chats mais "atrasados" (edit mais antigo primeiro)
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from telegram import Bot
+from telegram.error import RetryAfter, TelegramError
+
+from bot.core.pacing import retry_after_seconds
+from bot.storage.state import BotState, FixedMessage
+from bot.telegram.messenger import edit_fixed_message, is_permanent_error
+from bot.telegram.outbox import PRIO_REPORT, dispatch
+
+
+@dataclass
+class Broadcaster:
+    # quanto esperar (s) entre rodadas quando ainda tem chat pendente
+    tick_seconds: float = 0.2
+
+    _wake: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        """Chama depois de atualizar state.report_parts (novo giro)."""
+        self._wake.set()
+
+    def _pending(self, state: BotState) -> List[FixedMessage]:
+        out = []
+        for s in state.subscribers.values():
+            if s.suspended:
+                # erro permanente: não gasta token do limite global toda rodada
+                continue
+            parts = state.report_for(s)
+            if parts and s.changed_parts(parts):
+                out.append(s)
+        return out
+
+    async def _deliver(self, bot: Bot, state: BotState, sub: FixedMessage) -> None:
+        # lê o relatório na hora de rodar: se a fila atrasou, já manda o mais novo
+        async def _edit(max_calls: int) -> int:
+            return await edit_fixed_message(bot, sub, state.report_for(sub), max_calls=max_calls)
+
+        def _cost() -> int:
+            # 1 token por chamada à API (cada parte alterada = 1 edit)
+            return len(sub.changed_parts(state.report_for(sub)))
+
+        try:
+            await dispatch(PRIO_REPORT, _edit, key=("report", sub.chat_id), cost=_cost)
+        except RetryAfter as e:
+            sub.pacer.on_retry_after(retry_after_seconds(e.retry_after))
+            sub.last_error = f"RetryAfter: {e.retry_after}s"
+        except TelegramError as e:
+            # BadRequest "chat not found" etc.: marca e segue com os outros
+            sub.last_error = f"{type(e).__name__}: {e}"
+            sub.last_edit_ts = time.time()
+            sub.pacer.last_edit_ts = sub.last_edit_ts
+            if is_permanent_error(e):
+                sub.suspended = True
+
+    async def flush(self, bot: Bot, state: BotState) -> Optional[float]:
+        """
+        Uma rodada de fan-out.
+        Retorna em quantos segundos vale tentar de novo (None = nada pendente).
+        """
+        pending = self._pending(state)
+        if not pending:
+            return None
+
+        now = time.time()
+        ready = [s for s in pending if s.pacer.ready(now)]
+        # mais atrasado primeiro (a fila respeita a ordem de chegada dentro da prioridade)
+        ready.sort(key=lambda s: s.last_edit_ts)
+
+        if ready:
+            await asyncio.gather(*(self._deliver(bot, state, sub) for sub in ready))
+
+        # sobrou alguém (pacer segurando, 429...)? volta quando o primeiro liberar
+        remaining = self._pending(state)
+        if not remaining:
+            return None
+        now = time.time()
+        soonest = min(s.pacer.next_ready_in(now) for s in remaining)
+        return max(self.tick_seconds, soonest)
+
+    async def run(self, bot: Bot, state: BotState) -> None:
+        """Loop de fan-out (task em background)."""
+        retry_in: Optional[float] = None
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=retry_in)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            # seguidor (várias réplicas) não edita: só o líder
+            if not state.running or not state.is_leader:
+                retry_in = None
+                continue
+
+            retry_in = await self.flush(bot, state)
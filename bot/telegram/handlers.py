@@ -1,6 +1,7 @@
 ﻿from __future__ import annotations
 
-from typing import List
+import time
+from typing import List, Optional
 
 from telegram import Update
 from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
@@ -22,19 +23,64 @@ def _get_state(context: ContextTypes.DEFAULT_TYPE):
 
 
 async def _refresh_fixed_message(context: ContextTypes.DEFAULT_TYPE, state, chat_id: int, force: bool = False) -> None:
-    from bot.core.formatter import render_report
     from bot.telegram.messenger import ensure_fixed_message, edit_fixed_message
-    from bot.config import MIN_SECONDS_BETWEEN_EDITS
+    from bot.telegram.outbox import PRIO_ADMIN, dispatch
+
+    sub = state.subscribers.get(chat_id)
+    if sub is not None and _has_workers(context) and state.report_for(sub) is not state.report_parts:
+        # modo supervisor: o relatório dessa mesa vem pronto do worker
+        parts = state.report_for(sub)
+    else:
+        _render_local(state)
+        parts = state.report_for(sub) if sub is not None else state.report_parts
+
+    async def _refresh(_: int) -> None:
+        sub = await ensure_fixed_message(context.bot, state, chat_id, parts)
+        await edit_fixed_message(context.bot, sub, parts, force=force)
+
+    # comando de admin: fura a fila do relatório (mesma fila, prioridade maior)
+    cost = len(sub.changed_parts(parts)) if sub else len(parts)
+    await dispatch(PRIO_ADMIN, _refresh, cost=max(1, cost), chat=chat_id)
+
+    # os outros assinantes recebem pelo broadcaster (respeitando os limites)
+    _notify_broadcaster(context)
+
+
+def _render_local(state) -> None:
+    from bot.config import REPORT_LAYOUT
+    from bot.core.formatter import render_report_parts, render_view_reports
+
+    state.report_parts = render_report_parts(state, REPORT_LAYOUT)
+    state.view_reports = render_view_reports(state, REPORT_LAYOUT, state.views_in_use())
+
+
+def _has_workers(context: ContextTypes.DEFAULT_TYPE) -> bool:
+    return context.application.bot_data.get("supervisor") is not None
 
-    text = render_report(state)
-    await ensure_fixed_message(context.bot, state, chat_id, text)
-    await edit_fixed_message(
-        context.bot,
-        state,
-        text,
-        min_seconds_between_edits=MIN_SECONDS_BETWEEN_EDITS,
-        force=force,
-    )
+
+def _configure_workers(context: ContextTypes.DEFAULT_TYPE, **cfg) -> None:
+    # modo supervisor: a janela vale pras mesas dos workers também; as visões
+    # dos assinantes vão junto (cada worker renderiza as das mesas dele)
+    supervisor = context.application.bot_data.get("supervisor")
+    if supervisor is not None:
+        supervisor.configure(views=_get_state(context).views_by_table(), **cfg)
+
+
+def _sync_views(context: ContextTypes.DEFAULT_TYPE, state) -> None:
+    """Assinantes/visões mudaram: só os contadores em uso e 1 render por visão."""
+    state.sync_views()
+    if _has_workers(context):
+        _configure_workers(context)
+    elif state.report_parts:
+        # já tem relatório: as visões novas saem agora, sem esperar o próximo giro
+        _render_local(state)
+    _notify_broadcaster(context)
+
+
+def _notify_broadcaster(context: ContextTypes.DEFAULT_TYPE) -> None:
+    broadcaster = context.application.bot_data.get("broadcaster")
+    if broadcaster is not None:
+        broadcaster.notify()
 
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -53,9 +99,13 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     state.running = True
     state.awaiting_window_size = False
     state.awaiting_window_size_chat_id = None
+    sub = state.subscribers.get(chat_id)
+    if sub is not None:
+        # o admin falou daqui: o chat está acessível de novo
+        sub.suspended = False
 
     await _refresh_fixed_message(context, state, chat_id, force=True)
-    await send_ephemeral(context.bot, chat_id, "✅ Bot ligado. Vou atualizar o relatório nessa mensagem fixa.")
+    await send_ephemeral(context.bot, chat_id, "✅ Bot ligado. Vou atualizar o relatório nessa mensagem fixa (e nos outros assinantes).")
 
 
 async def cmd_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -72,6 +122,7 @@ async def cmd_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     state = _get_state(context)
     state.running = False
+    state.gaps.break_seam()
     state.awaiting_window_size = False
     state.awaiting_window_size_chat_id = None
 
@@ -99,16 +150,158 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         "📈 STATUS\n\n"
         f"• Bot: {status}\n\n"
         f"• WS: {ws}\n\n"
+        f"• Feed:\n{_feed_summary(state)}\n\n"
+        f"• Giros perdidos: {_gap_summary(state)}\n\n"
         f"• Janela atual: {state.window_size}\n\n"
         f"• Total acumulado: {state.total_games}\n\n"
-        f"• Progresso: {state.progress_count()}/{state.window_size} ({state.progress_percent()}%)\n"
+        f"• Progresso: {state.progress_count()}/{state.window_size} ({state.progress_percent()}%)\n\n"
+        f"• Assinantes: {len(state.subscribers)}\n\n"
+        f"• Entrega: {_delivery_summary(state)}\n\n"
+        f"• Fila de saída: {_outbox_summary(context)}\n"
     )
+    elector = context.application.bot_data.get("elector")
+    if elector is not None:
+        msg += f"\n• Réplica: {elector.summary()}\n"
+
+    supervisor = context.application.bot_data.get("supervisor")
+    if supervisor is not None:
+        msg += "\n• Workers:\n" + "\n".join(f"  {line}" for line in supervisor.summary()) + "\n"
+
+    for pool in context.application.bot_data.get("http_pools", []):
+        msg += f"\n• HTTP {pool.summary()}\n"
+
+    webhook = context.application.bot_data.get("webhook")
+    if webhook is not None:
+        ws_stats = webhook.stats
+        msg += f"\n• Webhook: {ws_stats.received} updates | {ws_stats.rejected} recusados | {ws_stats.invalid} inválidos\n"
+    api = context.application.bot_data.get("api")
+    if api is not None:
+        msg += f"\n• API (:{context.application.bot_data.get('api_port')}): {api.summary()}\n"
+    stream = context.application.bot_data.get("stream")
+    if stream is not None:
+        msg += f"\n• Stream ({context.application.bot_data.get('stream_addr')}): {stream.summary()}\n"
+    loop_lag = context.application.bot_data.get("loop_lag")
+    if loop_lag is not None:
+        msg += f"\n• Event loop ({_loop_impl()}): {loop_lag.summary()}\n  atraso: {loop_lag.histogram()}\n"
     if state.ws_last_error:
         msg += f"\n• Último erro WS: {state.ws_last_error}\n"
+    for feed in state.feeds.values():
+        if feed.last_stale_reason:
+            msg += f"\n• Último feed parado ({feed.name}): {feed.last_stale_reason}\n"
 
     await send_ephemeral(context.bot, chat_id, msg)
 
 
+def _loop_impl() -> str:
+    import asyncio
+
+    from bot.config import EVENT_LOOP
+    from bot.core.eventloop import loop_name
+
+    impl = loop_name(asyncio.get_running_loop())
+    if EVENT_LOOP == "uvloop" and impl != "uvloop":
+        impl += ", uvloop pedido mas não instalado"
+    return impl
+
+
+def _feed_summary(state) -> str:
+    if not state.feeds:
+        return "  —"
+    lines = []
+    for feed in state.feeds.values():
+        ok = "✅" if feed.connected() else "⚠️"
+        lines.append(f"  {ok} {feed.name}: {feed.summary()}")
+        lines.append(f"     reconexões: {feed.reconnect_summary()}")
+    # com 2+ conexões: quem entrega primeiro
+    if len(state.feeds) > 1:
+        for line in state.arrivals.summaries():
+            lines.append(f"  🏁 {line}")
+    return "\n".join(lines)
+
+
+def _gap_summary(state) -> str:
+    g = state.gaps
+    if g.gaps_total <= 0:
+        return "nenhum"
+    txt = f"~{g.missing_total} em {g.gaps_total} buraco(s)"
+    if g.unknown_gaps:
+        txt += f" ({g.unknown_gaps} sem horário pra estimar)"
+    last = g.last_gap()
+    if last is not None and last.seconds > 0:
+        txt += f" | último: ~{last.missing} giro(s) em {last.seconds:.0f}s"
+    return txt
+
+
+def _delivery_summary(state) -> str:
+    now = time.time()
+    pacers = [sub.pacer for sub in state.subscribers.values()]
+    epm = sum(p.edits_per_minute(now) for p in pacers)
+    backoff = sum(1 for p in pacers if p.in_backoff(now))
+    return f"{epm} edits/min ({backoff} chat(s) em backoff)"
+
+
+def _outbox_summary(context: ContextTypes.DEFAULT_TYPE) -> str:
+    from bot.telegram.outbox import PRIO_NAMES
+
+    outbox = context.application.bot_data.get("outbox")
+    if outbox is None:
+        return "—"
+    queued = outbox.queued()
+    parts = [f"{PRIO_NAMES[p]} {queued.get(p, 0)}" for p in sorted(PRIO_NAMES)]
+    return f"{outbox.in_flight}/{outbox.concurrency} em voo | fila: " + ", ".join(parts)
+
+
+def _outbox_wait_summary(context: ContextTypes.DEFAULT_TYPE) -> str:
+    from bot.telegram.outbox import PRIO_NAMES
+
+    outbox = context.application.bot_data.get("outbox")
+    if outbox is None:
+        return ""
+    st = outbox.stats
+    waits = ", ".join(f"{PRIO_NAMES[p]} {st.max_wait.get(p, 0.0):.1f}s" for p in sorted(PRIO_NAMES))
+    return f"Espera máx. na fila: {waits}\nMesclados: {st.merged} | 429 repetidos: {st.retried} | falhas: {st.failed}\n\n"
+
+
+async def cmd_entrega(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    now = time.time()
+
+    lines = []
+    for sub in state.subscribers.values():
+        p = sub.pacer
+        line = (
+            f"• {sub.chat_id}: {p.edits_per_minute(now)} edits/min | "
+            f"intervalo {p.interval:.1f}s | 429: {p.retry_after_count} | "
+            f"backoff total {p.backoff_seconds:.0f}s"
+        )
+        if p.in_backoff(now):
+            line += f" | ⏳ bloqueado {p.blocked_until - now:.0f}s"
+        lines.append(line)
+
+    body = "\n".join(lines) if lines else "Nenhum assinante."
+    await send_ephemeral(
+        context.bot,
+        chat_id,
+        "🚚 ENTREGA (últimos 60s)\n\n"
+        f"Total: {_delivery_summary(state)}\n\n"
+        f"Fila: {_outbox_summary(context)}\n\n"
+        + "".join(f"HTTP {pool.summary()}\n\n" for pool in context.application.bot_data.get("http_pools", []))
+        + _outbox_wait_summary(context)
+        + body,
+    )
+
+
 async def cmd_configurar_janela(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     from bot.config import is_admin, validate_window_size, typical_window_values
     from bot.telegram.messenger import send_ephemeral
@@ -135,6 +328,7 @@ async def cmd_configurar_janela(update: Update, context: ContextTypes.DEFAULT_TY
 
         n = validate_window_size(n)
         state.set_window_size(n)
+        _configure_workers(context, window_size=n)
         state.awaiting_window_size = False
         state.awaiting_window_size_chat_id = None
 
@@ -193,6 +387,7 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     n = validate_window_size(n)
     state.set_window_size(n)
+    _configure_workers(context, window_size=n)
     state.awaiting_window_size = False
     state.awaiting_window_size_chat_id = None
 
@@ -200,6 +395,621 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await _refresh_fixed_message(context, state, chat_id, force=True)
 
 
+async def cmd_vizinhos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin, SECTOR_NEIGHBORS
+    from bot.core.analytics import SECTOR_K_MAX, compute_analytics_from_counts
+    from bot.core.buffer import current_window_label
+    from bot.telegram import texts
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    if _has_workers(context):
+        # modo supervisor: a janela de giros vive nos workers (o gateway não ingere)
+        await send_ephemeral(context.bot, chat_id, texts.shard_unsupported_text("/vizinhos"))
+        return
+
+    state = _get_state(context)
+    args = context.args or []
+
+    k = SECTOR_NEIGHBORS
+    if args:
+        try:
+            k = int(args[0].strip())
+        except ValueError:
+            await send_ephemeral(context.bot, chat_id, "❌ Isso não é número. Ex: /vizinhos 2")
+            return
+        k = max(1, min(SECTOR_K_MAX, k))
+
+    window = current_window_label(state)
+    analytics = compute_analytics_from_counts(state.window_stats.pockets, window_label=window, sector_k=k)
+    await send_ephemeral(context.bot, chat_id, texts.sector_detail_text(window, analytics.sector_k, analytics.setores_rank))
+
+
+async def cmd_transicoes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.core.buffer import current_window_label
+    from bot.core.formatter import render_transitions_csv
+    from bot.telegram import texts
+    from bot.telegram.messenger import send_document, send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    if _has_workers(context):
+        # modo supervisor: a janela de giros vive nos workers (o gateway não ingere)
+        await send_ephemeral(context.bot, chat_id, texts.shard_unsupported_text("/transicoes"))
+        return
+
+    state = _get_state(context)
+    window = current_window_label(state)
+
+    await send_ephemeral(context.bot, chat_id, texts.transitions_block(window, state.transitions).strip())
+    await send_document(
+        context.bot,
+        chat_id,
+        filename=f"transicoes_janela{window}.csv",
+        data=render_transitions_csv(state.transitions).encode("utf-8"),
+        caption=f"🔁 Matrizes de transição (janela {window})",
+    )
+
+
+async def cmd_resumo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin, DATA_DIR, SECTOR_NEIGHBORS, TABLE_KEY
+    from bot.core.analytics import compute_analytics_from_counts
+    from bot.core.rollups import load_rollups, query
+    from bot.telegram import texts
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+
+    # /resumo [hoje|ontem|24h|7d|AAAA-MM-DD] [mesa] (mesa = número puro, em qualquer ordem)
+    periodo = "hoje"
+    table_key: Optional[int] = None
+    for a in context.args or []:
+        if a.isdigit():
+            table_key = int(a)
+        else:
+            periodo = a
+
+    if table_key is None:
+        table_key = state.default_table if state.default_table is not None else TABLE_KEY
+
+    rollups = state.rollups
+    if rollups is None or rollups.table_key != table_key:
+        # mesa de outro processo (workers): lê o que eles gravaram (atraso de até ROLLUP_FLUSH_SECONDS)
+        rollups = load_rollups(DATA_DIR, table_key)
+
+    try:
+        label, counts, hourly = query(rollups, periodo)
+    except ValueError:
+        await send_ephemeral(
+            context.bot, chat_id, "❌ Período inválido. Use: hoje, ontem, 24h, 7d ou AAAA-MM-DD (ex: /resumo ontem)"
+        )
+        return
+
+    analytics = compute_analytics_from_counts(counts, window_label=sum(counts), sector_k=SECTOR_NEIGHBORS)
+    await send_ephemeral(context.bot, chat_id, texts.rollup_text(label, table_key, analytics, counts, hourly))
+
+
+async def cmd_mem(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin, MEM_TRACE_TOP
+    from bot.core.memory import fmt_kb, footprint_line, gc_summary, rss_kb, state_footprint
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    mem = context.application.bot_data.get("mem")
+    sub = (context.args or [""])[0].lower()
+
+    # /mem trace | /mem diff | /mem off  (tracemalloc sob demanda)
+    if mem is not None and sub in ("trace", "diff", "off"):
+        if sub == "trace":
+            text = mem.trace_start()
+        elif sub == "diff":
+            text = mem.trace_diff(MEM_TRACE_TOP)
+        else:
+            text = mem.trace_stop()
+        await send_ephemeral(context.bot, chat_id, "🧠 TRACEMALLOC\n\n" + text)
+        return
+
+    msg = "🧠 MEMÓRIA\n\n" f"• RSS agora: {fmt_kb(rss_kb())}\n"
+    if mem is not None:
+        msg += (
+            f"• Pico: {fmt_kb(mem.peak_kb)} | boot: {fmt_kb(mem.baseline_kb)}\n"
+            f"• Tendência: {mem.trend()}\n"
+        )
+    msg += f"• GC: {gc_summary()}\n\n"
+
+    supervisor = context.application.bot_data.get("supervisor")
+    if supervisor is None:
+        msg += f"• Mesa: {footprint_line(state_footprint(state))}\n"
+    else:
+        # workers mandam o custo por mesa no batimento (atualizado a cada MEM_SAMPLE_SECONDS)
+        msg += f"• Gateway: {footprint_line(state_footprint(state))}\n"
+        for slot in supervisor.slots:
+            tables = sorted(slot.status.items(), key=lambda kv: -kv[1].get("mem_bytes", 0))
+            per_table = sum(st.get("mem_bytes", 0) for _, st in tables) / max(1, len(tables))
+            top = ", ".join(f"{k}: {fmt_kb(st.get('mem_bytes', 0) / 1024)}" for k, st in tables[:3])
+            msg += (
+                f"\n• Worker {slot.slot}: RSS {fmt_kb(slot.rss_kb)} ({fmt_kb(slot.rss_kb / max(1, len(tables)))}/mesa) | "
+                f"{len(tables)} mesa(s), estruturas ~{fmt_kb(per_table / 1024)}/mesa | maiores: {top or '—'}"
+            )
+        msg += "\n"
+
+    if mem is not None:
+        msg += "\n/mem trace → liga o tracemalloc | /mem diff → o que cresceu | /mem off"
+    await send_ephemeral(context.bot, chat_id, msg)
+
+
+async def cmd_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin, PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS
+    from bot.core.profiler import profile_loop
+    from bot.telegram.messenger import send_document, send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    # /profile [segundos] (padrão 10)
+    seconds = 10
+    if context.args:
+        try:
+            seconds = int(context.args[0])
+        except ValueError:
+            await send_ephemeral(context.bot, chat_id, "❌ Isso não é número. Ex: /profile 30")
+            return
+    seconds = max(1, min(PROFILE_MAX_SECONDS, seconds))
+
+    await send_ephemeral(context.bot, chat_id, f"🔬 Perfilando o event loop por {seconds}s...")
+    try:
+        result = await profile_loop(seconds, interval=PROFILE_INTERVAL_MS / 1000.0)
+    except RuntimeError as e:
+        await send_ephemeral(context.bot, chat_id, f"❌ {e}")
+        return
+
+    caption = f"🔬 {result.samples} amostras em {result.seconds:.0f}s\n{result.stage_summary()}"
+    loop_lag = context.application.bot_data.get("loop_lag")
+    if loop_lag is not None and loop_lag.slow:
+        caption += "\n\nTravadas recentes:\n" + "\n".join(
+            f"{s.blocked * 1000:.0f}ms [{s.stage}] {s.where}" for s in list(loop_lag.slow)[-3:]
+        )
+    if context.application.bot_data.get("supervisor") is not None:
+        caption += "\n\n(só o processo principal; os workers não entram)"
+    await send_document(
+        context.bot,
+        chat_id,
+        filename=f"profile_{seconds}s.folded",
+        data=result.collapsed(),
+        caption=caption[:1024],
+    )
+
+
+async def cmd_export(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    import os
+
+    from bot.config import is_admin, DATA_DIR, EXPORT_CHUNK_ROWS, EXPORT_MAX_DOCUMENT_MB, TABLE_KEY
+    from bot.core.archive import (
+        EXPORT_FORMATS,
+        ExportError,
+        archive_tables,
+        day_range,
+        export_filename,
+        flush_archives,
+        run_export,
+    )
+    from bot.core.memory import fmt_kb
+    from bot.telegram.messenger import send_document, send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+
+    # /export [hoje|ontem|7d|AAAA-MM-DD[:AAAA-MM-DD]|tudo] [mesa,mesa|todas] [csv|parquet] (qualquer ordem)
+    periodo, fmt = "hoje", "csv"
+    tables: Optional[List[int]] = None
+    for a in context.args or []:
+        low = a.lower()
+        if low in EXPORT_FORMATS:
+            fmt = low
+        elif low == "todas":
+            tables = archive_tables(DATA_DIR)
+        elif a.replace(",", "").isdigit():
+            tables = [int(x) for x in a.split(",") if x]
+        else:
+            periodo = a
+
+    if tables is None:
+        tables = [state.default_table if state.default_table is not None else TABLE_KEY]
+    if not tables:
+        await send_ephemeral(context.bot, chat_id, "❌ Nenhuma mesa com giros gravados ainda.")
+        return
+
+    try:
+        first, last, label = day_range(periodo)
+    except ValueError:
+        await send_ephemeral(
+            context.bot,
+            chat_id,
+            "❌ Período inválido. Use: hoje, ontem, 7d, AAAA-MM-DD, AAAA-MM-DD:AAAA-MM-DD ou tudo (ex: /export 7d csv)",
+        )
+        return
+
+    if state.archive is not None:
+        # giros ainda na fila entram no export (workers gravam a cada ARCHIVE_FLUSH_SECONDS)
+        await flush_archives([state.archive])
+
+    filename = export_filename(tables, label, fmt)
+    path = os.path.join(DATA_DIR, "exports", filename)
+    await send_ephemeral(context.bot, chat_id, f"📦 Exportando {len(tables)} mesa(s), {label} ({fmt})...")
+    try:
+        result = await run_export(DATA_DIR, tables, first, last, fmt, path, chunk_rows=EXPORT_CHUNK_ROWS)
+    except (RuntimeError, ExportError, OSError) as e:
+        await send_ephemeral(context.bot, chat_id, f"❌ {e}")
+        return
+
+    if result.rows == 0:
+        os.remove(result.path)
+        await send_ephemeral(context.bot, chat_id, "📦 Nenhum giro gravado nesse período.")
+        return
+
+    caption = f"📦 {result.rows} giros | {len(tables)} mesa(s) | {label}"
+    if result.size > EXPORT_MAX_DOCUMENT_MB * 1024 * 1024:
+        # acima do limite do sendDocument: fica no disco (pegue pelo volume ou rode o bot.export lá)
+        await send_ephemeral(
+            context.bot, chat_id, f"{caption}\n\nArquivo grande demais pro Telegram ({fmt_kb(result.size / 1024)}): {result.path}"
+        )
+        return
+
+    try:
+        await send_document(context.bot, chat_id, filename=filename, caption=caption, path=result.path)
+    finally:
+        # falhou o envio também: o export não fica ocupando o disco
+        os.remove(result.path)
+
+
+async def cmd_alerta(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin, ALERT_COOLDOWN_SECONDS, ALERT_RULES_MAX
+    from bot.core.alerts import RuleError
+    from bot.telegram import texts
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    raw = " ".join(context.args or []).strip()
+
+    if not raw:
+        await send_ephemeral(context.bot, chat_id, "🚨 Criar alerta\n\n" + texts.alert_usage_text())
+        return
+
+    if len(state.alerts.rules) >= ALERT_RULES_MAX:
+        await send_ephemeral(context.bot, chat_id, f"❌ Limite de {ALERT_RULES_MAX} regras atingido. Remova alguma com /alerta_del")
+        return
+
+    try:
+        rule = state.alerts.add_rule(raw, default_cooldown_s=ALERT_COOLDOWN_SECONDS)
+    except RuleError as e:
+        await send_ephemeral(context.bot, chat_id, f"❌ Regra inválida: {e}\n\nEx: /alerta duzia2 ausente >= 10")
+        return
+
+    msg = f"✅ Alerta #{rule.rule_id} criado: {rule.describe()}\n\n(cooldown {int(rule.cooldown_s)}s)"
+    if _has_workers(context):
+        # modo supervisor: quem avalia são os workers (cada mesa); o gateway não ingere
+        state.alerts.drain()
+        _configure_workers(context, alerts=state.alerts.specs())
+        msg += "\n\nVale pra todas as mesas; o alerta diz em qual disparou."
+    elif any(f.rule is rule for f in state.alerts.pending):
+        # condição já valia na hora de criar: o alerta sai junto com o próximo giro
+        msg += "\n\n⚡ A condição já vale agora: o alerta sai no próximo giro."
+    await send_ephemeral(context.bot, chat_id, msg)
+
+
+async def cmd_alertas(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.core.alerts import KIND_ABSENT
+    from bot.telegram import texts
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    engine = state.alerts
+
+    lines = []
+    for rule in engine.rules.values():
+        if _has_workers(context):
+            # contadores ficam nos workers, 1 por mesa
+            now_txt = "avaliado em cada mesa"
+        elif rule.kind == KIND_ABSENT:
+            now_txt = f"agora: {engine.absence(rule.category)} giros sem"
+        else:
+            run = engine.streak.get(rule.category, 0) if engine.last_seen.get(rule.category) == engine.seq else 0
+            now_txt = f"agora: {run} seguidas"
+        lines.append(f"#{rule.rule_id} • {rule.text}\n{rule.describe()} ({now_txt})")
+
+    await send_ephemeral(context.bot, chat_id, texts.alert_rules_text(lines))
+
+
+async def cmd_alerta_del(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    args = context.args or []
+
+    try:
+        rule_id = int(args[0].strip().lstrip("#"))
+    except (IndexError, ValueError):
+        await send_ephemeral(context.bot, chat_id, "❌ Informe o id. Ex: /alerta_del 3")
+        return
+
+    if state.alerts.remove_rule(rule_id):
+        if _has_workers(context):
+            _configure_workers(context, alerts=state.alerts.specs())
+        await send_ephemeral(context.bot, chat_id, f"🗑️ Alerta #{rule_id} removido.")
+    else:
+        await send_ephemeral(context.bot, chat_id, f"❌ Alerta #{rule_id} não existe. Veja /alertas")
+
+
+def _parse_chat_arg(args: List[str], default: int) -> Optional[int]:
+    if not args:
+        return default
+    try:
+        return int(args[0].strip())
+    except ValueError:
+        return None
+
+
+async def cmd_assinar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    from bot.config import TABLE_KEYS
+
+    state = _get_state(context)
+    args = context.args or []
+    target = _parse_chat_arg(args, chat_id)
+    if target is None:
+        await send_ephemeral(context.bot, chat_id, "❌ Informe o chat_id numérico. Ex: /assinar -1001234567890")
+        return
+
+    # /assinar <chat_id> <mesa>: escolhe a mesa (modo várias mesas)
+    table_key = None
+    if len(args) >= 2:
+        try:
+            table_key = int(args[1].strip())
+        except ValueError:
+            table_key = -1
+        if table_key not in TABLE_KEYS:
+            mesas = ", ".join(str(k) for k in TABLE_KEYS)
+            await send_ephemeral(context.bot, chat_id, f"❌ Mesa inválida. Mesas: {mesas}")
+            return
+
+    if target in state.subscribers:
+        sub = state.subscribers[target]
+        if sub.suspended:
+            # suspenso por erro permanente (bloqueou o bot etc.): tenta de novo
+            sub.suspended = False
+            sub.last_error = None
+            if table_key is not None:
+                state.subscribe(target, table_key)
+                _sync_views(context, state)
+            _notify_broadcaster(context)
+            await send_ephemeral(context.bot, chat_id, f"✅ {target} reativado (estava suspenso por erro).")
+            return
+        if table_key is None or sub.table_key == table_key:
+            await send_ephemeral(context.bot, chat_id, f"ℹ️ {target} já é assinante.")
+            return
+        state.subscribe(target, table_key)
+        _sync_views(context, state)
+        await send_ephemeral(context.bot, chat_id, f"✅ {target} agora acompanha a mesa {table_key}.")
+        return
+
+    # a mensagem fixa do novo assinante é criada pelo broadcaster no próximo giro
+    state.subscribe(target, table_key)
+    _notify_broadcaster(context)
+    await send_ephemeral(context.bot, chat_id, f"✅ {target} agora recebe o relatório. Assinantes: {len(state.subscribers)}")
+
+
+async def cmd_desassinar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    target = _parse_chat_arg(context.args or [], chat_id)
+    if target is None:
+        await send_ephemeral(context.bot, chat_id, "❌ Informe o chat_id numérico. Ex: /desassinar -1001234567890")
+        return
+
+    if state.unsubscribe(target):
+        _sync_views(context, state)
+        await send_ephemeral(context.bot, chat_id, f"🗑️ {target} removido. Assinantes: {len(state.subscribers)}")
+    else:
+        await send_ephemeral(context.bot, chat_id, f"❌ {target} não é assinante. Veja /assinantes")
+
+
+async def cmd_personalizar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin, validate_window_size
+    from bot.core.formatter import FIXED_BLOCKS, REPORT_BLOCKS
+    from bot.core.views import new_view
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    args = context.args or []
+    target = _parse_chat_arg(args, chat_id)
+    if target is None or target not in state.subscribers:
+        await send_ephemeral(context.bot, chat_id, "❌ Informe um assinante. Ex: /personalizar -1001234567890 janela 20")
+        return
+    sub = state.subscribers[target]
+    choosable = [b for b in REPORT_BLOCKS if b not in FIXED_BLOCKS]
+
+    # /personalizar <chat_id> [janela N|padrao] [blocos a,b,c|todos]
+    rest = args[1:]
+    if len(rest) % 2 != 0:
+        await send_ephemeral(context.bot, chat_id, "❌ Ex: /personalizar -100123 janela 20 blocos numbers,contagem")
+        return
+    # valida tudo antes de mexer: opção inválida no fim não deixa a visão pela metade
+    window_size, blocks = sub.window_size, sub.blocks
+    for opt, value in zip(rest[0::2], rest[1::2]):
+        opt, value = opt.lower(), value.strip().lower()
+        if opt == "janela":
+            if value in ("padrao", "padrão"):
+                window_size = None
+                continue
+            try:
+                window_size = validate_window_size(int(value))
+            except ValueError:
+                await send_ephemeral(context.bot, chat_id, "❌ Janela inválida. Ex: janela 20 ou janela padrao")
+                return
+        elif opt == "blocos":
+            if value == "todos":
+                blocks = ()
+                continue
+            names = [b for b in value.split(",") if b]
+            bad = [b for b in names if b not in choosable]
+            if bad or not names:
+                await send_ephemeral(context.bot, chat_id, f"❌ Bloco(s) inválido(s): {', '.join(bad) or '—'}\nBlocos: {', '.join(choosable)}")
+                return
+            blocks = new_view(0, tuple(names)).blocks
+        else:
+            await send_ephemeral(context.bot, chat_id, f"❌ Opção desconhecida: {opt} (use janela ou blocos)")
+            return
+
+    if rest:
+        sub.window_size, sub.blocks = window_size, blocks
+        _sync_views(context, state)
+
+    window = f"{sub.window_size}" if sub.window_size else f"padrão ({state.window_size})"
+    blocks = ", ".join(b for b in sub.blocks if b not in FIXED_BLOCKS) if sub.blocks else "todos"
+    await send_ephemeral(
+        context.bot,
+        chat_id,
+        f"🎛️ VISÃO DE {target}\n\n"
+        f"• Janela: {window}\n"
+        f"• Blocos: {blocks}\n\n"
+        f"Visões distintas agora: {len(state.views_in_use()) + 1} (cada uma renderiza 1x por giro)\n\n"
+        f"Blocos: {', '.join(choosable)}",
+    )
+
+
+async def cmd_assinantes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    from bot.config import is_admin
+    from bot.telegram.messenger import send_ephemeral
+
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    chat_id = chat.id
+    if not is_admin(chat_id):
+        return
+
+    state = _get_state(context)
+    if not state.subscribers:
+        await send_ephemeral(context.bot, chat_id, "📣 ASSINANTES\n\nNenhum. Use /start aqui ou /assinar <chat_id>.")
+        return
+
+    now = time.time()
+    lines = []
+    for sub in state.subscribers.values():
+        age = f"{int(now - sub.last_edit_ts)}s" if sub.last_edit_ts else "—"
+        line = f"• {sub.chat_id} (último edit: {age})"
+        if sub.table_key is not None:
+            line += f" | mesa {sub.table_key}"
+        if sub.window_size:
+            line += f" | janela {sub.window_size}"
+        if sub.blocks:
+            line += f" | blocos {','.join(sub.blocks)}"
+        if sub.suspended:
+            line += " | ⛔ suspenso (/assinar de novo pra reativar)"
+        if sub.last_error:
+            line += f"\n  ⚠️ {sub.last_error}"
+        lines.append(line)
+
+    await send_ephemeral(context.bot, chat_id, "📣 ASSINANTES\n\n" + "\n".join(lines))
+
+
 async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     from bot.config import is_admin, typical_window_values
     from bot.telegram.messenger import send_ephemeral
@@ -220,6 +1030,20 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "/stop - pausa o robô\n\n"
         "/status - status rápido\n\n"
         "/configurar_janela - muda janela\n\n"
+        "/vizinhos [k] - setores número ±k no cilindro\n\n"
+        "/transicoes - matrizes de transição (CSV)\n\n"
+        "/resumo [hoje|ontem|24h|7d|AAAA-MM-DD] [mesa] - agregado por hora/dia\n\n"
+        "/alerta <regra> - cria alerta (ex: duzia2 ausente >= 10)\n\n"
+        "/alertas - lista alertas\n\n"
+        "/alerta_del <id> - remove alerta\n\n"
+        "/assinar [chat_id] [mesa] - manda o relatório (da mesa) pra esse chat/canal\n\n"
+        "/desassinar [chat_id] - para de mandar\n\n"
+        "/assinantes - lista chats/canais\n\n"
+        "/personalizar <chat_id> [janela N|padrao] [blocos a,b|todos] - visão própria do chat\n\n"
+        "/entrega - edits/min e backoff por chat\n\n"
+        "/mem [trace|diff|off] - memória (RSS, por estrutura, tracemalloc)\n\n"
+        "/profile [segundos] - perfil do event loop (flamegraph collapsed)\n\n"
+        "/export [periodo] [mesa,mesa|todas] [csv|parquet] - giros brutos em arquivo\n\n"
         f"Valores típicos: {tips}\n\n"
         "Exemplos:\n"
         "/configurar_janela 5\n"
@@ -247,6 +1071,20 @@ def build_handlers() -> List:
         CommandHandler("stop", cmd_stop),
         CommandHandler("status", cmd_status),
         CommandHandler("configurar_janela", cmd_configurar_janela),
+        CommandHandler("vizinhos", cmd_vizinhos),
+        CommandHandler("transicoes", cmd_transicoes),
+        CommandHandler("resumo", cmd_resumo),
+        CommandHandler("alerta", cmd_alerta),
+        CommandHandler("alertas", cmd_alertas),
+        CommandHandler("alerta_del", cmd_alerta_del),
+        CommandHandler("assinar", cmd_assinar),
+        CommandHandler("desassinar", cmd_desassinar),
+        CommandHandler("assinantes", cmd_assinantes),
+        CommandHandler("personalizar", cmd_personalizar),
+        CommandHandler("entrega", cmd_entrega),
+        CommandHandler("mem", cmd_mem),
+        CommandHandler("profile", cmd_profile),
+        CommandHandler("export", cmd_export),
         CommandHandler("help", cmd_help),
         CommandHandler("id", cmd_id),
 
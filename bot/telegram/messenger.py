@@ -1,75 +1,87 @@
 ﻿# Responsável por criar/editar a mensagem fixa (sem spam)
 # Vai ter throttle e cache do último texto enviado
+# No layout "multi" são várias mensagens fixas por chat: só edita as que mudaram
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional
 
 from telegram import Bot, Message
-from telegram.error import BadRequest, TelegramError
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
 
-from bot.storage.state import BotState
+from bot.core.pacing import retry_after_seconds
+from bot.storage.state import BotState, FixedMessage
+from bot.telegram.outbox import PRIO_ADMIN, dispatch
 
 
-async def send_fixed_message(bot: Bot, state: BotState, chat_id: int, text: str) -> Message:
+# BadRequest que não passa tentando de novo (o chat não existe / o bot não pode escrever)
+PERMANENT_ERRORS = (
+    "chat not found",
+    "chat_id is empty",
+    "not enough rights",
+    "have no rights",
+    "need administrator rights",
+    "bot is not a member",
+)
+
+
+def is_permanent_error(e: TelegramError) -> bool:
+    """403 (bloqueou o bot, foi removido do canal) ou BadRequest de chat inacessível."""
+    if isinstance(e, Forbidden):
+        return True
+    return isinstance(e, BadRequest) and any(m in str(e).lower() for m in PERMANENT_ERRORS)
+
+
+async def send_fixed_message(bot: Bot, sub: FixedMessage, idx: int, text: str) -> Message:
     """
-    Envia a primeira mensagem (a que vai ficar sendo editada).
-    Salva chat_id e message_id no state.
+    Envia a mensagem da parte idx (a que vai ficar sendo editada) no chat do assinante.
+    Salva o message_id no próprio assinante.
     """
     msg = await bot.send_message(
-        chat_id=chat_id,
+        chat_id=sub.chat_id,
         text=text,
         disable_web_page_preview=True,
     )
-    state.set_fixed_message(chat_id=chat_id, message_id=msg.message_id)
-    state.mark_edited(text)
+    sub.ensure_parts(idx + 1)
+    sub.parts[idx].message_id = msg.message_id
+    sub.mark_edited(idx, text)
     return msg
 
 
-async def ensure_fixed_message(bot: Bot, state: BotState, chat_id: int, text: str) -> None:
+async def ensure_fixed_message(bot: Bot, state: BotState, chat_id: int, parts: List[str]) -> FixedMessage:
     """
-    Garante que existe uma mensagem fixa pra editar.
-    Se ainda não existe, cria.
+    Garante que o chat é assinante e tem as mensagens fixas (uma por parte) pra editar.
+    O que ainda não existe, cria, na ordem. (Não mexe nos outros chats.)
     """
-    if state.chat_id is None or state.message_id is None:
-        await send_fixed_message(bot, state, chat_id, text)
-        return
-
-    # Se o bot já tem uma message_id, mas chat_id mudou (ex: você iniciou em outro chat),
-    # a gente "reancora" no chat atual criando uma nova mensagem fixa.
-    if state.chat_id != chat_id:
-        await send_fixed_message(bot, state, chat_id, text)
-
-
-async def edit_fixed_message(
-    bot: Bot,
-    state: BotState,
-    text: str,
-    min_seconds_between_edits: float = 0.8,
-    force: bool = False,
-) -> bool:
+    sub = state.subscribe(chat_id)
+    sub.ensure_parts(len(parts))
+    sent = False
+    for idx, text in enumerate(parts):
+        if sub.parts[idx].message_id is None:
+            await send_fixed_message(bot, sub, idx, text)
+            sent = True
+    if sent:
+        sub.pacer.on_success(sub.last_edit_ts)
+    return sub
+
+
+async def _edit_part(bot: Bot, sub: FixedMessage, idx: int, text: str) -> bool:
     """
-    Edita a mensagem fixa (sem spam).
-    Retorna True se editou, False se não editou.
+    Uma chamada à API pra parte idx.
+    Retorna False se é pra parar a rodada nesse chat (429, rede...).
     """
-    if state.chat_id is None or state.message_id is None:
-        return False
-
-    # Se o texto é igual ao último, não faz nada (evita "message is not modified")
-    if text == state.last_render_text:
-        return False
-
-    # Rate limit: evita flood de edits
-    if not force and not state.can_edit_now(min_seconds_between_edits):
-        return False
+    part = sub.parts[idx]
+    if part.message_id is None:
+        await send_fixed_message(bot, sub, idx, text)
+        return True
 
     try:
         await bot.edit_message_text(
-            chat_id=state.chat_id,
-            message_id=state.message_id,
+            chat_id=sub.chat_id,
+            message_id=part.message_id,
             text=text,
             disable_web_page_preview=True,
         )
-        state.mark_edited(text)
+        sub.mark_edited(idx, text)
         return True
 
     except BadRequest as e:
@@ -77,35 +89,103 @@ async def edit_fixed_message(
         msg = str(e).lower()
 
         if "message is not modified" in msg:
-            state.mark_edited(text)
-            return False
+            # nada mudou do lado do Telegram: não conta como edit OK (não acelera o AIMD)
+            sub.mark_synced(idx, text)
+            return True
 
         # Se a mensagem não existe mais (apagaram), recria
         if "message to edit not found" in msg or "message identifier is not specified" in msg:
-            new_msg = await bot.send_message(
-                chat_id=state.chat_id,
-                text=text,
-                disable_web_page_preview=True,
-            )
-            state.set_fixed_message(chat_id=state.chat_id, message_id=new_msg.message_id)
-            state.mark_edited(text)
+            await send_fixed_message(bot, sub, idx, text)
             return True
 
         # Outras BadRequest: repassa
         raise
 
-    except TelegramError:
-        # Erros gerais (rede, timeout, etc.)
+    except RetryAfter as e:
+        # 429: o Telegram disse quanto esperar => pacer do chat segura e desacelera
+        sub.pacer.on_retry_after(retry_after_seconds(e.retry_after))
+        sub.last_error = f"RetryAfter: {e.retry_after}s"
+        return False
+
+    except TelegramError as e:
+        # Erros gerais (rede, timeout, bot removido do canal etc.)
+        sub.last_error = f"{type(e).__name__}: {e}"
+        if is_permanent_error(e):
+            sub.suspended = True
         return False
 
 
-async def send_ephemeral(bot: Bot, chat_id: int, text: str) -> None:
+async def edit_fixed_message(
+    bot: Bot,
+    sub: FixedMessage,
+    parts: List[str],
+    force: bool = False,
+    max_calls: Optional[int] = None,
+) -> int:
+    """
+    Edita SÓ as partes que mudaram (sem spam).
+    O intervalo entre rodadas é o do pacer do chat (adaptativo).
+    max_calls: teto de chamadas à API nessa rodada (tokens globais disponíveis).
+    Retorna quantas chamadas à API fez.
+    """
+    changed = sub.changed_parts(parts)
+    if not changed:
+        return 0
+
+    # Rate limit: evita flood de edits (force não fura um RetryAfter ativo)
+    if sub.pacer.in_backoff():
+        return 0
+    if not force and not sub.can_edit_now():
+        return 0
+
+    calls = 0
+    before = sub.last_edit_ts
+    for idx in changed:
+        if max_calls is not None and calls >= max_calls:
+            break
+        calls += 1
+        if not await _edit_part(bot, sub, idx, parts[idx]):
+            # 429/erro: o pacer já foi avisado; rodada não conta como sucesso, mas
+            # as partes que saíram contam pro espaçamento
+            sub.pacer.last_edit_ts = max(sub.pacer.last_edit_ts, sub.last_edit_ts)
+            return calls
+    if sub.last_edit_ts != before:
+        # 1 sucesso por rodada (5 partes editadas = 1 passo do AIMD, não 5)
+        sub.pacer.on_success(sub.last_edit_ts)
+    return calls
+
+
+async def send_ephemeral(bot: Bot, chat_id: int, text: str, prio: int = PRIO_ADMIN) -> None:
     """
     Envia uma mensagem "normal" (não é a fixa).
-    Útil pra /help, avisos, etc.
+    Útil pra /help, avisos, alertas etc. Passa pela fila de saída (prioridade).
     """
-    await bot.send_message(
-        chat_id=chat_id,
-        text=text,
-        disable_web_page_preview=True,
-    )
+    async def _send(_: int) -> None:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            disable_web_page_preview=True,
+        )
+
+    await dispatch(prio, _send, chat=chat_id)
+
+
+async def send_document(
+    bot: Bot,
+    chat_id: int,
+    filename: str,
+    data: bytes = b"",
+    caption: Optional[str] = None,
+    prio: int = PRIO_ADMIN,
+    path: Optional[str] = None,
+) -> None:
+    """Envia um arquivo (CSV, export etc.) como documento. path = arquivo em disco no lugar de data."""
+    async def _send(_: int) -> None:
+        if path is None:
+            await bot.send_document(chat_id=chat_id, document=data, filename=filename, caption=caption)
+            return
+        # reabre a cada tentativa (o outbox repete depois de um 429: manda do começo)
+        with open(path, "rb") as f:
+            await bot.send_document(chat_id=chat_id, document=f, filename=filename, caption=caption)
+
+    await dispatch(prio, _send, chat=chat_id)
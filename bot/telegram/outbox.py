@@ -0,0 +1,268 @@
+﻿# Fila única de saída pro Bot API (tudo que fala com o Telegram passa aqui)
+# - prioridade: resposta de admin > alerta > edit do relatório
+# - concorrência limitada de requests HTTP em voo (N workers)
+# - limite global (token bucket, ~30 msg/s)
+# - edit de relatório com a mesma chave ainda na fila NÃO duplica:
+#   o job lê o relatório mais novo na hora de rodar (o antigo fica "superado")
+# - 429 em resposta de admin/alerta: volta pra fila depois do retry_after (quem pediu só
+#   espera mais), 1 por vez por chat; edit de relatório não (o pacer do chat já cuida)
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Union
+
+from telegram.error import RetryAfter
+
+from bot.core.pacing import retry_after_seconds
+
+
+PRIO_ADMIN = 0
+PRIO_ALERT = 1
+PRIO_REPORT = 2
+
+PRIO_NAMES = {PRIO_ADMIN: "admin", PRIO_ALERT: "alerta", PRIO_REPORT: "relatório"}
+
+# 429 seguidos no mesmo job antes de desistir (aí o erro vai pra quem pediu)
+RETRY_AFTER_MAX = 5
+# jobs do mesmo chat que tomaram 429 voltam espaçados (limite do Telegram ~1 msg/s por chat)
+CHAT_RETRY_SPACING = 1.0
+
+
+@dataclass
+class TokenBucket:
+    rate: float          # tokens por segundo
+    capacity: float      # rajada máxima
+    tokens: float = -1.0
+    ts: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.tokens < 0:
+            self.tokens = self.capacity
+        self.ts = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def take(self, n: float = 1.0) -> bool:
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def wait_time(self, n: float = 1.0) -> float:
+        """Quanto falta (s) pra ter n tokens."""
+        self._refill()
+        if self.tokens >= n or self.rate <= 0:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+
+Cost = Union[int, Callable[[], int]]
+
+
+@dataclass
+class _Job:
+    prio: int
+    seq: int
+    fn: Callable[[int], Awaitable[Any]]
+    cost: Cost
+    key: Optional[Hashable]
+    future: "asyncio.Future[Any]"
+    enqueued_ts: float
+    chat: Optional[int] = None
+    retries: int = 0
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.prio, self.seq) < (other.prio, other.seq)
+
+
+@dataclass
+class OutboxStats:
+    done: Dict[int, int] = field(default_factory=lambda: {p: 0 for p in PRIO_NAMES})
+    merged: int = 0
+    failed: int = 0
+    retried: int = 0
+    max_wait: Dict[int, float] = field(default_factory=lambda: {p: 0.0 for p in PRIO_NAMES})
+
+
+class Outbox:
+    def __init__(self, bucket: TokenBucket, concurrency: int = 8) -> None:
+        self.bucket = bucket
+        self.concurrency = max(1, int(concurrency))
+        self.stats = OutboxStats()
+        self.in_flight = 0
+
+        self._queue: "asyncio.PriorityQueue[_Job]" = asyncio.PriorityQueue()
+        self._pending_keys: Dict[Hashable, _Job] = {}
+        self._seq = itertools.count()
+        self._workers: List["asyncio.Task[None]"] = []
+        self._chat_retry_at: Dict[int, float] = {}    # chat -> próximo horário livre pra repetir
+
+    # ---------- ciclo de vida ----------
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"outbox_{i}") for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for t in self._workers:
+            t.cancel()
+        for t in self._workers:
+            try:
+                await t
+            except (Exception, asyncio.CancelledError):
+                pass
+        self._workers = []
+
+    # ---------- entrada ----------
+    def submit(
+        self,
+        prio: int,
+        fn: Callable[[int], Awaitable[Any]],
+        key: Optional[Hashable] = None,
+        cost: Cost = 1,
+        chat: Optional[int] = None,
+    ) -> "asyncio.Future[Any]":
+        """
+        Enfileira fn(max_calls). Com key: se já tem um job igual esperando,
+        não enfileira outro (o que está na fila vai usar o estado mais novo).
+        chat: destino, pra espaçar as repetições depois de um 429.
+        """
+        if key is not None:
+            existing = self._pending_keys.get(key)
+            if existing is not None:
+                self.stats.merged += 1
+                return existing.future
+
+        job = _Job(
+            prio=prio,
+            seq=next(self._seq),
+            fn=fn,
+            cost=cost,
+            key=key,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_ts=time.monotonic(),
+            chat=chat,
+        )
+        if key is not None:
+            self._pending_keys[key] = job
+        self._queue.put_nowait(job)
+        return job.future
+
+    def queued(self) -> Dict[int, int]:
+        out = {p: 0 for p in PRIO_NAMES}
+        for job in list(self._queue._queue):  # type: ignore[attr-defined]
+            out[job.prio] = out.get(job.prio, 0) + 1
+        return out
+
+    # ---------- workers ----------
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                cost = job.cost() if callable(job.cost) else int(job.cost)
+                if cost > 0:
+                    cost = min(cost, int(self.bucket.capacity) or 1)
+                    if not self.bucket.take(cost):
+                        # sem token: devolve pra fila e espera. Quando liberar, quem sai
+                        # é o job de MAIOR prioridade (não o que por acaso estava na mão)
+                        self._queue.put_nowait(job)
+                        await asyncio.sleep(max(0.005, self.bucket.wait_time(cost)))
+                        continue
+                await self._run(job, cost)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: _Job, cost: int) -> None:
+        if job.key is not None:
+            self._pending_keys.pop(job.key, None)
+
+        if cost <= 0:
+            # nada mais a fazer (outro job já entregou o estado atual)
+            if not job.future.done():
+                job.future.set_result(None)
+            return
+
+        waited = time.monotonic() - job.enqueued_ts
+        if waited > self.stats.max_wait.get(job.prio, 0.0):
+            self.stats.max_wait[job.prio] = waited
+
+        self.in_flight += 1
+        try:
+            result = await job.fn(cost)
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.cancel()
+            raise
+        except RetryAfter as e:
+            if job.prio == PRIO_REPORT or job.retries >= RETRY_AFTER_MAX:
+                self.stats.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                # não segura o worker esperando: reenfileira sozinho quando o prazo passar
+                job.retries += 1
+                self.stats.retried += 1
+                asyncio.get_running_loop().call_later(self._retry_delay(job, e), self._queue.put_nowait, job)
+        except Exception as e:
+            self.stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats.done[job.prio] = self.stats.done.get(job.prio, 0) + 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.in_flight -= 1
+
+    def _retry_delay(self, job: _Job, e: RetryAfter) -> float:
+        now = time.monotonic()
+        at = now + retry_after_seconds(e.retry_after)
+        if job.chat is not None:
+            # vários jobs do chat tomaram 429 juntos: voltam um de cada vez, não todos no mesmo instante
+            at = max(at, self._chat_retry_at.get(job.chat, 0.0))
+            self._chat_retry_at[job.chat] = at + CHAT_RETRY_SPACING
+            if len(self._chat_retry_at) > 1024:
+                self._chat_retry_at = {c: t for c, t in self._chat_retry_at.items() if t > now}
+        return at - now
+
+
+# =========================
+# Outbox do processo (1 Application por processo)
+# =========================
+_OUTBOX: Optional[Outbox] = None
+
+
+def install_outbox(outbox: Optional[Outbox]) -> None:
+    global _OUTBOX
+    _OUTBOX = outbox
+
+
+def current_outbox() -> Optional[Outbox]:
+    return _OUTBOX
+
+
+async def dispatch(
+    prio: int,
+    fn: Callable[[int], Awaitable[Any]],
+    key: Optional[Hashable] = None,
+    cost: Cost = 1,
+    chat: Optional[int] = None,
+) -> Any:
+    """
+    Roda fn pela fila (se instalada) e espera o resultado.
+    Sem outbox (testes, scripts): chama direto.
+    """
+    outbox = _OUTBOX
+    if outbox is None:
+        n = cost() if callable(cost) else int(cost)
+        return await fn(max(1, n))
+    return await outbox.submit(prio, fn, key=key, cost=cost, chat=chat)
@@ -1,11 +1,11 @@
 ﻿from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
 import pytz
 
-from bot.core.analytics import RankItem
+from bot.core.analytics import GROUP_KEYS, RED_NUMBERS, AnalyticsResult, Deviation, FamilyTest, RankItem, SectorItem, TransitionCounts
 
 
 TZ_NAME = "America/Sao_Paulo"
@@ -39,13 +39,17 @@ def updated_time_block() -> str:
     return f"⏱ Atualizado: {fmt_time_br()} (UTC−3)\n"
 
 
-def status_block(total_games: int, window_size: int) -> str:
-    return (
+def status_block(total_games: int, window_size: int, missing: int = 0, gaps: int = 0) -> str:
+    txt = (
         "\n\n"
         "📌 STATUS\n\n"
         f"• Quantidade de jogos (total): {total_games}\n\n"
         f"• Janela analisada: {window_size} (últimos {window_size})\n"
     )
+    if gaps > 0:
+        # giros que rodaram enquanto o WS estava fora (a contagem acima não tem eles)
+        txt += f"\n• Giros perdidos (estimado): ~{missing} em {gaps} queda(s)\n"
+    return txt
 
 
 def loading_block(progress_bar: str, count: int, window: int, percent: int) -> str:
@@ -174,6 +178,177 @@ def region_rank_block(window: int, items: List[RankItem]) -> str:
     )
 
 
+def _sector_line(it: SectorItem) -> str:
+    nums = "·".join(str(n) for n in it.numbers)
+    return f"• {it.center} ±{it.k} ({nums}): {it.hits} ({it.pct}%)"
+
+
+def sector_block(window: int, k: int, items: List[SectorItem], top: int = 3) -> str:
+    # items já vem ordenado (mais quente -> mais frio)
+    lines: List[str] = []
+    for i, it in enumerate(items[:top]):
+        medal = _medal(i)
+        suffix = f" {medal}" if medal else ""
+        lines.append(_sector_line(it) + suffix)
+
+    expected = items[0].expected_pct if items else 0
+    return (
+        "\n\n"
+        "🎯 VIZINHOS — CILINDRO\n\n"
+        f"(janela {window} | número ±{k} | esperado {expected}%)\n\n"
+        + ("\n\n".join(lines) if lines else "—")
+        + "\n"
+    )
+
+
+def sector_detail_text(window: int, k: int, items: List[SectorItem], top: int = 5) -> str:
+    """Resposta do /vizinhos: mais quentes + mais frios."""
+    if not items or window <= 0:
+        return "🎯 VIZINHOS\n\nAinda sem resultados na janela."
+
+    hot = [_sector_line(it) for it in items[:top]]
+    cold = [_sector_line(it) for it in reversed(items[-3:])]
+    return (
+        "🎯 VIZINHOS — CILINDRO\n\n"
+        f"(janela {window} | número ±{k} | esperado {items[0].expected_pct}%)\n\n"
+        "🔥 Mais quentes\n"
+        + "\n".join(hot)
+        + "\n\n🧊 Mais frios\n"
+        + "\n".join(cold)
+        + "\n"
+    )
+
+
+_COLOR_EMOJI = ("🔴", "⚫", "🟢")
+
+
+def transitions_block(window: int, tc: TransitionCounts) -> str:
+    # compacto: uma linha por "de", colunas "pra"
+    cor_lines: List[str] = []
+    for i, row in enumerate(tc.cores):
+        cells = " · ".join(f"{_COLOR_EMOJI[j]} {v}" for j, v in enumerate(row))
+        cor_lines.append(f"{_COLOR_EMOJI[i]} → {cells}")
+
+    duz_lines: List[str] = []
+    for i in (1, 2, 3, 0):
+        row = tc.duzias[i]
+        cells = " · ".join(f"{GROUP_KEYS[j]} {row[j]}" for j in (1, 2, 3, 0))
+        duz_lines.append(f"{GROUP_KEYS[i]} → {cells}")
+
+    return (
+        "\n\n"
+        "🔁 TRANSIÇÕES\n\n"
+        f"(janela {window} | {tc.pairs} pares)\n\n"
+        + "\n".join(cor_lines)
+        + "\n\nDúzias\n"
+        + "\n".join(duz_lines)
+        + "\n"
+    )
+
+
+def deviation_block(window: int, tests: List[FamilyTest], deviations: List[Deviation], top: int = 5) -> str:
+    # só o que passa do limiar estatístico; o resto é ruído e não aparece
+    lines: List[str] = []
+    for t in tests:
+        if t.significant:
+            lines.append(f"• {t.family}: χ² {t.chi2:.1f} (gl {t.df}, p<1%)")
+    for d in deviations[:top]:
+        arrow = "⬆️" if d.z > 0 else "⬇️"
+        lines.append(f"• {d.family} {d.key}: {d.observed} vs {d.expected:.1f} esperado (z {d.z:+.1f}) {arrow}")
+
+    if not lines:
+        body = "Nada fora do esperado (variação normal)." if tests else "Amostra pequena pra afirmar desvio."
+    else:
+        body = "\n\n".join(lines)
+
+    return (
+        "\n\n"
+        "📐 DESVIOS SIGNIFICATIVOS\n\n"
+        f"(janela {window} | vs. probabilidade teórica)\n\n"
+        f"{body}\n"
+    )
+
+
+def alert_text(rule_id: int, description: str, rule_text: str, numero: int, table_key: Optional[int] = None) -> str:
+    mesa = f"Mesa: {table_key}\n" if table_key is not None else ""
+    return (
+        f"🚨 ALERTA #{rule_id}\n\n"
+        f"{description}\n\n"
+        f"{mesa}"
+        f"Último número: {numero}\n"
+        f"(regra: {rule_text})"
+    )
+
+
+def shard_unsupported_text(command: str) -> str:
+    return (
+        f"⚠️ {command} não está disponível com SHARD_WORKERS > 0: "
+        "a janela de giros fica nos workers, não no gateway.\n"
+        "Use /resumo [mesa] pros agregados da mesa."
+    )
+
+
+def alert_usage_text() -> str:
+    return (
+        "Formato:\n"
+        "<categoria> ausente|seguidas [>=] <giros> [cd <segundos>]\n\n"
+        "Categorias: vermelho, preto, zero, par, impar, baixo, alto, "
+        "duzia1..3, coluna1..3, voisins, tiers, orphelins, jeuzero, n0..n36\n\n"
+        "Exemplos:\n"
+        "/alerta duzia2 ausente >= 10\n"
+        "/alerta zero ausente 80\n"
+        "/alerta vermelho seguidas >= 6 cd 600"
+    )
+
+
+def alert_rules_text(lines: List[str]) -> str:
+    if not lines:
+        return "🚨 ALERTAS\n\nNenhuma regra ativa.\n\n" + alert_usage_text()
+    return "🚨 ALERTAS\n\n" + "\n\n".join(lines) + "\n\nRemover: /alerta_del <id>"
+
+
+def _hour_line(hour: str, counts: Sequence[int]) -> str:
+    total = sum(counts)
+    red = sum(counts[n] for n in RED_NUMBERS)
+    zero = counts[0]
+    return f"{hour}h: {total} giros | 🔴 {red} ⚫ {total - red - zero} 🟢 {zero}"
+
+
+def rollup_text(
+    periodo: str,
+    table_key: Optional[int],
+    a: AnalyticsResult,
+    counts: Sequence[int],
+    hourly: Optional[List[Tuple[str, Sequence[int]]]] = None,
+) -> str:
+    """Resposta do /resumo (agregado de horas/dias já somado)."""
+    mesa = f" · mesa {table_key}" if table_key is not None else ""
+    if a.total_spins <= 0:
+        return f"🗓 RESUMO — {periodo}{mesa}\n\nSem giros registrados nesse período."
+
+    ranked = sorted(range(len(counts)), key=lambda n: (-counts[n], n))
+    hot = " · ".join(f"{n} ({counts[n]})" for n in ranked[:5])
+    cold = " · ".join(f"{n} ({counts[n]})" for n in reversed(ranked[-5:]))
+
+    def rank(items: List[RankItem]) -> str:
+        return " | ".join(f"{it.key} {it.pct}%" for it in items)
+
+    txt = (
+        f"🗓 RESUMO — {periodo}{mesa}\n\n"
+        f"🎲 Giros: {a.total_spins}\n\n"
+        f"🔴 {a.vermelhos} ({a.pct_vermelhos}%) | ⚫ {a.pretos} ({a.pct_pretos}%) | 🟢 {a.zeros} ({a.pct_zeros}%)\n"
+        f"Par {a.pct_pares}% | Ímpar {a.pct_impares}% | Baixo {a.pct_baixos}% | Alto {a.pct_altos}%\n\n"
+        f"Dúzias: {rank(a.duzias_rank)}\n"
+        f"Colunas: {rank(a.colunas_rank)}\n"
+        f"Regiões: {rank(a.regioes_rank)}\n\n"
+        f"🔥 Mais saíram: {hot}\n"
+        f"🧊 Menos saíram: {cold}\n"
+    )
+    if hourly:
+        txt += "\n⏰ Por hora (SP)\n" + "\n".join(_hour_line(h[-2:], c) for h, c in hourly) + "\n"
+    return txt
+
+
 def footer_block(total_games: int, last_number: Optional[int]) -> str:
     last_txt = "—" if last_number is None else str(last_number)
     return (
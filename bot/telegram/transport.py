@@ -0,0 +1,140 @@
+﻿# Transporte HTTP do Bot API: pools separados pra polling e pra envio, com métricas
+# - getUpdates (long-poll) segura uma conexão por até TG_POLL_TIMEOUT segundos:
+#   se dividir o pool com edits/sends, o fan-out fica esperando conexão livre.
+# - PoolTimeout do httpx vira TimedOut no PTB ("Pool timeout: ...") e some no meio
+#   dos erros de rede; aqui a gente conta separado.
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+import httpx
+from telegram.error import NetworkError, TimedOut
+from telegram.request import HTTPXRequest
+
+
+@dataclass
+class PoolStats:
+    name: str
+    size: int
+
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    requests: int = 0
+    saturated: int = 0        # requests que chegaram com o pool já cheio (vão esperar conexão)
+    pool_timeouts: int = 0    # esperaram demais por conexão (request NEM saiu)
+    timeouts: int = 0         # saiu, mas estourou connect/read/write
+    network_errors: int = 0
+    total_seconds: float = 0.0
+
+    def avg_ms(self) -> float:
+        if self.requests <= 0:
+            return 0.0
+        return (self.total_seconds / self.requests) * 1000.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: {self.in_flight}/{self.size} em uso (pico {self.peak_in_flight}) | "
+            f"{self.requests} req, {self.avg_ms():.0f}ms méd | "
+            f"pool cheio {self.saturated}x | pool timeout {self.pool_timeouts} | "
+            f"timeout {self.timeouts} | rede {self.network_errors}"
+        )
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest com keep-alive configurável e contadores de saturação do pool."""
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int,
+        read_timeout: Optional[float],
+        write_timeout: Optional[float],
+        connect_timeout: Optional[float],
+        pool_timeout: Optional[float],
+        keepalive_expiry: Optional[float],
+    ) -> None:
+        pool_size = max(1, int(pool_size))
+        limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_expiry,
+        )
+        super().__init__(
+            connection_pool_size=pool_size,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+            httpx_kwargs={"limits": limits},
+        )
+        self.stats = PoolStats(name=name, size=pool_size)
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[Any] = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Tuple[int, bytes]:
+        st = self.stats
+        if st.in_flight >= st.size:
+            st.saturated += 1
+        st.in_flight += 1
+        st.peak_in_flight = max(st.peak_in_flight, st.in_flight)
+        st.requests += 1
+        t0 = time.monotonic()
+        try:
+            return await super().do_request(url, method, request_data, *args, **kwargs)
+        except TimedOut as e:
+            if "pool timeout" in str(e).lower():
+                st.pool_timeouts += 1
+            else:
+                st.timeouts += 1
+            raise
+        except NetworkError:
+            st.network_errors += 1
+            raise
+        finally:
+            st.in_flight -= 1
+            st.total_seconds += time.monotonic() - t0
+
+
+def build_requests() -> Tuple[InstrumentedRequest, InstrumentedRequest]:
+    """(envio, polling) com os perfis das variáveis de ambiente."""
+    from bot.config import (
+        OUTBOX_CONCURRENCY,
+        TG_KEEPALIVE_EXPIRY,
+        TG_POLL_POOL_SIZE,
+        TG_POLL_READ_TIMEOUT,
+        TG_SEND_CONNECT_TIMEOUT,
+        TG_SEND_POOL_SIZE,
+        TG_SEND_POOL_TIMEOUT,
+        TG_SEND_READ_TIMEOUT,
+        TG_SEND_WRITE_TIMEOUT,
+    )
+
+    # pool menor que a fila de saída = worker parado esperando conexão
+    send = InstrumentedRequest(
+        name="envio",
+        pool_size=max(TG_SEND_POOL_SIZE, OUTBOX_CONCURRENCY),
+        read_timeout=TG_SEND_READ_TIMEOUT,
+        write_timeout=TG_SEND_WRITE_TIMEOUT,
+        connect_timeout=TG_SEND_CONNECT_TIMEOUT,
+        pool_timeout=TG_SEND_POOL_TIMEOUT,
+        keepalive_expiry=TG_KEEPALIVE_EXPIRY,
+    )
+    # o long-poll fica TG_POLL_TIMEOUT segundos "pendurado"; o PTB já soma esse
+    # tempo no read_timeout do getUpdates, aqui é só a folga extra
+    poll = InstrumentedRequest(
+        name="polling",
+        pool_size=TG_POLL_POOL_SIZE,
+        read_timeout=TG_POLL_READ_TIMEOUT,
+        write_timeout=TG_SEND_WRITE_TIMEOUT,
+        connect_timeout=TG_SEND_CONNECT_TIMEOUT,
+        pool_timeout=TG_SEND_POOL_TIMEOUT,
+        keepalive_expiry=TG_KEEPALIVE_EXPIRY,
+    )
+    return send, poll
@@ -0,0 +1,119 @@
+﻿# Modo webhook: o Telegram (ou você, local) faz POST do Update direto aqui
+# - sem long-poll: comando de admin chega na hora
+# - valida o X-Telegram-Bot-Api-Secret-Token (obrigatório)
+# - testar local (sem Telegram):
+#     curl -X POST http://127.0.0.1:8080/telegram \
+#       -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \
+#       -H "Content-Type: application/json" -d @update.json
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import signal
+from dataclasses import dataclass
+
+from telegram import Update
+from telegram.ext import Application
+
+from bot.core.http import HttpError, HttpRequest, HttpResponse, start_http_server
+
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+@dataclass
+class WebhookStats:
+    received: int = 0
+    rejected: int = 0
+    invalid: int = 0
+
+
+class WebhookHandler:
+    def __init__(self, app: Application, path: str, secret: str) -> None:
+        self.app = app
+        self.path = path if path.startswith("/") else f"/{path}"
+        self.secret = secret.encode("utf-8")
+        self.stats = WebhookStats()
+
+    async def __call__(self, req: HttpRequest) -> HttpResponse:
+        if req.path != self.path:
+            raise HttpError(404)
+        if req.method != "POST":
+            raise HttpError(405)
+
+        got = req.headers.get(SECRET_HEADER, "").encode("utf-8")
+        if not hmac.compare_digest(got, self.secret):
+            self.stats.rejected += 1
+            raise HttpError(403)
+
+        elector = self.app.bot_data.get("elector")
+        if elector is not None and not elector.is_leader:
+            # seguidor: o Telegram reenvia o update mais tarde (aí o líder pega)
+            raise HttpError(503)
+
+        try:
+            data = json.loads(req.body.decode("utf-8"))
+            update = Update.de_json(data, self.app.bot)
+        except Exception:
+            self.stats.invalid += 1
+            raise HttpError(400, "invalid update")
+        if update is None:
+            self.stats.invalid += 1
+            raise HttpError(400, "invalid update")
+
+        self.stats.received += 1
+        # mesma fila que o polling usa: daqui pra frente é tudo igual
+        await self.app.update_queue.put(update)
+        return HttpResponse(200, b"", "text/plain")
+
+
+async def run_webhook(app: Application) -> None:
+    """
+    Ciclo de vida completo do Application em modo webhook
+    (equivalente ao que o run_polling faz por baixo).
+    """
+    from bot.config import (
+        WEBHOOK_LISTEN,
+        WEBHOOK_PATH,
+        WEBHOOK_PORT,
+        WEBHOOK_SECRET,
+        WEBHOOK_URL,
+    )
+
+    handler = WebhookHandler(app, WEBHOOK_PATH, WEBHOOK_SECRET)
+    app.bot_data["webhook"] = handler
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+    server, _ = await start_http_server(WEBHOOK_LISTEN, WEBHOOK_PORT, handler)
+    try:
+        # sem WEBHOOK_URL (teste local) não registra nada no Telegram
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + handler.path,
+                secret_token=WEBHOOK_SECRET,
+                drop_pending_updates=True,
+            )
+        await stop.wait()
+    finally:
+        # sem wait_closed: no 3.12 ele espera as conexões keep-alive do Telegram fecharem
+        server.close()
+
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)